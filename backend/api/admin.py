@@ -1,5 +1,7 @@
-from django.contrib import admin
-from .models import Property, Photographer, Customer, Service, AddonService, PropertyService, Order
+from django.contrib import admin, messages
+from django.http import StreamingHttpResponse
+from .models import Property, Photographer, Customer, Service, AddonService, PropertyService, Order, Payment, PayoutRun
+from .payouts import claim, csv_lines, settle
 # Register your models here.
 from django.contrib.auth.admin import UserAdmin
 from .models import User  # your custom user model
@@ -37,4 +39,45 @@ class CustomUserAdmin(UserAdmin):
     search_fields = ('username', 'email', 'company')
     ordering = ('username',)
 # admin.site.register(Order)    
-# admin.site.register(OrderItem)    
\ No newline at end of file
+# admin.site.register(OrderItem)    
+
+
+def payout_csv_response(run):
+    response = StreamingHttpResponse(csv_lines(run), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="payout-run-{run.pk}.csv"'
+    return response
+
+
+@admin.register(Payment)
+class PaymentAdmin(admin.ModelAdmin):
+    list_display = ('id', 'photographer', 'job', 'amount', 'travel_fee', 'status', 'date', 'payout_run')
+    list_filter = ('status',)
+    raw_id_fields = ('photographer', 'job', 'payout_run')
+    actions = ['start_payout_run']
+
+    @admin.action(description='Pay out selected pending payments (downloads the CSV)')
+    def start_payout_run(self, request, queryset):
+        run = claim(queryset)
+        if run is None:
+            self.message_user(request, 'None of the selected payments is pending and unclaimed.', messages.WARNING)
+            return None
+        return payout_csv_response(run)
+
+
+@admin.register(PayoutRun)
+class PayoutRunAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'payment_count', 'total', 'created_at', 'paid_at')
+    list_filter = ('status',)
+    actions = ['download_csv', 'mark_paid']
+
+    @admin.action(description='Download payout CSV')
+    def download_csv(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, 'Select exactly one payout run.', messages.WARNING)
+            return None
+        return payout_csv_response(queryset.get())
+
+    @admin.action(description='Mark selected runs paid')
+    def mark_paid(self, request, queryset):
+        paid = sum(settle(run) for run in queryset)
+        self.message_user(request, f'Marked {paid} payments paid.')
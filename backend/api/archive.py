@@ -0,0 +1,253 @@
+"""Streaming, seekable ZIP archives of a property's media.
+
+Entries are STORED (media is already compressed) and always written in
+ZIP64 form with data descriptors, which makes every header a fixed size.
+The archive's total length and each entry's offset are therefore known
+before a byte is read, so responses carry a Content-Length and can serve
+``Range`` requests. The bytes are produced by a generator that reads one
+file chunk at a time, so memory stays flat and no temp file is written
+however large the shoot is. Files stored as blobs carry the CRC-32 that the
+trailer needs, so a resumed download seeks past the bytes it skips. Other
+files are read from the start to compute it.
+"""
+import hashlib
+import struct
+import zlib
+
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .models import Blob
+
+CHUNK_SIZE = 256 * 1024
+
+_LOCAL = struct.Struct('<IHHHHHIIIHH')
+_LOCAL_ZIP64 = struct.Struct('<HHQQ')
+_DESCRIPTOR = struct.Struct('<IIQQ')
+_CENTRAL = struct.Struct('<IHHHHHHIIIHHHHHII')
+_CENTRAL_ZIP64 = struct.Struct('<HHQQQ')
+_END64 = struct.Struct('<IQHHIIQQQQ')
+_END64_LOCATOR = struct.Struct('<IIQI')
+_END = struct.Struct('<IHHHHIIH')
+
+_VERSION = 45  # ZIP64
+_FLAGS = 0x0008 | 0x0800  # Data descriptor, UTF-8 names
+_MAX32 = 0xFFFFFFFF
+_MAX16 = 0xFFFF
+
+
+class ArchiveEntry:
+    def __init__(self, name, storage, path, size, modified, crc=None):
+        self.name = name
+        self.encoded_name = name.encode('utf-8')
+        self.storage = storage
+        self.path = path
+        self.size = size
+        self.dos_time, self.dos_date = _dos_datetime(modified)
+        self.crc = crc
+        self.offset = None
+
+    @property
+    def header_size(self):
+        return _LOCAL.size + len(self.encoded_name) + _LOCAL_ZIP64.size
+
+    @property
+    def length(self):
+        return self.header_size + self.size + _DESCRIPTOR.size
+
+    def local_header(self):
+        return _LOCAL.pack(
+            0x04034b50, _VERSION, _FLAGS, 0, self.dos_time, self.dos_date,
+            0, _MAX32, _MAX32, len(self.encoded_name), _LOCAL_ZIP64.size,
+        ) + self.encoded_name + _LOCAL_ZIP64.pack(0x0001, 16, 0, 0)
+
+    def descriptor(self):
+        return _DESCRIPTOR.pack(0x08074b50, self.crc, self.size, self.size)
+
+    def central_header(self):
+        return _CENTRAL.pack(
+            0x02014b50, _VERSION, _VERSION, _FLAGS, 0, self.dos_time, self.dos_date,
+            self.crc, _MAX32, _MAX32, len(self.encoded_name), _CENTRAL_ZIP64.size,
+            0, 0, 0, 0, _MAX32,
+        ) + self.encoded_name + _CENTRAL_ZIP64.pack(0x0001, 24, self.size, self.size, self.offset)
+
+
+def _dos_datetime(dt):
+    year = min(max(dt.year, 1980), 2107)
+    return (
+        (dt.hour << 11) | (dt.minute << 5) | (dt.second // 2),
+        ((year - 1980) << 9) | (dt.month << 5) | dt.day,
+    )
+
+
+class MediaArchive:
+    """A deterministic ZIP of ``Media`` rows whose files exist in storage"""
+
+    def __init__(self, media, crcs=None):
+        self.entries = []
+        if crcs is None:
+            media = list(media)
+            crcs = dict(stored_crcs(media))
+        seen = set()
+        offset = 0
+        for item in media:
+            storage, path = item.file.storage, item.file.name
+            if not path or not storage.exists(path):
+                continue
+            name = _unique(f'{item.type}/{item.file_name or path.rsplit("/", 1)[-1]}', seen)
+            entry = ArchiveEntry(name, storage, path, storage.size(path), item.uploaded_at, crcs.get(path))
+            entry.offset = offset
+            offset += entry.length
+            self.entries.append(entry)
+
+        self.central_offset = offset
+        self.central_size = sum(_CENTRAL.size + len(e.encoded_name) + _CENTRAL_ZIP64.size
+                                for e in self.entries)
+        self.length = self.central_offset + self.central_size + _END64.size + _END64_LOCATOR.size + _END.size
+
+    @property
+    def etag(self):
+        digest = hashlib.sha1()
+        for e in self.entries:
+            digest.update(f'{e.name}\0{e.path}\0{e.size}\0{e.dos_date}\0{e.dos_time}\n'.encode('utf-8'))
+        return '"%s"' % digest.hexdigest()
+
+    def _trailer(self):
+        count = len(self.entries)
+        end64_offset = self.central_offset + self.central_size
+        return b''.join(e.central_header() for e in self.entries) + _END64.pack(
+            0x06064b50, _END64.size - 12, _VERSION, _VERSION, 0, 0,
+            count, count, self.central_size, self.central_offset,
+        ) + _END64_LOCATOR.pack(0x07064b50, 0, end64_offset, 1) + _END.pack(
+            0x06054b50, 0, 0, _MAX16, _MAX16, _MAX32, _MAX32, 0,
+        )
+
+    def stream(self, start=0, end=None):
+        """Yield bytes ``[start, end]`` (inclusive) of the archive"""
+        end = self.length - 1 if end is None else end
+        position = 0
+
+        def window(data):
+            nonlocal position
+            lo, hi = position, position + len(data)
+            position = hi
+            if hi <= start or lo > end:
+                return b''
+            return data[max(start - lo, 0):end + 1 - lo]
+
+        for entry in self.entries:
+            chunk = window(entry.local_header())
+            if chunk:
+                yield chunk
+
+            known_crc = entry.crc is not None
+            body_start = position
+            skip_body = body_start + entry.size <= start
+            if known_crc and skip_body:
+                position += entry.size  # Nothing to send and nothing to hash
+            else:
+                crc = 0
+                with entry.storage.open(entry.path, 'rb') as fh:
+                    if known_crc and start > body_start:
+                        fh.seek(start - body_start)
+                        position = start
+                    while True:
+                        block = fh.read(CHUNK_SIZE)
+                        if not block:
+                            break
+                        if not known_crc:
+                            # The CRC is needed for the trailer even for skipped bytes
+                            crc = zlib.crc32(block, crc)
+                        if skip_body:
+                            position += len(block)
+                            continue
+                        chunk = window(block)
+                        if chunk:
+                            yield chunk
+                        if position > end:
+                            break
+                if not known_crc:
+                    entry.crc = crc & _MAX32
+
+            if position > end:
+                return
+            chunk = window(entry.descriptor())
+            if chunk:
+                yield chunk
+
+        chunk = window(self._trailer())
+        if chunk:
+            yield chunk
+
+
+def stored_crcs(media):
+    """``(name, crc32)`` of the blobs behind ``media`` whose CRC-32 is known"""
+    names = [item.file.name for item in media if item.file.name]
+    return Blob.objects.filter(name__in=names, crc32__isnull=False).values_list('name', 'crc32')
+
+
+def _unique(name, seen):
+    candidate, n = name, 1
+    while candidate in seen:
+        stem, dot, ext = name.rpartition('.')
+        candidate = f'{stem} ({n}).{ext}' if dot else f'{name} ({n})'
+        n += 1
+    seen.add(candidate)
+    return candidate
+
+
+def parse_range(header, length):
+    """Parse a single ``bytes=`` range into ``(start, end)``.
+
+    Returns ``None`` when there is no usable range (serve the whole body) and
+    raises ``ValueError`` when the range can't be satisfied.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[6:].strip().partition('-')
+    try:
+        if first == '':
+            suffix = int(last)
+        else:
+            start = int(first)
+            end = int(last) if last else length - 1
+    except ValueError:
+        return None
+    if first == '':
+        if suffix <= 0:
+            raise ValueError('Range not satisfiable')
+        return max(length - suffix, 0), length - 1
+    if start >= length or end < start:
+        raise ValueError('Range not satisfiable')
+    return start, min(end, length - 1)
+
+
+def archive_response(request, archive, filename, wrap=None):
+    """Stream ``archive`` as an attachment, honouring ``Range``/``If-Range``.
+
+    ``wrap`` adapts the byte generator before it is handed to the response
+    (async views pass one that yields from a worker thread).
+    """
+    etag = archive.etag
+    byte_range = None
+    if request.headers.get('If-Range', etag) == etag:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), archive.length)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{archive.length}'
+            return response
+
+    wrap = wrap or (lambda chunks: chunks)
+    if byte_range is None:
+        response = StreamingHttpResponse(wrap(archive.stream()), content_type='application/zip')
+        response['Content-Length'] = str(archive.length)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(wrap(archive.stream(start, end)), content_type='application/zip',
+                                         status=206)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{archive.length}'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
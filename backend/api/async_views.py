@@ -0,0 +1,173 @@
+"""Native async variants of the I/O-bound endpoints.
+
+These are plain Django ``async def`` views (DRF views are synchronous), so
+under an ASGI server a slow client or a long download parks a coroutine on
+the event loop instead of pinning a worker thread. Queries use the async ORM
+or, for sync-only code that queries (JWT user lookup on a cache miss, the
+upload offset checks, delta sync), ``sync_to_async`` with the default
+``thread_sensitive=True``, so they share the one thread that owns the
+connections. Only work that touches no database (storage stat calls, chunk
+writes, reading archived files) runs in a worker thread with
+``thread_sensitive=False``, where it doesn't queue behind the queries.
+Upload bodies are not streamed from the client: ASGIHandler spools the whole
+request before the view runs. Response bodies match their DRF counterparts
+byte for byte. Under WSGI they still work, Django simply runs them through
+``async_to_sync``.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+
+from . import uploads
+from .archive import MediaArchive, archive_response, stored_crcs
+from .auth import CachedJWTAuthentication
+from .flat import FlatSerializer
+from .landing import aget_landing_snapshot, snapshot_response
+from .models import Job, Media, Property, UploadSession
+from .replicas import use_replica, user_key
+from .serializers import JobSerializer, MediaSerializer
+from .sync import sync_payload
+
+_authenticator = CachedJWTAuthentication()
+
+
+def _json(data, status=200, headers=None):
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    return HttpResponse(renderer.render(data), status=status, headers=headers,
+                        content_type=renderer.media_type)
+
+
+def _error(exc, headers=None):
+    data = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+    return _json(data, exc.status_code, headers)
+
+
+def async_api_view(methods, authenticated=True, replica=False):
+    """Restrict an async view to ``methods`` and authenticate it with the JWT backend.
+
+    With ``replica=True`` safe requests read from a replica, like ``ReplicaReadMixin``.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return _json({'detail': f'Method "{request.method}" not allowed.'}, 405,
+                             {'Allow': ', '.join(methods)})
+            if authenticated:
+                try:
+                    result = await sync_to_async(_authenticator.authenticate)(request)
+                    if result is None:
+                        raise NotAuthenticated()
+                except APIException as exc:
+                    return _error(exc, {'WWW-Authenticate': _authenticator.authenticate_header(request)})
+                request.user, request.auth = result
+            if replica and request.method in SAFE_METHODS:
+                with use_replica(user_key(getattr(request, 'user', None))):
+                    return await view(request, *args, **kwargs)
+            return await view(request, *args, **kwargs)
+        # Token-authenticated like the DRF views, so no CSRF cookie check
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+async def _iterate_in_thread(chunks):
+    """Drive a blocking byte generator from a worker thread, one chunk at a time.
+
+    ``MediaArchive.stream`` only reads files: the rows and CRC-32s it needs
+    are loaded before it starts.
+    """
+    step = sync_to_async(next, thread_sensitive=False)
+    done = object()
+    while (chunk := await step(chunks, done)) is not done:
+        yield chunk
+
+
+def _not_found(model=None):
+    # Same messages as DRF's get_object() and the hand-written 404s
+    detail = f'No {model._meta.object_name} matches the given query.' if model else 'Not found.'
+    return _json({'detail': detail}, 404)
+
+
+@async_api_view(['GET'], replica=True)
+async def property_media(request, pk):
+    if not await Property.objects.filter(pk=pk).aexists():
+        return _not_found(Property)
+    flat = FlatSerializer(MediaSerializer, context={'request': request})
+    rows = [row async for row in flat.values(Media.objects.filter(property_id=pk))]
+    return _json(flat.to_representation(rows))
+
+
+@async_api_view(['GET'])
+async def property_media_archive(request, pk):
+    if not await Property.objects.filter(pk=pk).aexists():
+        return _not_found(Property)
+    media = Media.objects.filter(property_id=pk).order_by('uploaded_at', 'id')
+    if request.GET.get('type'):
+        media = media.filter(type=request.GET['type'])
+    if request.GET.get('service'):
+        try:
+            media = media.filter(service_id=int(request.GET['service']))
+        except ValueError:
+            return _json({'detail': 'service must be an id'}, 400)
+    media = [m async for m in media.only('id', 'type', 'file', 'file_name', 'uploaded_at')]
+    crcs = {name: crc async for name, crc in stored_crcs(media)}
+    # Building the archive stats every file in storage
+    archive = await sync_to_async(MediaArchive, thread_sensitive=False)(media, crcs)
+    return archive_response(request, archive, f'property-{pk}-media.zip', wrap=_iterate_in_thread)
+
+
+@async_api_view(['GET'], replica=True)
+async def photographer_jobs(request):
+    """The user's jobs; ``?since=<Sync-Token>`` returns only changes"""
+    flat = FlatSerializer(JobSerializer)
+    jobs = Job.objects.filter(photographer=request.user)
+    try:
+        # Rendering prefetches the addon rows, a sync query
+        data, token = await sync_to_async(sync_payload)(
+            request.user, request.GET.get('since'), jobs, jobs,
+            lambda rows: flat.to_representation(flat.values(rows)),
+        )
+    except APIException as exc:
+        return _error(exc)
+    return _json(data, headers={'Sync-Token': token})
+
+
+@async_api_view(['GET', 'HEAD'], authenticated=False, replica=True)
+async def property_landing_page(request, pk):
+    snapshot = await aget_landing_snapshot(pk)
+    if snapshot is None:
+        return _not_found()
+    return snapshot_response(request, *snapshot)
+
+
+@async_api_view(['PATCH'])
+async def upload_chunk(request, pk):
+    """Async ``PATCH /uploads/{id}/``: the chunk is written from a worker thread.
+
+    ASGIHandler has spooled the whole body before the view runs, so this
+    frees the event loop from the disk writes, not from a slow client.
+    """
+    # Read the request as a stream (not ``.body``) so chunk size isn't capped
+    # by DATA_UPLOAD_MAX_MEMORY_SIZE, same as the DRF view
+    try:
+        offset = int(request.headers['Upload-Offset'])
+        checksum = uploads.parse_checksum(request.headers.get('Upload-Checksum'))
+        session = await uploads.areceive_chunk(
+            UploadSession.objects.filter(owner=request.user), pk, request, offset, checksum,
+        )
+    except (KeyError, ValueError):
+        return _json({'detail': 'Missing or invalid Upload-Offset header'}, 400)
+    except UploadSession.DoesNotExist:
+        return _not_found()
+    except uploads.ChunkError as exc:
+        return _json({'detail': exc.detail}, exc.status)
+    return HttpResponse(status=204, headers={
+        'Upload-Offset': str(session.offset),
+        'Upload-Length': str(session.file_size),
+        'Cache-Control': 'no-store',
+    })
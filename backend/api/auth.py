@@ -0,0 +1,184 @@
+"""JWT authentication with in-process caches.
+
+``CachedJWTAuthentication`` resolves the token's user from a TTL/LRU cache
+instead of a primary-key lookup per request; ``User`` saves/deletes in this
+process drop the entry and the TTL bounds staleness across processes.
+
+``CachedRefreshToken`` fronts the blacklist table with a Bloom filter of
+blacklisted JTIs that is topped up from the database every
+``TOKEN_BLACKLIST_REFRESH_INTERVAL`` seconds. A miss is definitive, so only
+possibly-blacklisted tokens cost a query. A token blacklisted by another
+process is picked up at the next top-up. Top-ups select rows by
+``blacklisted_at`` and look back ``TOKEN_BLACKLIST_REFRESH_OVERLAP`` seconds
+before the previous one. The timestamp is taken before the row commits, so a
+slow transaction (or another host's clock) can't slip a row in behind it.
+"""
+import copy
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries expire after ``ttl`` seconds"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class BloomFilter:
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(capacity, 1)
+        self.bits = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.bits / self.capacity * math.log(2)))
+        self.array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.array[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class BlacklistIndex:
+    """Bloom filter over blacklisted, unexpired refresh-token JTIs"""
+
+    def __init__(self, refresh_interval, overlap=0, capacity=100_000):
+        self.refresh_interval = refresh_interval
+        self.overlap = timedelta(seconds=overlap)
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.bloom = None
+        self.loaded_since = None
+        self.loaded_at = 0.0
+
+    def _load(self):
+        now = time.monotonic()
+        if self.bloom is not None and now - self.loaded_at < self.refresh_interval:
+            return
+        started = timezone.now()
+        rows = BlacklistedToken.objects.filter(token__expires_at__gt=started)
+        if self.loaded_since is not None:
+            rows = rows.filter(blacklisted_at__gte=self.loaded_since - self.overlap)
+        if self.bloom is None:
+            self.bloom = BloomFilter(self.capacity)
+        for jti in rows.values_list('token__jti', flat=True).iterator(chunk_size=5000):
+            if jti not in self.bloom:  # The overlap sees most rows twice
+                self.bloom.add(jti)
+        self.loaded_since = started
+        if self.bloom.count > self.bloom.capacity:
+            # Saturated: rebuild from scratch (dropping expired tokens) at twice the size
+            self.capacity = self.bloom.count * 2
+            self.reset()
+            return self._load()
+        self.loaded_at = now
+
+    def might_contain(self, jti):
+        with self._lock:
+            self._load()
+            return jti in self.bloom
+
+    def add(self, jti):
+        with self._lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+
+user_cache = TTLCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL)
+blacklist_index = BlacklistIndex(settings.TOKEN_BLACKLIST_REFRESH_INTERVAL,
+                                 settings.TOKEN_BLACKLIST_REFRESH_OVERLAP)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        user = user_cache.get(str(user_id))
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(str(user_id), user)
+            return copy.copy(user)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        # Hand each request its own copy so nothing leaks between requests
+        return copy.copy(user)
+
+
+class CachedRefreshToken(RefreshToken):
+
+    def check_blacklist(self):
+        if blacklist_index.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        result = super().blacklist()
+        blacklist_index.add(self.payload[api_settings.JTI_CLAIM])
+        return result
+
+
+class CachedTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = CachedRefreshToken
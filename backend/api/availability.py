@@ -0,0 +1,143 @@
+"""Interval index over photographer availability and bookings.
+
+``Photographer.available_dates`` and the free-form ``scheduled_date`` /
+``scheduled_time`` on jobs and property services stay the source of truth;
+they are mirrored into ``Availability`` and ``Booking`` rows of
+``[start_minute, end_minute)`` intervals so that "who is free at 10:00 on
+the 14th" is a single indexed query. Each interval carries the city of the
+photographer's ``base_zip_code`` from ``ZipCentroid`` (re-resolved by
+``load_gazetteer``), or none if that is unset or unknown, in which case the
+photographer is offered in any city.
+"""
+import re
+from datetime import date as date_cls
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Availability, Booking, Photographer, ZipCentroid
+
+MINUTES_PER_DAY = 24 * 60
+
+_TIME_RE = re.compile(r'^\s*(\d{1,2})(?::(\d{2}))?\s*([ap]\.?m\.?)?\s*$', re.IGNORECASE)
+
+
+def parse_time(value):
+    """Parse ``'14:30'``, ``'2:30 PM'`` or ``'9am'`` into minutes after midnight"""
+    if value is None:
+        return None
+    match = _TIME_RE.match(str(value))
+    if not match:
+        return None
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem[0].lower() == 'p' else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+def _parse_date(value):
+    if isinstance(value, date_cls):
+        return value
+    try:
+        return date_cls.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def _cities(zip_codes):
+    """``{zip_code: city or None}`` for base zip codes like ``'78701'`` or ``'78701-1234'``"""
+    keys = {code: code.strip()[:5] for code in zip_codes if code}
+    found = dict(ZipCentroid.objects.filter(zip_code__in=set(keys.values())).values_list('zip_code', 'city'))
+    return {code: found.get(key) for code, key in keys.items()}
+
+
+@transaction.atomic
+def sync_photographer_availability(photographer):
+    """Mirror ``available_dates`` into full-day ``Availability`` intervals"""
+    dates = {d for d in map(_parse_date, photographer.available_dates or []) if d}
+    city = _cities([photographer.base_zip_code]).get(photographer.base_zip_code) if dates else None
+    Availability.objects.filter(photographer=photographer).delete()
+    Availability.objects.bulk_create([
+        Availability(photographer=photographer, date=d, start_minute=0, end_minute=MINUTES_PER_DAY, city=city)
+        for d in sorted(dates)
+    ])
+
+
+def sync_availability_cities():
+    """Re-resolve every interval's city, for after the gazetteer is reloaded"""
+    zip_codes = dict(Photographer.objects.filter(availability__isnull=False).distinct()
+                     .values_list('pk', 'base_zip_code'))
+    cities = _cities(zip_codes.values())
+    by_city = {}
+    for pk, code in zip_codes.items():
+        by_city.setdefault(cities.get(code), []).append(pk)
+    for city, pks in by_city.items():
+        Availability.objects.filter(photographer_id__in=pks).update(city=city)
+
+
+def sync_booking(user_id, scheduled_date, scheduled_time, active=True, **source):
+    """Create, move or drop the ``Booking`` for one job or property service.
+
+    ``source`` is ``job=...`` or ``property_service=...``.
+    """
+    start = parse_time(scheduled_time)
+    day = _parse_date(scheduled_date) if scheduled_date else None
+    if not active or user_id is None or day is None or start is None:
+        Booking.objects.filter(**source).delete()
+        return None
+    end = min(start + settings.BOOKING_DEFAULT_DURATION, MINUTES_PER_DAY)
+    booking, _ = Booking.objects.update_or_create(
+        **source,
+        defaults={'photographer_id': user_id, 'date': day, 'start_minute': start, 'end_minute': end},
+    )
+    return booking
+
+
+def sync_bookings(instances, source, active=lambda obj: True):
+    """Bulk version of ``sync_booking`` for rows written without signals"""
+    Booking.objects.filter(**{f'{source}__in': [obj.pk for obj in instances]}).delete()
+    bookings = []
+    for obj in instances:
+        start = parse_time(obj.scheduled_time)
+        day = _parse_date(obj.scheduled_date) if obj.scheduled_date else None
+        if not active(obj) or obj.photographer_id is None or day is None or start is None:
+            continue
+        bookings.append(Booking(
+            photographer_id=obj.photographer_id, date=day, start_minute=start,
+            end_minute=min(start + settings.BOOKING_DEFAULT_DURATION, MINUTES_PER_DAY),
+            **{source: obj},
+        ))
+    Booking.objects.bulk_create(bookings)
+
+
+def find_available_photographers(day, start=None, duration=None, city=None, limit=10):
+    """Best-rated photographers free on ``day`` for ``[start, start + duration)``, in ``city`` if given"""
+    if start is None:
+        start, end = 0, MINUTES_PER_DAY
+    else:
+        end = min(start + (duration or settings.BOOKING_DEFAULT_DURATION), MINUTES_PER_DAY)
+
+    busy = Booking.objects.filter(
+        photographer_id=OuterRef('user_id'),
+        date=day,
+        start_minute__lt=end,
+        end_minute__gt=start,
+    )
+    free = Availability.objects.filter(
+        photographer_id=OuterRef('pk'),
+        date=day,
+        start_minute__lte=start,
+        end_minute__gte=end,
+    )
+    if city:
+        free = free.filter(Q(city__iexact=' '.join(city.split())) | Q(city__isnull=True))
+
+    return (Photographer.objects
+            .filter(Exists(free))
+            .exclude(Exists(busy))
+            .order_by('-rating', '-completed_jobs', 'pk')[:limit])
@@ -0,0 +1,117 @@
+"""Reference counts and garbage collection for content-addressed media.
+
+Signals call ``retain``/``release`` in the same transaction as the row that
+gains or loses a blob: a new or re-filed ``Media``, a job upload, a deleted
+``Media`` or ``Job``. Files stored elsewhere (before blobs existed) are left
+alone. ``collect_blobs`` checks that nothing still names a blob before it
+deletes it, so a count that drifted (say, from ``uploaded_files`` edited by
+hand) costs disk space, never a file in use.
+
+An upload may skip its transfer by naming a stored blob's digest, but only
+a blob its user already has: on media of their properties, media they
+uploaded or their jobs' uploads. Otherwise a digest would fetch anyone's
+file, and whether the transfer was skipped would tell who has what.
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, TextField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import Blob, Job, Media, UploadSession, media_storage
+from .storage import is_blob
+
+logger = logging.getLogger(__name__)
+
+BATCH = 100
+
+
+def _adjust(names, sign):
+    counts = Counter(name for name in names if is_blob(name))
+    for name, count in counts.items():
+        Blob.objects.filter(name=name).update(refs=F('refs') + sign * count, last_used_at=timezone.now())
+
+
+def retain(names):
+    """Count one more reference to each blob in ``names``"""
+    _adjust(names, 1)
+
+
+def release(names):
+    """Count one less reference to each blob in ``names``; unreferenced ones wait for ``collect_blobs``"""
+    _adjust(names, -1)
+
+
+def job_files(job):
+    return [item.get('file') for item in job.uploaded_files or [] if isinstance(item, dict)]
+
+
+def _uploads_text():
+    return Cast('uploaded_files', TextField())
+
+
+def has_blob(user, name):
+    """Whether ``user`` already references blob ``name`` (so may reuse it without sending it)"""
+    return (
+        Media.objects.filter(file=name, property__owner=user).exists()
+        or UploadSession.objects.filter(owner=user, media__file=name).exists()
+        or Job.objects.filter(photographer=user).annotate(files_text=_uploads_text())
+        .filter(files_text__contains=name).exists()
+    )
+
+
+def claim(digest, size, user):
+    """Name of the stored blob with this SHA-256 and size, kept from collection a while longer; or None.
+
+    Only a blob ``user`` already references is claimed: a digest and size
+    are public enough that they prove nothing about having the bytes.
+    """
+    with transaction.atomic():
+        blob = Blob.objects.select_for_update().filter(digest=digest, size=size).first()
+        if blob is None or not has_blob(user, blob.name) or not media_storage().exists(blob.name):
+            return None
+        Blob.objects.filter(pk=digest).update(last_used_at=timezone.now())
+    return blob.name
+
+
+def _references(names):
+    """``{name: count}`` of the rows naming each blob in ``names``"""
+    counts = Counter(Media.objects.filter(file__in=names).values_list('file', flat=True))
+    jobs = Job.objects.annotate(files_text=_uploads_text()).filter(
+        Q.create([('files_text__contains', name) for name in names], connector=Q.OR))
+    for job in jobs.only('id', 'uploaded_files'):
+        counts.update(name for name in job_files(job) if name in names)
+    return counts
+
+
+def collect_blobs(grace=None):
+    """Delete blobs no row has used for ``grace`` seconds; returns ``(blobs, bytes)`` freed"""
+    grace = settings.BLOB_GC_GRACE if grace is None else grace
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    storage = media_storage()
+    freed = size = 0
+    seen = set()
+    while True:
+        with transaction.atomic():
+            blobs = list(Blob.objects.select_for_update().filter(refs__lte=0, last_used_at__lt=cutoff)
+                         .exclude(pk__in=seen).order_by('last_used_at')[:BATCH])
+            if not blobs:
+                return freed, size
+            seen.update(blob.pk for blob in blobs)
+            references = _references([blob.name for blob in blobs])
+            doomed = []
+            for blob in blobs:
+                if references[blob.name]:
+                    logger.warning('Blob %s has %d references but counted %d; recounting',
+                                   blob.name, references[blob.name], blob.refs)
+                    Blob.objects.filter(pk=blob.pk).update(refs=references[blob.name])
+                    continue
+                storage.delete(blob.name)
+                doomed.append(blob.pk)
+                size += blob.size
+            freed += len(doomed)
+            Blob.objects.filter(pk__in=doomed).delete()
@@ -0,0 +1,226 @@
+"""List-payload create/update/delete for ModelViewSets.
+
+``BulkListSerializer`` validates a whole list in one pass: related primary
+keys are fetched with one ``in_bulk`` per relation instead of one ``get``
+per row, and writes go through ``bulk_create``/``bulk_update``. Neither
+sends model signals, so ViewSets using ``BulkActionsMixin`` resync anything
+derived from them in ``after_bulk_write`` (table versions are bumped here).
+Updates also refresh ``auto_now`` fields, which otherwise only ``save``
+would. To-many values (many-to-many ids and ``RelatedListField`` lists) are
+written for the whole batch at once by ``replace_related``.
+
+Deletes do send signals, one per row; receivers hand their bookkeeping to
+``after_delete`` so that a bulk delete writes it once per batch.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .conditional import touch
+from .fields import RelatedListField, related_lists_saved, replace_related
+from .rollups import deferred_rollups
+
+_pending_deletes = ContextVar('bulk_pending_deletes', default=None)
+
+
+def after_delete(func, *args):
+    """Run ``func(*args)``, some bookkeeping for a deleted row.
+
+    Inside ``batched_deletes`` it runs on exit instead, once for each
+    ``func`` and leading arguments, with the last (list) arguments of all
+    those calls joined up.
+    """
+    pending = _pending_deletes.get()
+    if pending is None:
+        func(*args)
+    else:
+        pending.setdefault((func, *args[:-1]), []).extend(args[-1])
+
+
+@contextmanager
+def batched_deletes():
+    """Hold ``after_delete`` calls until exit, then run them batched"""
+    if _pending_deletes.get() is not None:
+        yield
+        return
+    pending = {}
+    token = _pending_deletes.set(pending)
+    try:
+        yield
+    finally:
+        _pending_deletes.reset(token)
+    for (func, *args), items in pending.items():
+        func(*args, items)
+
+
+class _PrimedQuerySet:
+    """Stands in for a related field's queryset with rows fetched up front"""
+
+    def __init__(self, model, rows):
+        self.model = model
+        self.rows = rows
+
+    def get(self, pk=None, **kwargs):
+        try:
+            return self.rows[self.model._meta.pk.to_python(pk)]
+        except (KeyError, TypeError):
+            raise self.model.DoesNotExist
+
+    def all(self):
+        return self
+
+
+class BulkListSerializer(serializers.ListSerializer):
+
+    def _prime_related(self, data):
+        if not isinstance(data, list):
+            return
+        for name, field in self.child.fields.items():
+            many = isinstance(field, serializers.ManyRelatedField)
+            relation = field.child_relation if many else field
+            if field.read_only or not isinstance(relation, serializers.PrimaryKeyRelatedField):
+                continue
+            queryset = relation.get_queryset()
+            values = [row.get(name) for row in data if isinstance(row, dict) and row.get(name) is not None]
+            if many:
+                values = [pk for value in values if isinstance(value, list) for pk in value]
+            try:
+                ids = {queryset.model._meta.pk.to_python(pk) for pk in values}
+            except Exception:
+                continue  # Let the field report the bad value
+            relation.queryset = _PrimedQuerySet(queryset.model, queryset.in_bulk(ids))
+
+    def to_internal_value(self, data):
+        self._prime_related(data)
+        self._instances = iter(self.instance) if isinstance(self.instance, list) else None
+        return super().to_internal_value(data)
+
+    def run_child_validation(self, data):
+        if self._instances is not None:
+            self.child.instance = next(self._instances)
+            self.child.initial_data = data
+        return super().run_child_validation(data)
+
+    def _pop_to_many(self, validated_data):
+        """Take the to-many values out of every row, keyed by relation name"""
+        # Read-only related lists too: ``validate`` may fill them in, as ``RelatedListsMixin`` allows
+        fields = {f.source: f for f in self.child.fields.values() if isinstance(f, RelatedListField)
+                  or (not f.read_only and isinstance(f, serializers.ManyRelatedField))}
+        return {source: (field, [attrs.pop(source, None) for attrs in validated_data])
+                for source, field in fields.items()}
+
+    def _save_to_many(self, instances, to_many, created=False):
+        model = self.child.Meta.model
+        saved = []
+        for source, (field, values) in to_many.items():
+            pairs = [(instance, value) for instance, value in zip(instances, values) if value is not None]
+            if pairs:
+                replace_related(model, source, pairs, getattr(field, 'build', None), created)
+                saved.append(source)
+        if saved:
+            related_lists_saved.send(sender=model, instances=instances, names=saved)
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        to_many = self._pop_to_many(validated_data)
+        instances = model.objects.bulk_create([model(**attrs) for attrs in validated_data])
+        self._save_to_many(instances, to_many, created=True)
+        touch(model)
+        return instances
+
+    def update(self, instances, validated_data):
+        model = self.child.Meta.model
+        to_many = self._pop_to_many(validated_data)
+        fields = set()
+        for instance, attrs in zip(instances, validated_data):
+            for name, value in attrs.items():
+                setattr(instance, name, value)
+                fields.add(name)
+        now = timezone.now()
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                for instance in instances:
+                    setattr(instance, field.attname, now)
+                fields.add(field.name)
+        if fields:
+            model.objects.bulk_update(instances, sorted(fields))
+        self._save_to_many(instances, to_many)
+        touch(model)
+        return instances
+
+
+class BulkActionsMixin:
+    """Adds ``/bulk/``: POST a list to create, PATCH a list with ``id`` to
+    update, DELETE ``{"ids": [...]}`` to delete, each in one transaction.
+
+    A batch runs a fixed number of queries whatever its size, for the rows,
+    their relations and everything resynced from them; ``query_budgets``
+    allows for that.
+    """
+    bulk_max_size = 1000
+    query_budgets = {'bulk': 25}
+
+    def after_bulk_write(self, instances, deleted=False):
+        pass
+
+    def _bulk_ids(self, rows):
+        if not isinstance(rows, list) or not all(isinstance(r, dict) and 'id' in r for r in rows):
+            raise serializers.ValidationError({'detail': 'Expected a list of objects with an id'})
+        return self._to_pks([r['id'] for r in rows])
+
+    def _to_pks(self, ids):
+        """Convert JSON ids to primary key values, so ``"5"`` finds the row ``in_bulk`` keys as ``5``"""
+        to_python = self.get_queryset().model._meta.pk.to_python
+        pks, invalid = [], []
+        for pk in ids:
+            try:
+                value = to_python(pk)
+            except (TypeError, DjangoValidationError):
+                value = None
+            if value is None:
+                invalid.append(pk)
+            pks.append(value)
+        if invalid:
+            raise serializers.ValidationError({'detail': 'Invalid ids', 'ids': invalid})
+        return pks
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        if request.method == 'DELETE':
+            ids = request.data.get('ids') if isinstance(request.data, dict) else None
+            if not isinstance(ids, list):
+                raise serializers.ValidationError({'ids': 'Expected a list of ids'})
+            ids = self._to_pks(ids)
+            with transaction.atomic(), deferred_rollups(), batched_deletes():
+                instances = list(self.get_queryset().filter(pk__in=ids))
+                self.get_queryset().filter(pk__in=[i.pk for i in instances]).delete()
+                self.after_bulk_write(instances, deleted=True)
+            return Response({'deleted': len(instances)})
+
+        if request.method == 'PATCH':
+            ids = self._bulk_ids(request.data)
+            found = self.get_queryset().in_bulk(ids)
+            missing = [pk for pk in ids if found.get(pk) is None]
+            if missing:
+                return Response({'detail': 'Not found', 'ids': missing}, status=status.HTTP_404_NOT_FOUND)
+            serializer = self.get_serializer([found[pk] for pk in ids], data=request.data, many=True,
+                                             partial=True, max_length=self.bulk_max_size)
+            response_status = status.HTTP_200_OK
+        else:
+            serializer = self.get_serializer(data=request.data, many=True, max_length=self.bulk_max_size)
+            response_status = status.HTTP_201_CREATED
+
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic(), deferred_rollups():
+            instances = serializer.save()
+            self.after_bulk_write(instances)
+
+        rows = self.get_queryset().in_bulk([i.pk for i in instances])
+        data = self.get_serializer([rows[i.pk] for i in instances], many=True).data
+        return Response(data, status=response_status)
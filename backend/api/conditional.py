@@ -0,0 +1,137 @@
+"""ETag/Last-Modified for ViewSet reads, from per-table change counters.
+
+Every table has a version in the cache: the ``time.time_ns()`` of its last
+committed write. Signals bump it on any save/delete and many-to-many change;
+code that writes without signals (``bulk_create``, ``bulk_update``,
+``QuerySet.update``) calls ``touch``. ``ConditionalMixin`` hashes the
+versions of the tables a serializer renders into the ETag, so a client
+revalidating an unchanged list gets its 304 before a single query runs.
+
+With the default local memory cache a worker never sees another worker's
+bumps; versions then expire after ``CONDITIONAL_VERSION_TTL`` seconds, which
+bounds how long such a worker can answer 304 for a changed table.
+"""
+import hashlib
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import Model
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _key(table):
+    return f'table-version:{table}'
+
+
+def touch(*models):
+    """Bump the versions of ``models``' tables once the current transaction commits"""
+    keys = [_key(model._meta.db_table) for model in models]
+
+    def bump():
+        version = time.time_ns()
+        cache.set_many(dict.fromkeys(keys, version), settings.CONDITIONAL_VERSION_TTL)
+    transaction.on_commit(bump)
+
+
+def versions(tables):
+    """``{table: version}``; a table without one starts at now"""
+    keys = {_key(table): table for table in tables}
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, settings.CONDITIONAL_VERSION_TTL)
+        found.update(cache.get_many(missing))
+    return {table: found.get(key, 0) for key, table in keys.items()}
+
+
+@lru_cache(maxsize=None)
+def dependencies(source):
+    """Tables whose rows a serializer class (or a model) renders"""
+    if issubclass(source, Model):
+        return frozenset({source._meta.db_table})
+    return frozenset(_dependencies(source()))
+
+
+def _dependencies(serializer):
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is None:
+        return set()
+    tables = {model._meta.db_table}
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        nested = field.child if isinstance(field, (serializers.ListSerializer, serializers.ListField)) else field
+        if isinstance(nested, serializers.ModelSerializer):
+            tables |= _dependencies(nested)
+        try:
+            relation = model._meta.get_field(field.source.split('.')[0])
+        except FieldDoesNotExist:
+            continue
+        if relation.is_relation and relation.related_model is not None:
+            if relation.many_to_many or relation.one_to_many or '.' in field.source:
+                tables.add(relation.related_model._meta.db_table)
+    return tables
+
+
+class NotModified(Exception):
+    """Carries the 304/412 response ``initial`` decided on"""
+
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalMixin:
+    """View mixin answering conditional GETs to ``conditional_actions`` from table versions.
+
+    The tables come from the serializer class, or from ``conditional_sources``
+    (serializer classes and models) for actions that render something else.
+    """
+    conditional_actions = ('list', 'retrieve')
+    conditional_sources = {}
+
+    def conditional_tables(self):
+        sources = self.conditional_sources.get(self.action) or (self.get_serializer_class(),)
+        tables = set()
+        for source in sources:
+            tables |= dependencies(source)
+        return sorted(tables)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._validators = None
+        if request.method not in SAFE_METHODS or self.action not in self.conditional_actions:
+            return
+        current = versions(self.conditional_tables())
+        user = request.user.pk if request.user.is_authenticated else ''
+        key = '\0'.join([type(self).__name__, self.action, request.build_absolute_uri(), str(user),
+                         request.headers.get('Accept', ''), *(f'{t}={v}' for t, v in sorted(current.items()))])
+        etag = '"%s"' % hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+        last_modified = max(current.values(), default=0) // 10 ** 9
+        # Dates have whole seconds: until this one is over, a later write could share it
+        self._validators = (etag, min(last_modified, int(time.time()) - 1))
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, '_validators', None)
+        if validators is not None and response.status_code in (200, 304):
+            response['ETag'] = validators[0]
+            if validators[1] > 0:
+                response['Last-Modified'] = http_date(validators[1])
+        return response
@@ -0,0 +1,92 @@
+"""Thumbnail/derivative rendering for ``Media``.
+
+``render_derivatives`` is a plain function over file paths so it can run in a
+worker process without touching the ORM; ``process_media_tasks`` feeds it
+from the ``MediaTask`` queue and writes the results back.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+
+from PIL import Image, ImageOps
+
+DERIVATIVE_WIDTHS = (320, 640, 1280)
+DERIVATIVE_FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+THUMBNAIL_WIDTH = DERIVATIVE_WIDTHS[0]
+
+
+class DerivativeError(Exception):
+    """The source could not be turned into derivatives"""
+
+
+def extract_poster_frame(video_path, output_path, at='00:00:01'):
+    """Grab a single frame from a video with ffmpeg"""
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        raise DerivativeError('ffmpeg is required to extract video poster frames')
+    result = subprocess.run(
+        [ffmpeg, '-y', '-loglevel', 'error', '-ss', at, '-i', video_path,
+         '-frames:v', '1', output_path],
+        capture_output=True,
+    )
+    if result.returncode != 0 or not os.path.exists(output_path):
+        raise DerivativeError(result.stderr.decode(errors='replace').strip() or 'ffmpeg failed')
+    return output_path
+
+
+def render_derivatives(source_path, media_root, stem, media_type='photo'):
+    """Write resized WebP/JPEG copies of ``source_path`` under ``media_root``.
+
+    Returns a list of ``{'width', 'height', 'format', 'file'}`` dicts where
+    ``file`` is relative to ``media_root``. For videos a poster frame is
+    extracted first and the derivatives are made from that.
+    """
+    poster_dir = None
+    try:
+        if media_type == 'video':
+            poster_dir = tempfile.mkdtemp()
+            source_path = extract_poster_frame(source_path, os.path.join(poster_dir, 'poster.png'))
+
+        try:
+            image = Image.open(source_path)
+            image = ImageOps.exif_transpose(image)
+        except (OSError, Image.DecompressionBombError) as exc:
+            raise DerivativeError(str(exc))
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        out_dir = os.path.join(media_root, 'derivatives')
+        os.makedirs(out_dir, exist_ok=True)
+
+        results = []
+        for width in DERIVATIVE_WIDTHS:
+            if width > image.width and width != THUMBNAIL_WIDTH:
+                continue
+            height = max(1, round(image.height * min(width, image.width) / image.width))
+            resized = image.resize((min(width, image.width), height), Image.LANCZOS)
+            for ext, fmt, options in DERIVATIVE_FORMATS:
+                name = os.path.join('derivatives', f'{stem}_{width}w.{ext}')
+                resized.save(os.path.join(media_root, name), fmt, **options)
+                results.append({
+                    'width': resized.width,
+                    'height': resized.height,
+                    'format': ext,
+                    'file': name,
+                })
+        return results
+    finally:
+        if poster_dir:
+            shutil.rmtree(poster_dir, ignore_errors=True)
+
+
+def delete_derivatives(media_root, derivatives):
+    """Remove the files listed in a ``render_derivatives`` result"""
+    for derivative in derivatives or []:
+        if isinstance(derivative, dict) and derivative.get('file'):
+            path = os.path.join(media_root, derivative['file'])
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,151 @@
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised (with ``QUERY_BUDGET = 'raise'``) when a request issues more queries than its budget allows"""
+
+
+def _concrete_fields(model):
+    return {f.name: f for f in model._meta.concrete_fields}
+
+
+def to_many_relation(model, name):
+    """The many-to-many or reverse foreign key called ``name``, if ``model`` has one"""
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    return field if field.many_to_many or field.one_to_many else None
+
+
+def _plan(model, serializer, prefix=''):
+    """Walk a serializer's fields and collect select/prefetch/only paths.
+
+    Returns ``(select, prefetch, only)`` where ``only`` is ``None`` when the
+    serializer renders something we can't see through (method fields,
+    ``source='*'``) and every column has to be loaded.
+    """
+    select, prefetch, only = [], [], set()
+    concrete = _concrete_fields(model)
+    restrict = True
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+            restrict = False
+            continue
+
+        name = field.source.split('.')[0]
+        path = prefix + name
+
+        if isinstance(field, serializers.ListSerializer):
+            try:
+                related = model._meta.get_field(name).related_model
+            except FieldDoesNotExist:
+                continue
+            child = field.child
+            child_model = getattr(getattr(child, 'Meta', None), 'model', None)
+            if isinstance(child, serializers.ModelSerializer) and child_model is related:
+                prefetch.append(Prefetch(path, queryset=plan_queryset(related._default_manager.all(), child)))
+            else:
+                prefetch.append(path)
+            continue
+
+        relation = to_many_relation(model, name)
+        if relation is not None:
+            # Many-to-many ids and RelatedListField rows
+            if isinstance(field, serializers.ManyRelatedField) and isinstance(
+                    field.child_relation, serializers.PrimaryKeyRelatedField):
+                prefetch.append(Prefetch(path, queryset=relation.related_model._default_manager.only('pk')))
+            else:
+                prefetch.append(path)
+            continue
+
+        if isinstance(field, serializers.ModelSerializer) and name in concrete and concrete[name].is_relation:
+            related = concrete[name].related_model
+            select.append(path)
+            only.add(path)
+            sub_select, sub_prefetch, sub_only = _plan(related, field, prefix=path + '__')
+            select += sub_select
+            prefetch += sub_prefetch
+            if sub_only is None:
+                restrict = False
+            else:
+                only |= sub_only
+            continue
+
+        if name in concrete:
+            only.add(prefix + concrete[name].name)
+
+    if not restrict:
+        return select, prefetch, None
+    only.add(prefix + model._meta.pk.name)
+    return select, prefetch, only
+
+
+def plan_queryset(queryset, serializer):
+    """Eager-load exactly what ``serializer`` (a class or instance) will render"""
+    if isinstance(serializer, type):
+        serializer = serializer()
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    select, prefetch, only = _plan(queryset.model, serializer)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    if only:
+        queryset = queryset.only(*only)
+    return queryset
+
+
+class EagerLoadingMixin:
+    """ViewSet mixin that plans the queryset from the serializer and checks
+    requests against a budget of ``query_budget`` queries.
+
+    ``QUERY_BUDGET`` picks what going over does: ``None`` skips the check,
+    ``'warn'`` logs the queries, ``'raise'`` fails the request with
+    ``QueryBudgetExceeded``. A write has committed by then, so ``'raise'`` is
+    for the test suite, where it is the default. Queries on every database
+    alias count, replicas included. ``query_budgets`` overrides the budget
+    per action, for writes that legitimately touch several tables.
+    """
+    query_budget = 10
+    query_budgets = {}
+
+    def get_queryset(self):
+        return plan_queryset(super().get_queryset(), self.get_serializer_class())
+
+    def dispatch(self, request, *args, **kwargs):
+        mode = settings.QUERY_BUDGET
+        if not mode or self.query_budget is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(record))
+            response = super().dispatch(request, *args, **kwargs)
+        budget = self.query_budgets.get(getattr(self, 'action', None), self.query_budget)
+        if len(queries) > budget:
+            message = (f'{type(self).__name__}.{self.action} ran {len(queries)} queries '
+                       f'(budget {budget}):\n' + '\n'.join(queries))
+            if mode == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
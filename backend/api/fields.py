@@ -0,0 +1,106 @@
+"""Serializer support for lists kept in child tables.
+
+``RelatedListField`` renders a reverse foreign key (``Property.features``,
+``Job.addons``...) as the plain JSON list those columns used to hold, and
+``RelatedListsMixin`` writes a submitted list back as rows once the parent is
+saved. ``replace_related`` swaps the rows (or many-to-many links) of many
+parents with one delete and one ``bulk_create``; neither sends per-row
+signals, so ``related_lists_saved`` announces the change instead.
+"""
+from django.db import models
+from django.dispatch import Signal
+from rest_framework import serializers
+
+from .conditional import touch
+
+# sender=model, instances=[...], names=[relation names that were replaced]
+related_lists_saved = Signal()
+
+
+class RelatedListField(serializers.ListField):
+    """A reverse foreign key rendered as a list.
+
+    With ``attribute`` each row renders as that one column through ``child``
+    (``['Pool', 'Garage']``); otherwise ``child`` is a Serializer over the row.
+    """
+
+    def __init__(self, attribute=None, **kwargs):
+        self.attribute = attribute
+        super().__init__(**kwargs)
+
+    def to_representation(self, data):
+        rows = data.all() if isinstance(data, models.Manager) else data
+        if self.attribute:
+            return [self.child.to_representation(getattr(row, self.attribute)) for row in rows]
+        return [self.child.to_representation(row) for row in rows]
+
+    def build(self, instance, value):
+        """Unsaved child rows of ``instance`` for a validated ``value``"""
+        relation = instance._meta.get_field(self.source)
+        model, fk = relation.related_model, relation.field.name
+        items = [{self.attribute: item} for item in value or []] if self.attribute else value or []
+        return [model(**{fk: instance}, **item) for item in items]
+
+
+def _prime(instance, name, objs):
+    """Fill ``instance``'s prefetch cache for ``name`` with the rows just written"""
+    cache = instance.__dict__.setdefault('_prefetched_objects_cache', {})
+    cache.pop(name, None)
+    queryset = getattr(instance, name).all()
+    queryset._result_cache = list(objs)
+    queryset._prefetch_done = True
+    cache[name] = queryset
+
+
+def replace_related(model, name, pairs, build=None, created=False):
+    """Replace relation ``name`` of every instance in ``pairs`` (``(instance, value)``)
+    with the given values: many-to-many targets, or rows made by ``build``.
+    ``created`` instances have nothing to delete first."""
+    instances = [instance for instance, _ in pairs]
+    relation = model._meta.get_field(name)
+    if relation.many_to_many:
+        through = relation.remote_field.through
+        source, target = relation.m2m_field_name(), relation.m2m_reverse_field_name()
+        pairs = [(instance, list(dict.fromkeys(value or []))) for instance, value in pairs]
+        if not created:
+            through.objects.filter(**{f'{source}__in': instances}).delete()
+        through.objects.bulk_create([through(**{source: instance, target: obj})
+                                     for instance, value in pairs for obj in value])
+    else:
+        pairs = [(instance, build(instance, value)) for instance, value in pairs]
+        if not created:
+            relation.related_model.objects.filter(**{f'{relation.field.name}__in': instances}).delete()
+        relation.related_model.objects.bulk_create([row for _, rows in pairs for row in rows])
+    for instance, objs in pairs:
+        _prime(instance, name, objs)
+    touch(model, relation.related_model)
+
+
+class RelatedListsMixin:
+    """ModelSerializer mixin that saves ``RelatedListField`` values after the instance"""
+
+    def _related_lists(self):
+        # Read-only ones too: ``validate`` may fill them in
+        return {f.source: f for f in self.fields.values() if isinstance(f, RelatedListField)}
+
+    def _pop_related_lists(self, validated_data):
+        return {source: validated_data.pop(source) for source in self._related_lists() if source in validated_data}
+
+    def _save_related_lists(self, instance, lists, created=False):
+        fields = self._related_lists()
+        for source, value in lists.items():
+            replace_related(type(instance), source, [(instance, value)], fields[source].build, created)
+        if lists:
+            related_lists_saved.send(sender=type(instance), instances=[instance], names=list(lists))
+
+    def create(self, validated_data):
+        lists = self._pop_related_lists(validated_data)
+        instance = super().create(validated_data)
+        self._save_related_lists(instance, lists, created=True)
+        return instance
+
+    def update(self, instance, validated_data):
+        lists = self._pop_related_lists(validated_data)
+        instance = super().update(instance, validated_data)
+        self._save_related_lists(instance, lists)
+        return instance
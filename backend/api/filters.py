@@ -0,0 +1,33 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class FieldFilterBackend(BaseFilterBackend):
+    """Exact-match ``?field=value`` filtering on the view's ``filter_fields``.
+
+    Fields should lead a composite index together with the view's ordering
+    (see migration 0009) so filtered pages stay index range scans.
+    ``filter_lookups`` maps further parameters to lookups across to-many
+    relations (``{'feature': 'features__name'}``); those match through an
+    ``IN`` subquery so a parent with several matching rows is listed once.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        lookups = {}
+        for name in getattr(view, 'filter_fields', ()):
+            value = request.query_params.get(name)
+            if value in (None, ''):
+                continue
+            field = queryset.model._meta.get_field(name)
+            try:
+                lookups[field.attname] = field.to_python(value)
+            except DjangoValidationError as exc:
+                raise ValidationError({name: exc.messages})
+        queryset = queryset.filter(**lookups)
+        for name, lookup in getattr(view, 'filter_lookups', {}).items():
+            value = request.query_params.get(name)
+            if value not in (None, ''):
+                matching = queryset.model._default_manager.filter(**{lookup: value})
+                queryset = queryset.filter(pk__in=matching.values('pk'))
+        return queryset
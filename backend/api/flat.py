@@ -0,0 +1,132 @@
+"""Read-only ``.values()`` rendering for flat ModelSerializers.
+
+``FlatSerializer`` compiles a ModelSerializer's fields once into per-column
+converters and then renders plain ``values()`` dicts without instantiating
+models. It reuses each field's own ``to_representation`` (and the
+serializer's ``get_<field>`` methods, fed a lightweight row object), so the
+output is identical to the regular serializer's. To-many fields (child-row
+lists, many-to-many ids) cost one query per relation for the whole page,
+grouped by parent id.
+"""
+from types import SimpleNamespace
+
+from django.db import models
+from django.db.models.fields.files import FieldFile
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .eager import to_many_relation
+from .metrics import timed
+
+
+class FlatSerializer:
+
+    def __init__(self, serializer_class, context=None):
+        self.serializer = serializer_class(context=context or {})
+        self.model = self.serializer.Meta.model
+        concrete = {f.name: f for f in self.model._meta.concrete_fields}
+
+        self.plan = []
+        self.needs_row = False
+        columns = [self.model._meta.pk.attname]
+        for name, field in self.serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                self.plan.append((name, 'method', getattr(self.serializer, field.method_name)))
+                self.needs_row = True
+                continue
+            relation = to_many_relation(self.model, field.source)
+            if relation is not None:
+                self.plan.append((name, 'many', (relation, field)))
+                continue
+            model_field = concrete.get(field.source)
+            if model_field is None or isinstance(field, serializers.BaseSerializer):
+                raise ValueError(f'{serializer_class.__name__}.{name} cannot be rendered from values()')
+            columns.append(model_field.attname)
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                self.plan.append((name, 'pk', model_field.attname))
+            elif isinstance(model_field, models.FileField):
+                self.plan.append((name, 'file', (model_field, field)))
+            else:
+                self.plan.append((name, 'value', (model_field.attname, field.to_representation)))
+
+        # Method fields may read any attribute, so give them the whole row
+        if self.needs_row:
+            columns = [f.attname for f in concrete.values()]
+        self.columns = list(dict.fromkeys(columns))
+        self.file_fields = [f for f in concrete.values() if isinstance(f, models.FileField)]
+
+    def values(self, queryset, *extra):
+        """``queryset`` as ``values()`` dicts carrying every column we render"""
+        return queryset.values(*dict.fromkeys(self.columns + list(extra)))
+
+    def _row(self, values):
+        row = SimpleNamespace(**values)
+        for f in self.file_fields:
+            setattr(row, f.name, FieldFile(None, f, values[f.attname]))
+        row.pk = values[self.model._meta.pk.attname]
+        return row
+
+    def to_representation(self, rows):
+        with timed('serialize'):
+            return self._represent(rows)
+
+    def _related(self, relation, pks):
+        """``{parent pk: [related objects]}`` for a many-to-many or reverse foreign key"""
+        grouped = {}
+        if relation.many_to_many:
+            through = relation.remote_field.through
+            source, target = relation.m2m_field_name(), relation.m2m_reverse_field_name()
+            links = through.objects.filter(**{f'{source}__in': pks}).select_related(target).order_by('pk')
+            for link in links:
+                grouped.setdefault(getattr(link, f'{source}_id'), []).append(getattr(link, target))
+        else:
+            fk = relation.field.attname
+            for row in relation.related_model._default_manager.filter(**{f'{fk}__in': pks}):
+                grouped.setdefault(getattr(row, fk), []).append(row)
+        return grouped
+
+    def _represent(self, rows):
+        out = []
+        related = {}
+        if any(kind == 'many' for _, kind, _ in self.plan):
+            rows = list(rows)
+            pks = [values[self.model._meta.pk.attname] for values in rows]
+            related = {name: self._related(spec[0], pks) for name, kind, spec in self.plan if kind == 'many'}
+        for values in rows:
+            row = self._row(values) if self.needs_row else None
+            item = {}
+            for name, kind, spec in self.plan:
+                if kind == 'value':
+                    value = values[spec[0]]
+                    item[name] = None if value is None else spec[1](value)
+                elif kind == 'pk':
+                    item[name] = values[spec]
+                elif kind == 'many':
+                    item[name] = spec[1].to_representation(
+                        related[name].get(values[self.model._meta.pk.attname], []))
+                elif kind == 'file':
+                    model_field, field = spec
+                    value = FieldFile(None, model_field, values[model_field.attname])
+                    item[name] = field.to_representation(value)
+                else:
+                    item[name] = spec(row)
+            out.append(item)
+        return out
+
+
+class FlatListMixin:
+    """Serve ``list`` from ``values()`` rows through a ``FlatSerializer``"""
+
+    def get_flat_serializer(self):
+        return FlatSerializer(self.get_serializer_class(), context=self.get_serializer_context())
+
+    def list(self, request, *args, **kwargs):
+        flat = self.get_flat_serializer()
+        ordering = [key.lstrip('-') for key in getattr(self, 'ordering', None) or ()]
+        queryset = flat.values(self.filter_queryset(self.get_queryset()), *ordering)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(flat.to_representation(page))
+        return Response(flat.to_representation(queryset))
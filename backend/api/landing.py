@@ -0,0 +1,90 @@
+"""Prebuilt JSON snapshots for public property landing pages.
+
+A snapshot is the rendered response body plus its ETag, stored in the cache
+under the property's id. Signals drop it whenever the property or its media
+change (once the change commits), and the next hit rebuilds it, so
+steady-state hits never touch the database. Draft properties have no public
+page, and the owner isn't shown.
+"""
+import hashlib
+import json
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+
+from .models import Media, Property
+from .replicas import is_pinned, pin, use_primary
+from .serializers import MediaSerializer, PropertySerializer
+
+DEFAULT_TEMPLATE = 'modern'
+
+
+def cache_key(property_id):
+    return f'landing:{property_id}'
+
+
+def build_landing_payload(property_obj):
+    media = Media.objects.filter(property=property_obj).order_by('uploaded_at', 'id')
+    details = PropertySerializer(property_obj).data
+    details.pop('owner', None)
+    return {
+        'property': details,
+        'template': property_obj.landing_page_template or DEFAULT_TEMPLATE,
+        'media': MediaSerializer(media, many=True).data,
+    }
+
+
+def get_landing_snapshot(property_id):
+    """Return ``(body, etag)`` for a property, or ``None`` if it doesn't exist or is a draft"""
+    snapshot = cache.get(cache_key(property_id))
+    if snapshot is not None:
+        return snapshot
+
+    # A replica may not have the change that dropped the snapshot yet
+    with use_primary() if is_pinned(cache_key(property_id)) else nullcontext():
+        property_obj = Property.objects.filter(pk=property_id).exclude(status='draft').first()
+        if property_obj is None:
+            return None
+        body = json.dumps(build_landing_payload(property_obj), cls=DjangoJSONEncoder,
+                          separators=(',', ':')).encode('utf-8')
+    snapshot = (body, '"%s"' % hashlib.sha1(body).hexdigest())
+    cache.set(cache_key(property_id), snapshot, settings.LANDING_PAGE_CACHE_TIMEOUT)
+    return snapshot
+
+
+async def aget_landing_snapshot(property_id):
+    """Async ``get_landing_snapshot``; only a cache miss leaves the event loop"""
+    snapshot = await cache.aget(cache_key(property_id))
+    if snapshot is not None:
+        return snapshot
+    return await sync_to_async(get_landing_snapshot)(property_id)
+
+
+def snapshot_response(request, body, etag):
+    """Answer with the snapshot, or 304 if the client already holds it"""
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=settings.LANDING_PAGE_MAX_AGE)
+    return response
+
+
+def invalidate_landing_page(property_id):
+    """Drop the property's snapshot when the current transaction commits.
+
+    Dropping it sooner would let a concurrent hit cache the rows the
+    transaction is about to replace.
+    """
+    def drop():
+        cache.delete(cache_key(property_id))
+        pin(cache_key(property_id))
+    transaction.on_commit(drop)
@@ -0,0 +1,270 @@
+import re
+import statistics
+import time
+from collections import OrderedDict
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.operations import AddIndex, AlterField
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.models import User
+from api.seeding import Seeder
+
+# (role, url) pairs replayed against the seeded data; {broker}, {photographer}
+# and {property} are filled in with seeded ids
+DEFAULT_ENDPOINTS = [
+    ('photographer', '/api/photographers/jobs/'),
+    ('photographer', '/api/photographers/payments/?status=pending'),
+    ('photographer', '/api/jobs/?photographer={photographer}&status=upcoming'),
+    ('broker', '/api/properties/?owner={broker}&status=scheduled'),
+    ('broker', '/api/properties/{property}/media/'),
+    ('broker', '/api/properties/{property}/media/archive/?type=photo'),
+    ('broker', '/api/media/?property={property}&type=photo'),
+    ('broker', '/api/orders/?status=pending'),
+    ('broker', '/api/dashboard/summary/'),
+]
+
+_COLUMN = r'"(\w+)"\."(\w+)"'
+_PREDICATE = re.compile(_COLUMN + r'\s*(=|IN\b|IS NULL|>=|<=|>|<|BETWEEN\b|LIKE\b)', re.IGNORECASE)
+_ORDER = re.compile(r'^\s*(?:' + _COLUMN + r'|(\d+))', re.IGNORECASE)
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _clause(sql, keyword, stops):
+    upper = sql.upper()
+    start = upper.find(f' {keyword} ')
+    if start < 0:
+        return ''
+    start += len(keyword) + 2
+    end = min([i for i in (upper.find(f' {s} ', start) for s in stops) if i >= 0] or [len(sql)])
+    return sql[start:end]
+
+
+def _split(clause):
+    """Split on top-level commas"""
+    items, depth, current = [], 0, ''
+    for char in clause:
+        depth += char == '('
+        depth -= char == ')'
+        if char == ',' and not depth:
+            items.append(current)
+            current = ''
+        else:
+            current += char
+    return items + [current] if current.strip() else items
+
+
+def shape(sql):
+    """``sql`` with literals replaced, so repeated queries group together"""
+    return _LITERAL.sub('?', sql)
+
+
+def access_pattern(sql):
+    """``(table, equality columns, range columns, order-by columns)`` of a single-table SELECT"""
+    match = re.search(r'\bFROM "(\w+)"', sql)
+    if not sql.lstrip().upper().startswith('SELECT') or not match:
+        return None
+    table = match.group(1)
+    where = _clause(sql, 'WHERE', ('GROUP BY', 'ORDER BY', 'LIMIT'))
+    order = _clause(sql, 'ORDER BY', ('LIMIT', 'OFFSET'))
+    equality, ranges = [], []
+    for tbl, column, op in _PREDICATE.findall(where):
+        if tbl != table:
+            continue
+        target = equality if op.upper() in ('=', 'IN', 'IS NULL') else ranges
+        if column not in equality and column not in target:
+            target.append(column)
+    select = _split(sql[sql.upper().find('SELECT') + 6:match.start()])
+    ordering = []
+    for item in _split(order):
+        found = _ORDER.match(item)
+        if found and found.group(3):  # values() queries sort by select-list position
+            found = _ORDER.match(select[int(found.group(3)) - 1])
+        if found and found.group(1) == table:
+            ordering.append(found.group(2))
+    # Keyset cursors expand to (a < x) OR (a = x AND b < y): sort columns
+    # belong after the equality columns however the predicate is spelled
+    equality = [c for c in equality if c not in ordering]
+    ranges = [c for c in ranges if c not in ordering]
+    return table, equality, ranges, ordering
+
+
+def propose(pattern):
+    """Equality columns first, then one range column or the sort columns"""
+    table, equality, ranges, ordering = pattern
+    tail = ordering or ranges[:1]
+    columns = list(OrderedDict.fromkeys(equality + tail))
+    return columns if equality or len(columns) > 1 else []
+
+
+def covered(columns, indexes, equality):
+    """Whether an existing index starts with ``columns`` (equality part in any order)"""
+    n = len(equality)
+    for existing in indexes:
+        if connection.vendor == 'sqlite':
+            existing = existing + ['id']  # Every SQLite index ends in the rowid
+        if len(existing) >= len(columns) and set(existing[:n]) == set(columns[:n]) \
+                and existing[n:len(columns)] == columns[n:]:
+            return True
+    return False
+
+
+def table_indexes(table):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return {name: info['columns'] for name, info in constraints.items()
+            if info['index'] or info['unique'] or info['primary_key']}
+
+
+class Command(BaseCommand):
+    help = ('Replay API endpoints against seeded data, record the SQL they issue, and propose '
+            'composite indexes for filters/sorts that no index covers. With --benchmark, time each '
+            'query with and without the indexes added by --migration.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=20000, help='Rows per seeded table')
+        parser.add_argument('--endpoint', action='append', dest='endpoints', metavar='ROLE:URL',
+                            help='Endpoint to replay as a broker or photographer (repeatable)')
+        parser.add_argument('--benchmark', action='store_true')
+        parser.add_argument('--migration', default='api.0009_query_indexes',
+                            help='Migration whose AddIndex operations are benchmarked')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        endpoints = DEFAULT_ENDPOINTS
+        if options['endpoints']:
+            endpoints = [tuple(e.split(':', 1)) for e in options['endpoints']]
+        try:
+            with transaction.atomic():
+                ids = self.seed(options['seed'])
+                queries = self.record(endpoints, ids)
+                self.report(queries)
+                if options['benchmark']:
+                    self.benchmark(queries, options['migration'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def seed(self, n):
+        self.stdout.write(f'Seeding {n} rows per table (rolled back afterwards)...')
+        people = max(n // 100, 2)
+        seeder = Seeder({'brokers': people, 'photographers': people, 'customers': people, 'properties': n,
+                         'media': n, 'orders': n, 'jobs': n, 'payments': n}).run(derived=False)
+        return {'broker': User.objects.get(pk=seeder.brokers[0]),
+                'photographer': User.objects.get(pk=seeder.photographers[0]),
+                'property': seeder.properties[0]}
+
+    def record(self, endpoints, ids):
+        queries = OrderedDict()
+        values = {'broker': ids['broker'].pk, 'photographer': ids['photographer'].pk, 'property': ids['property']}
+        for role, url in endpoints:
+            client = APIClient()
+            client.force_authenticate(ids[role])
+            url = url.format(**values)
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url)
+                if hasattr(response, 'streaming_content'):
+                    b''.join(response.streaming_content)
+            if response.status_code >= 400:
+                self.stderr.write(f'{url}: HTTP {response.status_code}')
+            for query in ctx.captured_queries:
+                entry = queries.setdefault(shape(query['sql']), {'sql': query['sql'], 'urls': set(),
+                                                                 'count': 0, 'time': 0.0})
+                entry['urls'].add(url)
+                entry['count'] += 1
+                entry['time'] += float(query['time'])
+        return queries
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+            return ' | '.join(str(row[-1]) for row in cursor.fetchall())
+
+    def report(self, queries):
+        proposals = OrderedDict()
+        for entry in queries.values():
+            pattern = access_pattern(entry['sql'])
+            if pattern is None:
+                continue
+            table, equality, ranges, ordering = pattern
+            columns = propose(pattern)
+            plan = self.explain(entry['sql'])
+            status = 'ok'
+            if columns and not covered(columns, table_indexes(table).values(), equality):
+                status = 'MISSING'
+                proposals.setdefault((table, tuple(columns)), set()).update(entry['urls'])
+            self.stdout.write(f'\n[{status}] {entry["count"]}x {entry["time"] * 1000:.1f}ms  {table} '
+                              f'eq={equality} range={ranges} order={ordering}')
+            self.stdout.write(f'  {", ".join(sorted(entry["urls"]))}')
+            self.stdout.write(f'  plan: {plan}')
+
+        # Single-column indexes that are a prefix of a wider one only cost writes
+        self.stdout.write('\nRedundant indexes:')
+        for table in sorted({access_pattern(e['sql'])[0] for e in queries.values() if access_pattern(e['sql'])}):
+            indexes = table_indexes(table)
+            for name, cols in indexes.items():
+                wider = [n for n, other in indexes.items() if n != name and len(other) > len(cols)
+                         and other[:len(cols)] == cols]
+                if wider and not name.endswith('_pkey') and cols != ['id']:
+                    self.stdout.write(f'  {table}.{name} {cols} is a prefix of {wider[0]}')
+
+        self.stdout.write('\nProposed indexes:' if proposals else '\nNo missing indexes.')
+        for (table, columns), urls in proposals.items():
+            name = f'{table}_{"_".join(columns)}_idx'[:30]
+            self.stdout.write(f"  {table}: models.Index(fields={list(columns)!r}, name='{name}')"
+                              f"  # {', '.join(sorted(urls))}")
+
+    def timed(self, sql, repeat):
+        samples = []
+        with connection.cursor() as cursor:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                cursor.execute(sql)
+                cursor.fetchall()
+                samples.append(time.perf_counter() - start)
+        return statistics.median(samples)
+
+    def benchmark(self, queries, migration, repeat):
+        """Time each recorded SELECT on the current schema and on the schema before ``migration``"""
+        app_label, name = migration.split('.', 1)
+        loader = MigrationLoader(connection)
+        operations = loader.get_migration(app_label, name).operations
+        indexes = [op for op in operations if isinstance(op, AddIndex)]
+        # Single-column indexes the migration dropped (db_index=False) come back for "before"
+        previous = loader.project_state([d for d in loader.get_migration(app_label, name).dependencies
+                                         if d[0] == app_label]).apps
+        restored = []
+        for op in operations:
+            if isinstance(op, AlterField) and op.field.db_index is False:
+                model = previous.get_model(app_label, op.model_name)
+                field = model._meta.get_field(op.name)
+                if field.db_index:
+                    restored.append((model._meta.db_table, field.column))
+        selects = [e for e in queries.values() if access_pattern(e['sql'])]
+
+        after = [self.timed(e['sql'], repeat) for e in selects]
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                quote = connection.ops.quote_name
+                for op in indexes:
+                    cursor.execute(f'DROP INDEX {quote(op.index.name)}')
+                for table, column in restored:
+                    cursor.execute(f'CREATE INDEX {quote(f"before_{table}_{column}")} ON {quote(table)} ({quote(column)})')
+                before = [self.timed(e['sql'], repeat) for e in selects]
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f'\nWithout/with {migration} ({", ".join(op.index.name for op in indexes)}):')
+        self.stdout.write(f'{"before ms":>10}{"after ms":>10}{"speedup":>9}  query')
+        for entry, b, a in zip(selects, before, after):
+            table = access_pattern(entry['sql'])[0]
+            url = sorted(entry['urls'])[0]
+            self.stdout.write(f'{b * 1000:>10.2f}{a * 1000:>10.2f}{b / a if a else 0:>8.1f}x  {table} <- {url}')
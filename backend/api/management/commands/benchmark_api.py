@@ -0,0 +1,269 @@
+import json
+import math
+import platform
+import re
+import resource
+import statistics
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+import django
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver
+from rest_framework.test import APIClient
+
+from api import urls
+from api.auth import CachedRefreshToken
+from api.models import (
+    Customer, Job, Media, Order, Payment, Photographer, Property, PropertyService, UploadSession, User,
+)
+
+# Routes whose view has no ``queryset`` to read the model from
+ROUTE_MODELS = {'properties': Property, 'property': Property, 'uploads': UploadSession}
+# Query strings for routes that 400 without one; {date} is a seeded job's date
+ROUTE_QUERIES = {'photographers/available/': 'date={date}&time=10:00', 'search/': 'q=oak'}
+PHOTOGRAPHER_ROUTES = re.compile(r'^(async/)?(photographers|jobs)/')
+_PARAM = re.compile(r'<(?:\w+:)?(\w+)>|\(\?P<(\w+)>[^)]*\)')
+
+
+class _QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+def walk(patterns, prefix=''):
+    """Yield ``(route, callback)`` for every URL pattern, with placeholders as ``{name}``"""
+    for pattern in patterns:
+        route = prefix + _PARAM.sub(lambda m: '{%s}' % (m.group(1) or m.group(2)),
+                                    str(pattern.pattern).lstrip('^').rstrip('$'))
+        if isinstance(pattern, URLResolver):
+            yield from walk(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern):
+            yield route, pattern.callback
+
+
+async def _drain(chunks):
+    return b''.join([chunk async for chunk in chunks])
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Command(BaseCommand):
+    help = ('Hit every GET endpoint in api/urls.py against seeded data (see seed_data) and '
+            'write p50/p95/p99 latency, queries per request and peak RSS to a JSON report')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--client', choices=['test', 'server'], default='test',
+                            help='Django test client in-process, or HTTP against a local WSGI server')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--filter', default='', help='Only routes matching this regex')
+        parser.add_argument('--output', help='Write the JSON report here')
+        parser.add_argument('--baseline', help='Previous report to compare against')
+
+    def handle(self, *args, **options):
+        fixtures = self.fixtures()
+        if options['client'] == 'server':
+            fetch, stop = self.server_client()
+        else:
+            fetch, stop = self.test_client(), lambda: None
+
+        tokens = {role: f'Bearer {CachedRefreshToken.for_user(user).access_token}'
+                  for role, user in fixtures['users'].items()}
+        endpoints, skipped = {}, {}
+        try:
+            for route, callback in walk(urls.urlpatterns):
+                if 'format' in route or not re.search(options['filter'], route):
+                    continue
+                reason = self.unsupported(callback)
+                url = reason or self.resolve(route, callback, fixtures)
+                if reason or url is None:
+                    skipped[route] = reason or 'no seeded object for the placeholder'
+                    continue
+                role = 'photographer' if PHOTOGRAPHER_ROUTES.match(route) else 'broker'
+                result = self.measure(fetch, f'/api/{url}', tokens[role], options['iterations'], options['warmup'])
+                endpoints[f'/api/{route}'] = {'url': f'/api/{url}', 'role': role, **result}
+                self.stdout.write(f'{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}{result["p99_ms"]:>9.2f}'
+                                  f'{result["queries"]:>8}{result["status"]:>6}  /api/{url}')
+        finally:
+            stop()
+
+        report = {'meta': self.meta(options), 'endpoints': endpoints, 'skipped': skipped}
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+            self.stdout.write(f'Wrote {options["output"]}')
+        if options['baseline']:
+            self.compare(report, options['baseline'], options['filter'])
+
+    def fixtures(self):
+        """One broker and one photographer with data, and a pk per model they can see"""
+        media = Media.objects.select_related('property__owner').order_by('pk').first()
+        job = Job.objects.select_related('photographer').order_by('pk').first()
+        if media is None or job is None:
+            raise CommandError('No data to benchmark; run seed_data first')
+        broker, photographer = media.property.owner, job.photographer
+        objects = {
+            Property: media.property_id,
+            Media: media.pk,
+            Job: job.pk,
+            Photographer: Photographer.objects.filter(user=photographer).values_list('pk', flat=True).first(),
+            Order: Order.objects.filter(property__owner=broker).values_list('pk', flat=True).first(),
+            Customer: Customer.objects.values_list('pk', flat=True).first(),
+            PropertyService: PropertyService.objects.values_list('pk', flat=True).first(),
+            UploadSession: UploadSession.objects.filter(owner=broker).values_list('pk', flat=True).first(),
+        }
+        return {'users': {'broker': broker, 'photographer': photographer}, 'objects': objects,
+                'date': job.scheduled_date.isoformat()}
+
+    def unsupported(self, callback):
+        cls = getattr(callback, 'cls', None)
+        actions = getattr(callback, 'actions', None)
+        if actions is not None and 'get' not in actions:
+            return f'no GET ({", ".join(sorted(actions))})'
+        if actions is None and cls is not None and not hasattr(cls, 'get'):
+            return 'no GET'
+        return None
+
+    def resolve(self, route, callback, fixtures):
+        """Fill ``{pk}``-style placeholders with a seeded object of the route's model"""
+        query = ROUTE_QUERIES.get(route, '').format(**fixtures)
+        names = re.findall(r'{(\w+)}', route)
+        if not names:
+            return f'{route}?{query}' if query else route
+        queryset = getattr(getattr(callback, 'cls', None), 'queryset', None)
+        segment = route.removeprefix('async/').split('/', 1)[0]
+        model = queryset.model if queryset is not None else ROUTE_MODELS.get(segment)
+        pk = fixtures['objects'].get(model)
+        if pk is None:
+            return None
+        return route.format(**{name: pk for name in names})
+
+    def test_client(self):
+        client = APIClient()
+
+        def fetch(url, authorization):
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url, HTTP_AUTHORIZATION=authorization)
+                if getattr(response, 'is_async', False):
+                    body = async_to_sync(_drain)(response.streaming_content)
+                elif response.streaming:
+                    body = b''.join(response.streaming_content)
+                else:
+                    body = response.content
+            return response.status_code, len(body), len(ctx.captured_queries)
+        return fetch
+
+    def server_client(self):
+        """A wsgiref server in a thread; its app counts the queries each request runs"""
+        application = get_wsgi_application()
+        counts = []
+
+        def counted(environ, start_response):
+            executed = [0]
+
+            def count(execute, sql, params, many, context):
+                executed[0] += 1
+                return execute(sql, params, many, context)
+            with connection.execute_wrapper(count):
+                result = application(environ, start_response)
+                try:
+                    body = b''.join(result)
+                finally:
+                    getattr(result, 'close', lambda: None)()
+            counts.append(executed[0])
+            return [body]
+
+        server = make_server('127.0.0.1', 0, counted, handler_class=_QuietHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        base = f'http://127.0.0.1:{server.server_port}'
+
+        def fetch(url, authorization):
+            try:
+                with urlopen(Request(base + url, headers={'Authorization': authorization})) as response:
+                    status, size = response.status, len(response.read())
+            except HTTPError as exc:
+                status, size = exc.code, len(exc.read())
+            return status, size, counts.pop() if counts else 0
+
+        def stop():
+            server.shutdown()
+            server.server_close()
+        return fetch, stop
+
+    def measure(self, fetch, url, authorization, iterations, warmup):
+        for _ in range(warmup):
+            fetch(url, authorization)
+        samples, queries = [], []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            status, size, executed = fetch(url, authorization)
+            samples.append((time.perf_counter() - start) * 1000)
+            queries.append(executed)
+        return {
+            'status': status,
+            'bytes': size,
+            'queries': max(queries),
+            'p50_ms': round(percentile(samples, 50), 3),
+            'p95_ms': round(percentile(samples, 95), 3),
+            'p99_ms': round(percentile(samples, 99), 3),
+            'mean_ms': round(statistics.fmean(samples), 3),
+            'peak_rss_kb': peak_rss_kb(),
+        }
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'client': options['client'],
+            'iterations': options['iterations'],
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'debug': settings.DEBUG,
+            'rows': {model.__name__: model.objects.count()
+                     for model in (User, Property, Media, Order, Job, Payment)},
+            'peak_rss_kb': peak_rss_kb(),
+        }
+
+    def compare(self, report, path, pattern=''):
+        with open(path) as fh:
+            baseline = json.load(fh)
+        self.stdout.write(f'\nAgainst {path} (commit {baseline["meta"].get("commit")}):')
+        self.stdout.write(f'{"p50":>9}{"p95":>9}{"queries":>9}  endpoint')
+        for route, current in report['endpoints'].items():
+            before = baseline['endpoints'].get(route)
+            if before is None:
+                self.stdout.write(f'{"new":>27}  {route}')
+                continue
+            change = lambda key: (current[key] / before[key] - 1) * 100 if before[key] else 0.0
+            self.stdout.write(f'{change("p50_ms"):>+8.0f}%{change("p95_ms"):>+8.0f}%'
+                              f'{current["queries"] - before["queries"]:>+9}  {route}')
+        for route in sorted(baseline['endpoints'].keys() - report['endpoints'].keys()):
+            if not re.search(pattern, route.removeprefix('/api/')):
+                continue
+            self.stdout.write(f'{"gone":>27}  {route}')
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+
+from api.auth import CachedRefreshToken
+from api.models import Media, Property, Service, User
+
+
+class Command(BaseCommand):
+    help = ('Download a property media archive from many slow clients, through the sync DRF view '
+            'on a WSGI thread pool and through the async view on the ASGI event loop')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=8, help='WSGI worker threads')
+        parser.add_argument('--files', type=int, default=4)
+        parser.add_argument('--file-size', type=int, default=512 * 1024)
+        parser.add_argument('--delay', type=float, default=0.02,
+                            help='Seconds each client takes to accept one response chunk')
+
+    def handle(self, *args, **options):
+        # Rows must be committed: both handlers query from their own threads
+        user = User.objects.create_user(username='asgi-bench@example.com', email='asgi-bench@example.com')
+        service = Service.objects.create(name='Benchmark', description='', price=0, icon='camera')
+        property_obj = Property.objects.create(
+            address='1 Main St', city='Austin', state='TX', zip_code='78701', property_type='house',
+            bedrooms=3, bathrooms='2.5', price='550000.00', description='', owner=user,
+        )
+        names = []
+        try:
+            for i in range(options['files']):
+                name = default_storage.save(f'benchmark/{i}.jpg', ContentFile(os.urandom(options['file_size'])))
+                names.append(name)
+                Media.objects.create(property=property_obj, service=service, type='photo', file=name,
+                                     file_name=f'{i}.jpg', file_size=options['file_size'])
+            token = str(CachedRefreshToken.for_user(user).access_token)
+            self.stdout.write(f'{options["clients"]} clients downloading {options["files"]} x '
+                              f'{options["file_size"]} bytes, {options["delay"]}s per chunk')
+            self.stdout.write(f'{"server":<28}{"ok":>6}{"wall s":>9}{"req/s":>9}')
+            for label, run, path in [
+                (f'wsgi ({options["workers"]} threads)', self.run_wsgi, f'/api/properties/{property_obj.pk}/media/archive/'),
+                ('asgi (1 event loop)', self.run_asgi, f'/api/async/properties/{property_obj.pk}/media/archive/'),
+            ]:
+                start = time.perf_counter()
+                statuses = run(path, token, options)
+                elapsed = time.perf_counter() - start
+                ok = statuses.count(200)
+                self.stdout.write(f'{label:<28}{ok:>6}{elapsed:>9.2f}{len(statuses) / elapsed:>9.1f}')
+        finally:
+            for name in names:
+                default_storage.delete(name)
+            property_obj.delete()
+            service.delete()
+            user.delete()
+
+    def run_wsgi(self, path, token, options):
+        handler = WSGIHandler()
+
+        def client(_):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+                'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+                'HTTP_AUTHORIZATION': f'Bearer {token}', 'wsgi.input': BytesIO(), 'wsgi.url_scheme': 'http',
+            }
+            result = {}
+            response = handler(environ, lambda status, headers: result.setdefault('status', int(status[:3])))
+            try:
+                for _chunk in response:
+                    # The worker thread blocks writing to a slow socket
+                    time.sleep(options['delay'])
+            finally:
+                response.close()
+            return result['status']
+
+        with ThreadPoolExecutor(options['workers']) as pool:
+            return list(pool.map(client, range(options['clients'])))
+
+    def run_asgi(self, path, token, options):
+        handler = ASGIHandler()
+
+        async def client():
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': path, 'root_path': '',
+                'query_string': b'', 'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+                'headers': [(b'host', b'localhost'), (b'authorization', f'Bearer {token}'.encode())],
+            }
+            result = {}
+            sent = False
+
+            async def receive():
+                nonlocal sent
+                if sent:
+                    # The client stays connected until the response ends
+                    await asyncio.Event().wait()
+                sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    result['status'] = message['status']
+                elif message.get('body'):
+                    await asyncio.sleep(options['delay'])
+
+            await handler(scope, receive, send)
+            return result['status']
+
+        async def main():
+            return await asyncio.gather(*(client() for _ in range(options['clients'])))
+
+        return asyncio.run(main())
@@ -0,0 +1,96 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.eager import plan_queryset
+from api.flat import FlatSerializer
+from api.models import Job, JobAddon, Media, Property, PropertyFeature, Service, User
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import JobSerializer, MediaSerializer, PropertySerializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Compare ModelSerializer + JSONRenderer against FlatSerializer + FastJSONRenderer '
+            'on seeded rows (rolled back afterwards) and check the output is byte-identical')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options['rows'])
+                self.run(options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def seed(self, n):
+        owner = User.objects.create_user(username='bench@example.com', email='bench@example.com')
+        service = Service.objects.create(name='Photography', description='', price=199, icon='camera')
+        properties = Property.objects.bulk_create([
+            Property(address=f'{i} Main St', city='Austin', state='TX', zip_code='78701',
+                     property_type='house', bedrooms=3, bathrooms='2.5', price='550000.00',
+                     description='Bright and open.', owner=owner)
+            for i in range(n)
+        ], batch_size=1000)
+        PropertyFeature.objects.bulk_create([
+            PropertyFeature(property=p, name=name) for p in properties for name in ('Pool', 'Garage')
+        ], batch_size=1000)
+        Media.objects.bulk_create([
+            Media(property=p, service=service, type='photo', file=f'property_media/{p.pk}.jpg',
+                  file_name=f'{p.pk}.jpg', file_size=4_000_000,
+                  derivatives=[{'width': 320, 'height': 213, 'format': 'jpg',
+                                'file': f'derivatives/{p.pk}_320w.jpg'}])
+            for p in properties
+        ], batch_size=1000)
+        jobs = Job.objects.bulk_create([
+            Job(property_address=f'{i} Main St', property_city='Austin', property_state='TX',
+                service_type='Photography', scheduled_date=date(2026, 1, 1) + timedelta(days=i % 365),
+                scheduled_time='10:00 AM', client_name='Client', client_email='client@example.com',
+                service_price='199.00', photographer=owner)
+            for i in range(n)
+        ], batch_size=1000)
+        JobAddon.objects.bulk_create([JobAddon(job=job, name='Drone', price=99) for job in jobs], batch_size=1000)
+
+    def timed(self, fn, repeat):
+        best, out = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            out = fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, out
+
+    def run(self, repeat):
+        if orjson is None:
+            self.stderr.write('orjson is not installed; FastJSONRenderer will fall back to json')
+        request = Request(APIRequestFactory().get('/'))
+        context = {'request': request}
+        self.stdout.write(f'{"serializer":<22}{"rows":>8}{"drf ms":>10}{"flat ms":>10}{"speedup":>9}')
+        for serializer_class, model in [(JobSerializer, Job), (MediaSerializer, Media),
+                                        (PropertySerializer, Property)]:
+            queryset = model.objects.order_by('pk')
+            flat = FlatSerializer(serializer_class, context=context)
+
+            drf_time, drf_body = self.timed(lambda: JSONRenderer().render(
+                serializer_class(plan_queryset(queryset, serializer_class), many=True, context=context).data),
+                repeat)
+            flat_time, flat_body = self.timed(lambda: FastJSONRenderer().render(
+                flat.to_representation(flat.values(queryset.all()))), repeat)
+
+            if drf_body != flat_body:
+                raise CommandError(f'{serializer_class.__name__}: flat output differs from DRF')
+            self.stdout.write(f'{serializer_class.__name__:<22}{queryset.count():>8}'
+                              f'{drf_time * 1000:>10.1f}{flat_time * 1000:>10.1f}'
+                              f'{drf_time / flat_time:>8.1f}x')
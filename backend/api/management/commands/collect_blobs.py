@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.blobs import collect_blobs
+
+
+class Command(BaseCommand):
+    help = 'Delete stored media blobs that nothing has referenced for BLOB_GC_GRACE seconds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=None,
+                            help='Seconds a blob must have been unreferenced (default: BLOB_GC_GRACE)')
+
+    def handle(self, *args, **options):
+        blobs, size = collect_blobs(options['grace'])
+        self.stdout.write(f'Deleted {blobs} blobs ({size} bytes)')
@@ -0,0 +1,61 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.availability import sync_availability_cities
+from api.conditional import touch
+from api.models import ZipCentroid
+from api.routing import place_key
+
+# Accepted header names per column (case-insensitive)
+COLUMNS = {
+    'zip_code': ('zip_code', 'zip', 'zipcode'),
+    'city': ('city', 'primary_city'),
+    'state': ('state', 'state_id'),
+    'latitude': ('latitude', 'lat'),
+    'longitude': ('longitude', 'lng', 'lon'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Replace the zip code centroid gazetteer used for route planning with a CSV/TSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File with zip code, city, state, latitude and longitude columns')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with open(options['path'], newline='', encoding='utf-8-sig') as f:
+            dialect = csv.Sniffer().sniff(f.read(4096), delimiters=',\t|')
+            f.seek(0)
+            reader = csv.DictReader(f, dialect=dialect)
+            headers = {name.strip().lower(): name for name in reader.fieldnames or []}
+            columns = {}
+            for column, names in COLUMNS.items():
+                name = next((headers[n] for n in names if n in headers), None)
+                if name is None:
+                    raise CommandError(f'No {column} column (one of: {", ".join(names)})')
+                columns[column] = name
+            with transaction.atomic():
+                ZipCentroid.objects.all().delete()
+                count = skipped = 0
+                batch = []
+                for row in reader:
+                    try:
+                        values = {column: row[name].strip() for column, name in columns.items()}
+                        centroid = ZipCentroid(zip_code=values['zip_code'].zfill(5), city=values['city'],
+                                               state=values['state'], place=place_key(values['city'], values['state']),
+                                               latitude=float(values['latitude']),
+                                               longitude=float(values['longitude']))
+                    except (AttributeError, ValueError):
+                        skipped += 1
+                        continue
+                    batch.append(centroid)
+                    if len(batch) >= options['batch_size']:
+                        count += len(ZipCentroid.objects.bulk_create(batch, ignore_conflicts=True))
+                        batch = []
+                count += len(ZipCentroid.objects.bulk_create(batch, ignore_conflicts=True))
+                touch(ZipCentroid)  # Every process's geocoder drops its cached points
+                sync_availability_cities()
+        self.stdout.write(f'Loaded {count} zip code centroids ({skipped} rows skipped)')
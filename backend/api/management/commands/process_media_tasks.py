@@ -0,0 +1,115 @@
+import os
+import time
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from django.utils import timezone
+
+from api.conditional import touch
+from api.derivatives import THUMBNAIL_WIDTH, delete_derivatives, render_derivatives
+from api.landing import invalidate_landing_page
+from api.models import Media, MediaTask
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnails and resized derivatives for queued Media on a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+        parser.add_argument('--batch-size', type=int, default=32)
+        parser.add_argument('--poll-interval', type=float, default=2.0)
+        parser.add_argument('--max-attempts', type=int, default=3)
+        parser.add_argument('--timeout', type=int, default=settings.MEDIA_TASK_TIMEOUT,
+                            help='Seconds after which a running task is taken to be abandoned')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit')
+        parser.add_argument('--backfill', action='store_true',
+                            help='Queue photos/videos that have no thumbnail yet before starting')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            self.backfill()
+
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                self.reclaim(options['timeout'], options['max_attempts'])
+                tasks = self.claim(options['batch_size'], options['max_attempts'])
+                if tasks:
+                    self.run_batch(pool, tasks, options['max_attempts'])
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
+
+    def backfill(self):
+        missing = (Media.objects
+                   .filter(type__in=['photo', 'video'])
+                   .filter(Q(thumbnail='') | Q(thumbnail__isnull=True))
+                   .exclude(tasks__status__in=['pending', 'running'])
+                   .values_list('pk', flat=True))
+        created = MediaTask.objects.bulk_create(
+            [MediaTask(media_id=pk) for pk in missing.iterator(chunk_size=2000)],
+            batch_size=2000,
+        )
+        self.stdout.write(f'Queued {len(created)} media for processing')
+
+    def reclaim(self, timeout, max_attempts):
+        """Put tasks left running by a worker that died back in the queue, counting the lost attempt"""
+        stale = MediaTask.objects.filter(status='running', started_at__lt=timezone.now() - timedelta(seconds=timeout))
+        error = 'Worker stopped before finishing'
+        failed = stale.filter(attempts__gte=max_attempts - 1).update(
+            status='failed', attempts=F('attempts') + 1, finished_at=timezone.now(), error=error)
+        requeued = stale.update(status='pending', attempts=F('attempts') + 1, error=error)
+        if failed or requeued:
+            self.stderr.write(f'Reclaimed {requeued + failed} abandoned tasks ({failed} failed)')
+
+    def claim(self, batch_size, max_attempts):
+        """Mark up to ``batch_size`` pending tasks as running; safe with several workers"""
+        candidates = (MediaTask.objects
+                      .filter(status='pending', attempts__lt=max_attempts)
+                      .order_by('created_at')
+                      .values_list('pk', flat=True)[:batch_size])
+        claimed = []
+        for pk in candidates:
+            if MediaTask.objects.filter(pk=pk, status='pending').update(
+                    status='running', started_at=timezone.now()):
+                claimed.append(pk)
+        return list(MediaTask.objects.filter(pk__in=claimed).select_related('media'))
+
+    def run_batch(self, pool, tasks, max_attempts):
+        futures = {}
+        for task in tasks:
+            media = task.media
+            stem = f'{media.pk}_{os.path.splitext(os.path.basename(media.file.name))[0]}'
+            future = pool.submit(render_derivatives, media.file.path, str(settings.MEDIA_ROOT),
+                                 stem, media.type)
+            futures[future] = task
+
+        for future in as_completed(futures):
+            task = futures[future]
+            task.attempts += 1
+            task.finished_at = timezone.now()
+            try:
+                derivatives = future.result()
+            except Exception as exc:
+                task.error = str(exc)
+                task.status = 'failed' if task.attempts >= max_attempts else 'pending'
+                task.save(update_fields=['attempts', 'finished_at', 'error', 'status'])
+                self.stderr.write(f'Media {task.media_id}: {exc}')
+                continue
+
+            thumbnail = next((d['file'] for d in derivatives
+                              if d['format'] == 'jpg' and d['file'].endswith(f'_{THUMBNAIL_WIDTH}w.jpg')), None)
+            if not Media.objects.filter(pk=task.media_id).update(derivatives=derivatives, thumbnail=thumbnail):
+                delete_derivatives(str(settings.MEDIA_ROOT), derivatives)  # Deleted while it rendered
+                task.status = 'done'
+                task.save(update_fields=['attempts', 'finished_at', 'status'])
+                continue
+            touch(Media)  # update() sends no signals; ETags on media lists must change
+            invalidate_landing_page(task.media.property_id)
+            task.status = 'done'
+            task.error = None
+            task.save(update_fields=['attempts', 'finished_at', 'error', 'status'])
+            self.stdout.write(f'Media {task.media_id}: {len(derivatives)} derivatives')
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.availability import sync_booking, sync_photographer_availability
+from api.models import Availability, Booking, Job, Photographer, PropertyService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the Availability/Booking interval tables from photographers, jobs and property services'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        Availability.objects.all().delete()
+        Booking.objects.all().delete()
+
+        for photographer in Photographer.objects.only('pk', 'available_dates', 'base_zip_code').iterator(chunk_size=1000):
+            sync_photographer_availability(photographer)
+
+        jobs = Job.objects.only('pk', 'photographer_id', 'scheduled_date', 'scheduled_time', 'status')
+        for job in jobs.iterator(chunk_size=1000):
+            sync_booking(job.photographer_id, job.scheduled_date, job.scheduled_time,
+                         active=job.status != 'cancelled', job=job)
+
+        services = (PropertyService.objects
+                    .filter(photographer__isnull=False, scheduled_date__isnull=False)
+                    .only('pk', 'photographer_id', 'scheduled_date', 'scheduled_time'))
+        for service in services.iterator(chunk_size=1000):
+            sync_booking(service.photographer_id, service.scheduled_date, service.scheduled_time,
+                         property_service=service)
+
+        self.stdout.write(f'{Availability.objects.count()} availability intervals, '
+                          f'{Booking.objects.count()} bookings')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute dashboard rollups from orders, jobs and payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only rebuild these user ids (repeatable)')
+
+    def handle(self, *args, **options):
+        buckets = refresh_rollups(options['users'])
+        self.stdout.write(f'Rebuilt {buckets} rollup buckets')
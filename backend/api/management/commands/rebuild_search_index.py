@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild search documents (and the FTS index) from properties, customers and jobs'
+
+    def handle(self, *args, **options):
+        count = rebuild_search_index()
+        self.stdout.write(f'Indexed {count} documents')
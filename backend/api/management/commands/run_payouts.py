@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api.models import PayoutRun
+from api.payouts import BATCH, claim, create_payments, csv_lines, settle
+
+
+class Command(BaseCommand):
+    help = ('Create payments for completed jobs, claim pending ones into a payout run and write its CSV; '
+            'or re-export (--export) or settle (--settle) an earlier run')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--through', help='Only claim payments dated up to this day (YYYY-MM-DD)')
+        parser.add_argument('--output', help='CSV path (default: payout-run-<id>.csv)')
+        parser.add_argument('--batch-size', type=int, default=BATCH)
+        parser.add_argument('--export', type=int, metavar='RUN', help='Write the CSV of an earlier run')
+        parser.add_argument('--settle', type=int, metavar='RUN', help="Mark a run's payments paid")
+
+    def get_run(self, pk):
+        try:
+            return PayoutRun.objects.get(pk=pk)
+        except PayoutRun.DoesNotExist:
+            raise CommandError(f'No payout run {pk}')
+
+    def handle(self, *args, **options):
+        if options['settle']:
+            paid = settle(self.get_run(options['settle']))
+            self.stdout.write(f"Marked {paid} payments of run {options['settle']} paid")
+            return
+        if options['export']:
+            self.export(self.get_run(options['export']), options['output'])
+            return
+
+        through = None
+        if options['through']:
+            through = parse_date(options['through'])
+            if through is None:
+                raise CommandError('--through must be YYYY-MM-DD')
+        created, total = create_payments(batch_size=options['batch_size'])
+        self.stdout.write(f'Created {created} payments ({total})')
+        run = claim(through=through)
+        if run is None:
+            self.stdout.write('Nothing to pay out')
+            return
+        self.stdout.write(f'Payout run {run.pk}: {run.payment_count} payments, {run.total}')
+        self.export(run, options['output'])
+
+    def export(self, run, path):
+        path = path or f'payout-run-{run.pk}.csv'
+        with open(path, 'w', newline='', encoding='utf-8') as fh:
+            fh.writelines(csv_lines(run))
+        self.stdout.write(f'Wrote {path}')
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from api.seeding import DEFAULT_COUNTS, PASSWORD, Seeder, flush
+
+
+class Command(BaseCommand):
+    help = ('Seed deterministic synthetic users, properties, media, orders, jobs and payments '
+            'for load testing, then rebuild bookings, rollups and the search index')
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_COUNTS.items():
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiply every count, e.g. 0.01')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--skip-derived', action='store_true',
+                            help="Don't rebuild bookings, availability, rollups and search documents")
+        parser.add_argument('--flush', action='store_true', help='Delete previously seeded rows first')
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            self.stdout.write(f'Flushed {flush()} rows')
+        counts = {name: max(int(options[name] * options['scale']), 1) for name in DEFAULT_COUNTS}
+        seeder = Seeder(counts, seed=options['seed'], batch_size=options['batch_size'],
+                        log=lambda message: self.stdout.write(f'  {message}'))
+        start = time.perf_counter()
+        try:
+            seeder.run(derived=not options['skip_derived'])
+        except IntegrityError as exc:
+            raise CommandError(f'{exc} (seeded rows already exist; rerun with --flush)')
+        self.stdout.write(f'Seeded in {time.perf_counter() - start:.1f}s; '
+                          f'every seeded user logs in with password {PASSWORD!r}')
@@ -0,0 +1,337 @@
+"""Per-request instrumentation, a Prometheus ``/metrics`` endpoint and a
+slow-request sampling profiler.
+
+``InstrumentationMiddleware`` records, per view: request count by status,
+a latency histogram, DB query count and time, serializer time
+(``serializer.data`` and ``FlatSerializer``, including any lazy queries they
+run), render time and response bytes. Like the auth caches the numbers are
+per process, so Prometheus scrapes each worker.
+
+Queries are counted by an execute wrapper installed on every connection as
+it opens, in whatever thread that is; it adds to the stats of the request
+in the current context. ``sync_to_async`` carries that context into the
+thread that runs an async view's queries, so they count under ASGI too.
+
+With ``PROFILE_SLOW_REQUESTS`` set to a threshold in milliseconds, one
+background thread samples the stacks of in-flight requests every
+``PROFILE_INTERVAL`` seconds; requests slower than the threshold are written
+to ``PROFILE_DIR`` as collapsed stacks (``frame;frame;frame count``), the
+input format of flamegraph.pl and speedscope. Stacks are sampled per thread,
+which says nothing about a coroutine, so only requests the middleware serves
+in sync mode are profiled.
+
+``/metrics`` answers requests bearing ``METRICS_TOKEN``; without one set, only
+clients in ``METRICS_ALLOWED_NETWORKS`` (loopback by default) may scrape.
+"""
+import hmac
+import ipaddress
+import logging
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.text import get_valid_filename
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'aerea'
+PHASES = ('db', 'serialize', 'render')
+
+_current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """What one request spent, filled in while it runs"""
+
+    __slots__ = ('queries', 'seconds', 'active', 'elapsed')
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.active = set()
+        self.elapsed = 0.0
+
+
+def count_query(execute, sql, params, many, context):
+    """Execute wrapper charging the query to the current request, if any"""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    stats.queries += 1
+    with timed('db'):
+        return execute(sql, params, many, context)
+
+
+def install_query_hook(connection, **kwargs):
+    """Add ``count_query`` to ``connection`` once; also the ``connection_created`` receiver"""
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+connection_created.connect(install_query_hook)
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to the current request's ``phase`` (outermost block only)"""
+    stats = _current.get()
+    if stats is None or phase in stats.active:
+        yield
+        return
+    stats.active.add(phase)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.active.discard(phase)
+        stats.seconds[phase] += time.perf_counter() - start
+
+
+def instrument_serializers():
+    """Time ``.data`` on every DRF serializer; ``Serializer`` and ``ListSerializer`` both go through it"""
+    original = BaseSerializer.data.fget
+    if getattr(original, 'instrumented', False):
+        return
+
+    def data(self):
+        with timed('serialize'):
+            return original(self)
+    data.instrumented = True
+    BaseSerializer.data = property(data)
+
+
+class Registry:
+    """Thread-safe counters and latency histograms keyed by ``(view, method)``"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = Counter()
+            self.latency = defaultdict(lambda: [0] * (len(self.buckets) + 1))
+            self.latency_sum = Counter()
+            self.queries = Counter()
+            self.phases = defaultdict(Counter)
+            self.bytes = Counter()
+
+    def observe(self, view, method, status, seconds, stats, size):
+        key = (view, method)
+        with self._lock:
+            self.requests[(view, method, str(status))] += 1
+            counts = self.latency[key]
+            counts[next((i for i, bound in enumerate(self.buckets) if seconds <= bound), -1)] += 1
+            self.latency_sum[key] += seconds
+            self.queries[key] += stats.queries
+            for phase, spent in stats.seconds.items():
+                self.phases[phase][key] += spent
+            self.bytes[key] += size
+
+    def render(self):
+        """The Prometheus text exposition format"""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {PREFIX}_{name} {help_text}')
+            lines.append(f'# TYPE {PREFIX}_{name} {kind}')
+
+        def sample(name, labels, value):
+            pairs = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            lines.append(f'{PREFIX}_{name}{{{pairs}}} {value}')
+
+        with self._lock:
+            family('requests_total', 'counter', 'Requests by view, method and status.')
+            for (view, method, status), n in sorted(self.requests.items()):
+                sample('requests_total', {'view': view, 'method': method, 'status': status}, n)
+
+            family('request_duration_seconds', 'histogram', 'Request latency.')
+            for (view, method), counts in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, n in zip((*self.buckets, '+Inf'), counts):
+                    cumulative += n
+                    sample('request_duration_seconds_bucket', {'view': view, 'method': method, 'le': bound},
+                           cumulative)
+                sample('request_duration_seconds_sum', {'view': view, 'method': method},
+                       round(self.latency_sum[(view, method)], 6))
+                sample('request_duration_seconds_count', {'view': view, 'method': method}, cumulative)
+
+            family('db_queries_total', 'counter', 'Database queries issued.')
+            for (view, method), n in sorted(self.queries.items()):
+                sample('db_queries_total', {'view': view, 'method': method}, n)
+            for phase, help_text in (('db', 'Time spent executing SQL.'),
+                                     ('serialize', 'Time spent in serializers.'),
+                                     ('render', 'Time spent rendering responses.')):
+                family(f'{phase}_seconds_total', 'counter', help_text)
+                for (view, method), spent in sorted(self.phases[phase].items()):
+                    sample(f'{phase}_seconds_total', {'view': view, 'method': method}, round(spent, 6))
+
+            family('response_bytes_total', 'counter', 'Response body bytes (Content-Length for streams).')
+            for (view, method), n in sorted(self.bytes.items()):
+                sample('response_bytes_total', {'view': view, 'method': method}, n)
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+registry = Registry(settings.METRICS_LATENCY_BUCKETS)
+
+
+class SamplingProfiler:
+    """One daemon thread that samples the stacks of registered threads"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._stacks = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._stacks[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._stacks.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, stacks in self._stacks.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[collapse(frame)] += 1
+
+
+def collapse(frame):
+    """``module.func;module.func;...`` from the outermost frame in"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{frame.f_globals.get("__name__", "?")}.{getattr(code, "co_qualname", code.co_name)}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def view_name(request, view_func):
+    """``PropertyViewSet.list``-style label; bounded by the URLconf, never by the path"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return f'{view_func.__module__}.{view_func.__qualname__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{cls.__name__}.{actions.get(request.method.lower(), request.method.lower())}'
+
+
+class InstrumentationMiddleware:
+    """Record timings for every request into ``registry`` (and profile slow sync ones)"""
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.threshold = settings.PROFILE_SLOW_REQUESTS
+        self.profiler = SamplingProfiler(settings.PROFILE_INTERVAL) if self.threshold is not None else None
+        instrument_serializers()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        thread_id = threading.get_ident()
+        if self.profiler:
+            self.profiler.start(thread_id)
+        try:
+            with self.measure(request) as stats:
+                response = self.get_response(request)
+        finally:
+            stacks = self.profiler.stop(thread_id) if self.profiler else None
+        self.observe(request, response, stats)
+        if stacks is not None and stats.elapsed * 1000 >= self.threshold:
+            self.dump(request, stats.elapsed, stacks)
+        return response
+
+    async def __acall__(self, request):
+        with self.measure(request) as stats:
+            response = await self.get_response(request)
+        self.observe(request, response, stats)
+        return response
+
+    @contextmanager
+    def measure(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        request._metrics_view = 'unmatched'
+        start = time.perf_counter()
+        # Connections opened before the receiver was connected
+        for connection in connections.all(initialized_only=True):
+            install_query_hook(connection)
+        try:
+            yield stats
+        finally:
+            _current.reset(token)
+            stats.elapsed = time.perf_counter() - start
+
+    def observe(self, request, response, stats):
+        size = int(response.get('Content-Length') or 0) if response.streaming else len(response.content)
+        registry.observe(request._metrics_view, request.method, response.status_code, stats.elapsed, stats, size)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view = view_name(request, view_func)
+
+    def process_template_response(self, request, response):
+        # DRF responses render after this hook; the callback closes the timer
+        stats = _current.get()
+        if stats is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                stats.seconds['render'] += time.perf_counter() - start
+            response.add_post_render_callback(rendered)
+        return response
+
+    def dump(self, request, elapsed, stacks):
+        directory = settings.PROFILE_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / get_valid_filename(
+            f'{time.strftime("%Y%m%dT%H%M%S")}-{request._metrics_view}-{elapsed * 1000:.0f}ms.folded')
+        path.write_text(''.join(f'{stack} {n}\n' for stack, n in stacks.most_common()))
+        logger.warning('Slow request %s %s took %.0fms; stacks in %s', request.method, request.path,
+                       elapsed * 1000, path)
+
+
+def _internal(request):
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network) for network in settings.METRICS_ALLOWED_NETWORKS)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint: ``Authorization: Bearer <METRICS_TOKEN>`` if that is set, else internal clients only"""
+    expected = settings.METRICS_TOKEN
+    if expected:
+        allowed = hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {expected}')
+    else:
+        allowed = _internal(request)
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_media_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Availability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_minute', models.IntegerField()),
+                ('end_minute', models.IntegerField()),
+                ('city', models.CharField(blank=True, max_length=100, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Availability',
+                'db_table': 'availability',
+            },
+        ),
+        migrations.CreateModel(
+            name='Booking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_minute', models.IntegerField()),
+                ('end_minute', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'bookings',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='photographer',
+            index=models.Index(fields=['-rating', '-completed_jobs'], name='photographers_rank_idx'),
+        ),
+        migrations.AddField(
+            model_name='availability',
+            name='photographer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability', to='api.photographer'),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='job',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='booking', to='api.job'),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='photographer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='property_service',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='booking', to='api.propertyservice'),
+        ),
+        migrations.AddIndex(
+            model_name='availability',
+            index=models.Index(fields=['photographer', 'date', 'start_minute', 'end_minute'], name='availability_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='availability',
+            index=models.Index(fields=['date', 'city'], name='availability_date_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['photographer', 'date', 'start_minute', 'end_minute'], name='bookings_slot_idx'),
+        ),
+    ]
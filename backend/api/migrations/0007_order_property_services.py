@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='property_services',
+            field=models.ManyToManyField(blank=True, related_name='orders', through='api.OrderService', to='api.propertyservice'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# SQLite only: an external-content FTS5 index over search_documents.body,
+# maintained by triggers so every ORM write keeps it current.
+FTS_SQL = [
+    "CREATE VIRTUAL TABLE search_documents_fts USING fts5("
+    "body, content='search_documents', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER search_documents_ai AFTER INSERT ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(rowid, body) VALUES (new.id, new.body); END",
+    "CREATE TRIGGER search_documents_ad AFTER DELETE ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(search_documents_fts, rowid, body) VALUES ('delete', old.id, old.body); END",
+    "CREATE TRIGGER search_documents_au AFTER UPDATE ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(search_documents_fts, rowid, body) VALUES ('delete', old.id, old.body); "
+    "INSERT INTO search_documents_fts(rowid, body) VALUES (new.id, new.body); END",
+]
+DROP_FTS_SQL = [
+    'DROP TRIGGER IF EXISTS search_documents_au',
+    'DROP TRIGGER IF EXISTS search_documents_ad',
+    'DROP TRIGGER IF EXISTS search_documents_ai',
+    'DROP TABLE IF EXISTS search_documents_fts',
+]
+
+
+def create_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in FTS_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_FTS_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_order_property_services'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('property', 'Property'), ('customer', 'Customer'), ('job', 'Job')], max_length=20)),
+                ('object_id', models.IntegerField()),
+                ('body', models.TextField()),
+                ('property_type', models.CharField(blank=True, max_length=20, null=True)),
+                ('status', models.CharField(blank=True, max_length=20, null=True)),
+                ('city', models.CharField(blank=True, max_length=100, null=True)),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'search_documents',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='search_documents_kind_object_uniq')],
+            },
+        ),
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
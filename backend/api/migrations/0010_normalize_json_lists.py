@@ -0,0 +1,192 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:25
+
+from decimal import Decimal, InvalidOperation
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH = 2000
+
+# (model, JSON field, child model, parent FK) for the lists that become child tables
+CHILD_LISTS = [
+    ('Photographer', 'specialties', 'PhotographerSpecialty', 'photographer'),
+    ('Property', 'features', 'PropertyFeature', 'property'),
+    ('Order', 'travel_fees', 'OrderTravelFee', 'order'),
+    ('Job', 'addons', 'JobAddon', 'job'),
+]
+# (model, JSON field of ids, many-to-many field, target model)
+ID_LISTS = [
+    ('AddonService', 'applicable_services', 'applicable_services', 'Service'),
+    ('PropertyService', 'addon_ids', 'addons', 'AddonService'),
+]
+
+
+def _decimal(value):
+    try:
+        return Decimal(str(value)).quantize(Decimal('0.01'))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _children(child, items, users):
+    """Child-row kwargs for one JSON list; malformed entries are dropped"""
+    for item in items if isinstance(items, list) else []:
+        if child in ('PhotographerSpecialty', 'PropertyFeature'):
+            if isinstance(item, str) and item.strip():
+                yield {'name': item.strip()[:100]}
+        elif isinstance(item, dict) and child == 'OrderTravelFee':
+            fee = _decimal(item.get('fee'))
+            if fee is not None:
+                photographer_id = _int(item.get('photographerId'))
+                yield {'photographer_id': photographer_id if photographer_id in users else None, 'fee': fee}
+        elif isinstance(item, dict) and child == 'JobAddon':
+            price = _decimal(item.get('price'))
+            if item.get('name') and price is not None:
+                yield {'name': str(item['name'])[:100], 'price': price}
+
+
+def forwards(apps, schema_editor):
+    users = set(apps.get_model(settings.AUTH_USER_MODEL).objects.values_list('pk', flat=True))
+    for model_name, field, child_name, fk in CHILD_LISTS:
+        model, child = apps.get_model('api', model_name), apps.get_model('api', child_name)
+        rows = []
+        for pk, items in model.objects.values_list('pk', f'{field}_json').iterator(chunk_size=BATCH):
+            rows += [child(**{f'{fk}_id': pk}, **attrs) for attrs in _children(child_name, items, users)]
+            if len(rows) >= BATCH:
+                child.objects.bulk_create(rows)
+                rows = []
+        child.objects.bulk_create(rows)
+
+    for model_name, field, m2m, target_name in ID_LISTS:
+        model = apps.get_model('api', model_name)
+        through = model._meta.get_field(m2m).remote_field.through
+        source, target = f'{model._meta.model_name}_id', f'{target_name.lower()}_id'
+        existing = set(apps.get_model('api', target_name).objects.values_list('pk', flat=True))
+        rows = []
+        for pk, ids in model.objects.values_list('pk', f'{field}_json').iterator(chunk_size=BATCH):
+            ids = {_int(i) for i in ids} & existing if isinstance(ids, list) else set()
+            rows += [through(**{source: pk, target: i}) for i in sorted(ids)]
+            if len(rows) >= BATCH:
+                through.objects.bulk_create(rows)
+                rows = []
+        through.objects.bulk_create(rows)
+
+
+def backwards(apps, schema_editor):
+    def item(child_name, row):
+        if child_name in ('PhotographerSpecialty', 'PropertyFeature'):
+            return row.name
+        if child_name == 'OrderTravelFee':
+            return {'photographerId': row.photographer_id, 'fee': float(row.fee)}
+        return {'name': row.name, 'price': float(row.price)}
+
+    for model_name, field, child_name, fk in CHILD_LISTS:
+        model, child = apps.get_model('api', model_name), apps.get_model('api', child_name)
+        lists = {}
+        for row in child.objects.order_by('id').iterator(chunk_size=BATCH):
+            lists.setdefault(getattr(row, f'{fk}_id'), []).append(item(child_name, row))
+        for pk, items in lists.items():
+            model.objects.filter(pk=pk).update(**{f'{field}_json': items})
+
+    for model_name, field, m2m, target_name in ID_LISTS:
+        model = apps.get_model('api', model_name)
+        through = model._meta.get_field(m2m).remote_field.through
+        source, target = f'{model._meta.model_name}_id', f'{target_name.lower()}_id'
+        lists = {}
+        for pk, target_id in through.objects.order_by('id').values_list(source, target).iterator(chunk_size=BATCH):
+            lists.setdefault(pk, []).append(target_id)
+        for pk, ids in lists.items():
+            model.objects.filter(pk=pk).update(**{f'{field}_json': ids})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_query_indexes'),
+    ]
+
+    operations = [
+        # Move the JSON columns aside so the new relations can take their names
+        migrations.RenameField(model_name='photographer', old_name='specialties', new_name='specialties_json'),
+        migrations.RenameField(model_name='property', old_name='features', new_name='features_json'),
+        migrations.RenameField(model_name='order', old_name='travel_fees', new_name='travel_fees_json'),
+        migrations.RenameField(model_name='job', old_name='addons', new_name='addons_json'),
+        migrations.RenameField(model_name='addonservice', old_name='applicable_services', new_name='applicable_services_json'),
+        migrations.RenameField(model_name='propertyservice', old_name='addon_ids', new_name='addon_ids_json'),
+        migrations.CreateModel(
+            name='PhotographerSpecialty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=100)),
+                ('photographer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='specialties', to='api.photographer')),
+            ],
+            options={
+                'verbose_name_plural': 'Photographer specialties',
+                'db_table': 'photographer_specialties',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PropertyFeature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=100)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='features', to='api.property')),
+            ],
+            options={
+                'db_table': 'property_features',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderTravelFee',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fee', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='travel_fees', to='api.order')),
+                ('photographer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'order_travel_fees',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='JobAddon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=100)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='addons', to='api.job')),
+            ],
+            options={
+                'db_table': 'job_addons',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='addonservice',
+            name='applicable_services',
+            field=models.ManyToManyField(blank=True, related_name='addons', to='api.service'),
+        ),
+        migrations.AddField(
+            model_name='propertyservice',
+            name='addons',
+            field=models.ManyToManyField(blank=True, related_name='property_services', to='api.addonservice'),
+        ),
+        migrations.RunPython(forwards, backwards),
+        migrations.RemoveField(model_name='photographer', name='specialties_json'),
+        migrations.RemoveField(model_name='property', name='features_json'),
+        migrations.RemoveField(model_name='order', name='travel_fees_json'),
+        migrations.RemoveField(model_name='job', name='addons_json'),
+        migrations.RemoveField(model_name='addonservice', name='applicable_services_json'),
+        migrations.RemoveField(model_name='propertyservice', name='addon_ids_json'),
+    ]
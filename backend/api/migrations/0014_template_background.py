@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='template',
+            name='background_color',
+            field=models.CharField(default='#ffffff', max_length=20),
+        ),
+    ]
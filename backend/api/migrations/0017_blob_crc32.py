@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_payout_runs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blob',
+            name='crc32',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
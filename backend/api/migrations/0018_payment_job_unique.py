@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:46
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def drop_duplicate_pending_payments(apps, schema_editor):
+    """Keep one payment per job: unclaimed pending duplicates (what racing
+    create_payments runs left behind) go; anything already claimed or paid stays"""
+    Payment = apps.get_model('api', 'Payment')
+    jobs = (Payment.objects.values('job_id').annotate(n=Count('id')).filter(n__gt=1)
+            .values_list('job_id', flat=True))
+    for job_id in jobs.iterator():
+        payments = list(Payment.objects.filter(job_id=job_id).order_by('id').values_list('id', 'status', 'payout_run_id'))
+        settled = [pk for pk, status, run in payments if status != 'pending' or run is not None]
+        keep = settled[0] if settled else payments[0][0]
+        Payment.objects.filter(job_id=job_id, status='pending', payout_run__isnull=True).exclude(pk=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_blob_crc32'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_pending_payments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(fields=('job',), name='payments_job_unique'),
+        ),
+    ]
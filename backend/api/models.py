@@ -1,10 +1,19 @@
+import uuid
+
 from django.db import models
 
 # Create your models here.
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.core.files.storage import storages
 from django.utils import timezone
 
+
+def media_storage():
+    """Content-addressed storage for uploaded media (``STORAGES['media']``)"""
+    return storages['media']
+
+
 class User(AbstractUser):
     """Custom User model for brokers, photographers, and admins"""
     ROLE_CHOICES = [
@@ -26,14 +35,25 @@ class Photographer(models.Model):
     """Extended profile for photographers"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='photographer_profile')
     bio = models.TextField()
-    specialties = models.JSONField(default=list)  # Array of strings
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     completed_jobs = models.IntegerField(default=0)
     available_dates = models.JSONField(default=list)  # Array of ISO date strings
     travel_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    base_zip_code = models.CharField(max_length=10, blank=True, null=True)  # Where day routes start
     
     class Meta:
         db_table = 'photographers'
+        indexes = [models.Index(fields=['-rating', '-completed_jobs'], name='photographers_rank_idx')]
+
+class PhotographerSpecialty(models.Model):
+    """One of a photographer's specialties, in the order they were listed"""
+    photographer = models.ForeignKey(Photographer, on_delete=models.CASCADE, related_name='specialties')
+    name = models.CharField(max_length=100, db_index=True)
+    
+    class Meta:
+        db_table = 'photographer_specialties'
+        ordering = ['id']
+        verbose_name_plural = 'Photographer specialties'
 
 class Customer(models.Model):
     """Client/Customer model"""
@@ -46,6 +66,7 @@ class Customer(models.Model):
     
     class Meta:
         db_table = 'customers'
+        indexes = [models.Index(fields=['created_at', 'id'], name='customers_created_id_idx')]
 
 class Property(models.Model):
     """Real estate property model"""
@@ -81,16 +102,28 @@ class Property(models.Model):
     lot_size = models.IntegerField(blank=True, null=True)
     price = models.DecimalField(max_digits=15, decimal_places=2, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
-    features = models.JSONField(default=list, blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     landing_page_template = models.CharField(max_length=20, choices=TEMPLATE_CHOICES, blank=True, null=True)
     created_at = models.DateTimeField(default=timezone.now)
-    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='properties')
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='properties', db_index=False)  # Leads properties_owner_status_idx
     
     class Meta:
         db_table = 'properties'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='properties_created_id_idx'),
+            models.Index(fields=['owner', 'status', 'created_at', 'id'], name='properties_owner_status_idx'),
+        ]
         verbose_name_plural = 'Properties'
 
+class PropertyFeature(models.Model):
+    """One of a property's listed features (Pool, Garage...), in order"""
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='features')
+    name = models.CharField(max_length=100, db_index=True)
+    
+    class Meta:
+        db_table = 'property_features'
+        ordering = ['id']
+
 class Service(models.Model):
     """Available services (Photography, Video, etc.)"""
     name = models.CharField(max_length=100)
@@ -106,7 +139,7 @@ class AddonService(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    applicable_services = models.JSONField(default=list)  # Array of service IDs
+    applicable_services = models.ManyToManyField(Service, related_name='addons', blank=True)
     
     class Meta:
         db_table = 'addon_services'
@@ -126,7 +159,7 @@ class PropertyService(models.Model):
     scheduled_time = models.CharField(max_length=20, blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     notes = models.TextField(blank=True, null=True)
-    addon_ids = models.JSONField(default=list, blank=True, null=True)  # Array of addon service IDs
+    addons = models.ManyToManyField(AddonService, related_name='property_services', blank=True)
     
     class Meta:
         db_table = 'property_services'
@@ -143,13 +176,30 @@ class Order(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='orders')
     customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
-    travel_fees = models.JSONField(default=list)  # Array of {photographerId, fee}
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     created_at = models.DateTimeField(default=timezone.now)
     due_date = models.DateField(blank=True, null=True)
+    property_services = models.ManyToManyField('PropertyService', through='OrderService', related_name='orders', blank=True)
     
     class Meta:
         db_table = 'orders'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='orders_created_id_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='orders_status_created_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(total_amount__gte=0), name='orders_total_amount_gte_0'),
+        ]
+
+class OrderTravelFee(models.Model):
+    """Travel fee charged on an order for one photographer"""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='travel_fees')
+    photographer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    fee = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    class Meta:
+        db_table = 'order_travel_fees'
+        ordering = ['id']
 
 class OrderService(models.Model):
     """Many-to-many relationship between orders and services"""
@@ -167,11 +217,12 @@ class Media(models.Model):
         ('3d-scan', '3D Scan'),
     ]
     
-    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='media')
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='media', db_index=False)  # Leads media_property_type_idx
     service = models.ForeignKey(Service, on_delete=models.CASCADE)
     type = models.CharField(max_length=20, choices=TYPE_CHOICES)
-    file = models.FileField(upload_to='property_media/')
+    file = models.FileField(upload_to='property_media/', storage=media_storage)
     thumbnail = models.ImageField(upload_to='thumbnails/', blank=True, null=True)
+    derivatives = models.JSONField(default=list, blank=True)  # Array of {width, height, format, file}
     file_name = models.CharField(max_length=255)
     file_size = models.BigIntegerField()  # Size in bytes
     uploaded_at = models.DateTimeField(default=timezone.now)
@@ -179,6 +230,31 @@ class Media(models.Model):
     class Meta:
         db_table = 'media'
         verbose_name_plural = 'Media'
+        indexes = [
+            models.Index(fields=['uploaded_at', 'id'], name='media_uploaded_id_idx'),
+            models.Index(fields=['property', 'type', 'uploaded_at', 'id'], name='media_property_type_idx'),
+        ]
+
+class MediaTask(models.Model):
+    """Database-backed queue entry for background media processing"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    media = models.ForeignKey(Media, on_delete=models.CASCADE, related_name='tasks')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'media_tasks'
+        indexes = [models.Index(fields=['status', 'created_at'], name='media_tasks_status_idx')]
 
 class Job(models.Model):
     """Photographer job model"""
@@ -200,14 +276,45 @@ class Job(models.Model):
     client_email = models.EmailField()
     client_phone = models.CharField(max_length=20, blank=True, null=True)
     service_price = models.DecimalField(max_digits=10, decimal_places=2)
-    addons = models.JSONField(default=list)  # Array of {name, price}
     notes = models.TextField(blank=True, null=True)
-    photographer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs')
+    photographer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs', db_index=False)  # Leads jobs_photographer_idx
     delivered_at = models.DateTimeField(blank=True, null=True)
     uploaded_files = models.JSONField(default=list, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'jobs'
+        indexes = [
+            models.Index(fields=['scheduled_date', 'id'], name='jobs_scheduled_id_idx'),
+            models.Index(fields=['photographer', 'status', 'scheduled_date', 'id'], name='jobs_photographer_idx'),
+            models.Index(fields=['photographer', 'updated_at'], name='jobs_photographer_sync_idx'),
+        ]
+
+class JobAddon(models.Model):
+    """An addon sold with a job, priced at booking time"""
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='addons')
+    name = models.CharField(max_length=100, db_index=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    class Meta:
+        db_table = 'job_addons'
+        ordering = ['id']
+
+class PayoutRun(models.Model):
+    """A batch of payments claimed together for one payout, until they're paid"""
+    STATUS_CHOICES = [
+        ('processing', 'Processing'),
+        ('paid', 'Paid'),
+    ]
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='processing')
+    payment_count = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)  # Amounts plus travel fees
+    created_at = models.DateTimeField(default=timezone.now)
+    paid_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'payout_runs'
 
 class Payment(models.Model):
     """Photographer payment model"""
@@ -217,15 +324,28 @@ class Payment(models.Model):
         ('paid', 'Paid'),
     ]
     
-    photographer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payments')
+    photographer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payments', db_index=False)  # Leads payments_photographer_idx
     job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='payments')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     travel_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     date = models.DateField(blank=True, null=True)
+    payout_run = models.ForeignKey(PayoutRun, on_delete=models.SET_NULL, null=True, blank=True, related_name='payments')
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'payments'
+        indexes = [
+            models.Index(fields=['photographer', 'status', 'date'], name='payments_photographer_idx'),
+            models.Index(fields=['photographer', 'updated_at'], name='payments_photographer_sync_idx'),
+            # Payout runs only ever look at what is still owed
+            models.Index(fields=['photographer', 'date'], condition=models.Q(status='pending'),
+                         name='payments_pending_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(amount__gte=0), name='payments_amount_gte_0'),
+            models.UniqueConstraint(fields=['job'], name='payments_job_unique'),
+        ]
 
 class Template(models.Model):
     """Social media template model"""
@@ -234,7 +354,149 @@ class Template(models.Model):
     thumbnail = models.ImageField(upload_to='template_thumbnails/')
     width = models.IntegerField()
     height = models.IntegerField()
+    background_color = models.CharField(max_length=20, default='#ffffff')
     elements = models.JSONField(default=list)
     
     class Meta:
-        db_table = 'templates'
\ No newline at end of file
+        db_table = 'templates'
+
+class UploadSession(models.Model):
+    """Resumable (tus-style) upload in progress"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, null=True, blank=True, related_name='upload_sessions')
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, null=True, blank=True)
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, null=True, blank=True, related_name='upload_sessions')
+    type = models.CharField(max_length=20, choices=Media.TYPE_CHOICES)
+    file_name = models.CharField(max_length=255)
+    file_size = models.BigIntegerField()  # Declared total length in bytes
+    offset = models.BigIntegerField(default=0)  # Bytes received so far
+    media = models.ForeignKey(Media, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    sha256 = models.CharField(max_length=64, blank=True, null=True)  # Lets a known file skip the transfer
+    created_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'upload_sessions'
+
+class Availability(models.Model):
+    """Interval a photographer can be booked in, in minutes after midnight"""
+    photographer = models.ForeignKey(Photographer, on_delete=models.CASCADE, related_name='availability')
+    date = models.DateField()
+    start_minute = models.IntegerField()
+    end_minute = models.IntegerField()
+    city = models.CharField(max_length=100, blank=True, null=True)  # Null means anywhere
+    
+    class Meta:
+        db_table = 'availability'
+        verbose_name_plural = 'Availability'
+        indexes = [
+            models.Index(fields=['photographer', 'date', 'start_minute', 'end_minute'], name='availability_slot_idx'),
+            models.Index(fields=['date', 'city'], name='availability_date_city_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(start_minute__lt=models.F('end_minute')),
+                                   name='availability_interval_valid'),
+        ]
+
+class Booking(models.Model):
+    """Interval a photographer is busy, mirrored from a Job or PropertyService"""
+    photographer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookings')
+    date = models.DateField()
+    start_minute = models.IntegerField()
+    end_minute = models.IntegerField()
+    job = models.OneToOneField(Job, on_delete=models.CASCADE, null=True, blank=True, related_name='booking')
+    property_service = models.OneToOneField(PropertyService, on_delete=models.CASCADE, null=True, blank=True, related_name='booking')
+    
+    class Meta:
+        db_table = 'bookings'
+        indexes = [
+            models.Index(fields=['photographer', 'date', 'start_minute', 'end_minute'], name='bookings_slot_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(start_minute__lt=models.F('end_minute')),
+                                   name='bookings_interval_valid'),
+        ]
+
+class Rollup(models.Model):
+    """Running count/total for one (user, metric, key) dashboard bucket"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='rollups', db_index=False)  # Leads the unique constraint
+    metric = models.CharField(max_length=30)
+    key = models.CharField(max_length=30)  # Status or YYYY-MM
+    count = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    
+    class Meta:
+        db_table = 'rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'metric', 'key'], name='rollups_user_metric_key_uniq'),
+        ]
+
+class SearchDocument(models.Model):
+    """Searchable text and facets of one Property, Customer or Job, kept in sync by signals"""
+    KIND_CHOICES = [
+        ('property', 'Property'),
+        ('customer', 'Customer'),
+        ('job', 'Job'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    body = models.TextField()
+    property_type = models.CharField(max_length=20, blank=True, null=True)
+    status = models.CharField(max_length=20, blank=True, null=True)
+    city = models.CharField(max_length=100, blank=True, null=True)
+    
+    class Meta:
+        db_table = 'search_documents'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='search_documents_kind_object_uniq'),
+        ]
+
+class Tombstone(models.Model):
+    """Marks a Job or Payment that left a photographer's list, for delta sync"""
+    KIND_CHOICES = [
+        ('job', 'Job'),
+        ('payment', 'Payment'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    owner_id = models.IntegerField()  # Not a foreign key: it outlives a deleted owner's cascade
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'tombstones'
+        indexes = [
+            models.Index(fields=['kind', 'owner_id', 'deleted_at'], name='tombstones_sync_idx'),
+            models.Index(fields=['deleted_at'], name='tombstones_deleted_at_idx'),
+        ]
+
+class ZipCentroid(models.Model):
+    """Offline gazetteer row: the centroid of one zip code, for route planning"""
+    zip_code = models.CharField(max_length=10, unique=True)
+    city = models.CharField(max_length=100)
+    state = models.CharField(max_length=50)
+    place = models.CharField(max_length=160, db_index=True)  # Normalized 'city|state'
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    
+    class Meta:
+        db_table = 'zip_centroids'
+
+class Blob(models.Model):
+    """One stored copy of some file content, shared by every upload of it"""
+    digest = models.CharField(max_length=64, primary_key=True)  # SHA-256, hex
+    name = models.CharField(max_length=100, unique=True)  # Name in media storage
+    size = models.BigIntegerField()
+    crc32 = models.BigIntegerField(blank=True, null=True)  # For ZIP archives; None if stored before it was kept
+    refs = models.IntegerField(default=0)  # Media rows and job uploads using it
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now)  # Last stored, reused or released
+    
+    class Meta:
+        db_table = 'blobs'
+        indexes = [
+            models.Index(fields=['refs', 'last_used_at'], name='blobs_unreferenced_idx'),
+        ]
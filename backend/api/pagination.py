@@ -0,0 +1,128 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import or_
+from types import SimpleNamespace
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Keyset ("seek") pagination over a composite, unique ordering.
+
+    The view's ``ordering`` must end in a unique column (normally ``id``) and
+    should be backed by a matching composite index, e.g. ``('-created_at', '-id')``.
+    Cursors are opaque base64 tokens holding the boundary row's key values, so
+    every page is a single indexed range scan no matter how deep it is.
+    """
+    page_size = None  # REST_FRAMEWORK['PAGE_SIZE'] unless a subclass sets one
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('-id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, 'ordering', None) or self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size or api_settings.PAGE_SIZE
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.size = self.get_page_size(request)
+        self.ordering = self.get_ordering(view)
+        self.fields = [queryset.model._meta.get_field(o.lstrip('-')) for o in self.ordering]
+
+        position, reverse = self.decode_cursor(request)
+        ordering = [_flip(o) for o in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        rows = list(queryset[:self.size + 1])
+        has_more = len(rows) > self.size
+        rows = rows[:self.size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.first = rows[0] if rows else None
+        self.last = rows[-1] if rows else None
+        return rows
+
+    def _after(self, ordering, position):
+        """Lexicographic "row comes after ``position``" filter for ``ordering``"""
+        clauses = []
+        for i, key in enumerate(ordering):
+            eq = {o.lstrip('-'): v for o, v in zip(ordering[:i], position)}
+            lookup = 'lt' if key.startswith('-') else 'gt'
+            clauses.append(Q(**eq, **{f'{key.lstrip("-")}__{lookup}': position[i]}))
+        return reduce(or_, clauses)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            values = data['p']
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [f.to_python(v) for f, v in zip(self.fields, values)]
+            return position, bool(data.get('r'))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        if isinstance(obj, dict):  # values() rows
+            obj = SimpleNamespace(**obj)
+        values = [f.value_to_string(obj) for f in self.fields]
+        token = urlsafe_b64encode(json.dumps({'p': values, 'r': int(reverse)}).encode('utf-8'))
+        return replace_query_param(self.base_url, self.cursor_query_param, token.decode('ascii'))
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.last, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.first, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+def _flip(key):
+    return key[1:] if key.startswith('-') else '-' + key
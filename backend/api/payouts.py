@@ -0,0 +1,159 @@
+"""Batch payouts for photographers.
+
+A payout run is three set-based steps, each safe to run again:
+
+1. ``create_payments`` walks completed jobs that have no payment yet, in
+   primary key order ``BATCH`` at a time, and ``bulk_create``s a pending
+   ``Payment`` for each: the service price and the job's addons, plus the
+   photographer's travel fee. A job has at most one payment
+   (``payments_job_unique``), so a job paid by someone else in the meantime
+   is skipped by the insert instead of paid twice.
+2. ``claim`` moves unclaimed pending payments to ``processing`` under a new
+   ``PayoutRun`` with one UPDATE.
+3. ``settle`` marks a run's payments paid with one UPDATE, once the money
+   has gone out.
+
+``csv_lines`` streams a run's totals per photographer for the bank upload.
+Memory stays flat whatever the number of jobs: rows are read in batches or
+with ``iterator()``, and only the ids of affected photographers are kept.
+None of this sends per-row signals, so rollups and table versions are
+refreshed here.
+"""
+import csv
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from .conditional import touch
+from .models import Job, JobAddon, Payment, PayoutRun
+from .rollups import refresh_rollups
+
+BATCH = 2000
+REFRESH_BATCH = 500
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+CSV_COLUMNS = ('photographer_id', 'name', 'email', 'payments', 'amount', 'travel_fees', 'total')
+
+
+def _money(value):
+    """A sum as exact cents (SQLite adds decimals as floats)"""
+    return Decimal(str(value or 0)).quantize(CENT, ROUND_HALF_UP)
+
+
+def owed_jobs():
+    """Completed jobs nobody has been paid for yet"""
+    return Job.objects.filter(status='completed').filter(~Exists(Payment.objects.filter(job=OuterRef('pk'))))
+
+
+def addon_totals():
+    """Subquery: the addons sold with the outer job, summed"""
+    addons = JobAddon.objects.filter(job=OuterRef('pk')).order_by().values('job')
+    return Subquery(addons.annotate(total=Sum('price')).values('total')[:1])
+
+
+def refresh_photographers(user_ids):
+    user_ids = sorted(set(user_ids))
+    for start in range(0, len(user_ids), REFRESH_BATCH):
+        refresh_rollups(user_ids[start:start + REFRESH_BATCH])
+
+
+def create_payments(day=None, batch_size=BATCH):
+    """Create a pending payment dated ``day`` (default today) for every owed job.
+
+    Returns ``(payments created, their total)``. Jobs another run is paying
+    at the same moment are skipped, not paid twice.
+    """
+    day = day or timezone.localdate()
+    created, total, last, photographers = 0, ZERO, 0, set()
+    while True:
+        with transaction.atomic():
+            rows = list(owed_jobs().filter(pk__gt=last).order_by('pk')
+                        .select_for_update(skip_locked=True, of=('self',))
+                        .annotate(addon_total=addon_totals())
+                        .values_list('pk', 'photographer_id', 'service_price', 'addon_total',
+                                     'photographer__photographer_profile__travel_fee')[:batch_size])
+            if not rows:
+                break
+            payments = [Payment(job_id=pk, photographer_id=photographer_id, status='pending', date=day,
+                                amount=_money(price + _money(addons)), travel_fee=fee or ZERO)
+                        for pk, photographer_id, price, addons, fee in rows]
+            Payment.objects.bulk_create(payments, ignore_conflicts=True)
+            # No ids come back with ignore_conflicts; rows written here carry this run's updated_at
+            stored = set(Payment.objects.filter(job_id__in=[p.job_id for p in payments])
+                         .values_list('job_id', 'updated_at'))
+            payments = [p for p in payments if (p.job_id, p.updated_at) in stored]
+            touch(Payment)
+        last = rows[-1][0]
+        created += len(payments)
+        total += sum((p.amount + p.travel_fee for p in payments), ZERO)
+        photographers.update(p.photographer_id for p in payments)
+    refresh_photographers(photographers)
+    return created, total
+
+
+def _run_photographers(run):
+    return run.payments.order_by().values_list('photographer_id', flat=True).distinct().iterator()
+
+
+def claim(payments=None, through=None):
+    """Start a ``PayoutRun`` with the pending, unclaimed ``payments`` (default: all of them)
+    dated up to ``through``; ``None`` if there were none"""
+    payments = Payment.objects.all() if payments is None else payments
+    payments = payments.filter(status='pending', payout_run__isnull=True)
+    if through is not None:
+        payments = payments.filter(Q(date__lte=through) | Q(date__isnull=True))
+    with transaction.atomic():
+        run = PayoutRun.objects.create()
+        count = payments.update(status='processing', payout_run=run, updated_at=timezone.now())
+        if not count:
+            run.delete()
+            return None
+        run.payment_count = count
+        run.total = _money(run.payments.aggregate(total=Sum(F('amount') + F('travel_fee')))['total'])
+        run.save(update_fields=['payment_count', 'total'])
+        touch(Payment)
+        refresh_photographers(_run_photographers(run))
+    return run
+
+
+def settle(run):
+    """Mark ``run``'s payments paid; returns how many changed (0 if it already was)"""
+    with transaction.atomic():
+        run = PayoutRun.objects.select_for_update().get(pk=run.pk)
+        if run.status == 'paid':
+            return 0
+        now = timezone.now()
+        count = run.payments.filter(status='processing').update(status='paid', updated_at=now)
+        run.status, run.paid_at = 'paid', now
+        run.save(update_fields=['status', 'paid_at'])
+        touch(Payment)
+        refresh_photographers(_run_photographers(run))
+    return count
+
+
+def payout_rows(run):
+    """One row per photographer in ``run``: their payment count and sums"""
+    return (run.payments
+            .values('photographer_id', 'photographer__first_name', 'photographer__last_name', 'photographer__email')
+            .annotate(n=Count('pk'), amount=Sum('amount'), travel=Sum('travel_fee'))
+            .order_by('photographer_id'))
+
+
+class _Echo:
+    """File-like object whose ``write`` returns the line, so csv.writer can feed a generator"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(run):
+    """The payout CSV for ``run``, a line at a time"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for row in payout_rows(run).iterator(chunk_size=BATCH):
+        name = f"{row['photographer__first_name']} {row['photographer__last_name']}".strip()
+        amount, travel = _money(row['amount']), _money(row['travel'])
+        yield writer.writerow([row['photographer_id'], name, row['photographer__email'], row['n'],
+                               amount, travel, amount + travel])
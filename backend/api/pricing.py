@@ -0,0 +1,153 @@
+"""Server-side order pricing from an in-process price catalog.
+
+``PriceCatalog`` holds every ``Service`` price, ``AddonService`` price and
+applicable services, and photographer travel fee in plain dicts, so quoting
+a line item is a few dictionary lookups instead of queries. The catalog is
+loaded once (``wsgi.py``/``asgi.py`` warm it at startup) and dropped by
+signals when any of those rows change; the change also bumps a version in
+the shared cache so other processes reload too (with the default local
+memory cache only ``PRICE_CATALOG_TTL`` bounds their staleness).
+
+A quote charges each line its service and addon prices, plus one travel fee
+per distinct photographer on the order, which is what ``Order.total_amount``
+and ``Order.travel_fees`` are meant to hold. The fee is the photographer's
+flat ``travel_fee`` unless a ``travel_fee`` hook prices it (checkout uses
+``routing.travel_pricer`` to add the distance driven).
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+
+from .models import AddonService, Photographer, Service
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.00')
+VERSION_KEY = 'pricing:catalog-version'
+
+
+class PricingError(ValueError):
+    """A line names a service or addon the catalog can't price"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(errors))
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    services: dict
+    addons: dict  # id -> (price, frozenset of applicable service ids; empty means any)
+    travel_fees: dict  # photographer user id -> fee
+    version: object
+    loaded_at: float
+
+
+@dataclass
+class Quote:
+    lines: list = field(default_factory=list)
+    travel_fees: list = field(default_factory=list)
+    subtotal: Decimal = ZERO
+    travel_total: Decimal = ZERO
+
+    @property
+    def total(self):
+        return self.subtotal + self.travel_total
+
+
+class PriceCatalog:
+    """Process-wide price lookup tables, reloaded after invalidation or ``ttl`` seconds"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _load(self, version):
+        services = dict(Service.objects.values_list('id', 'price'))
+        applicable = {}
+        links = AddonService.applicable_services.through.objects.values_list('addonservice_id', 'service_id')
+        for addon_id, service_id in links:
+            applicable.setdefault(addon_id, set()).add(service_id)
+        addons = {pk: (price, frozenset(applicable.get(pk, ())))
+                  for pk, price in AddonService.objects.values_list('id', 'price')}
+        travel_fees = dict(Photographer.objects.values_list('user_id', 'travel_fee'))
+        return Snapshot(services, addons, travel_fees, version, time.monotonic())
+
+    def _fresh(self, snapshot, version):
+        return (snapshot is not None and snapshot.version == version
+                and time.monotonic() - snapshot.loaded_at < self.ttl)
+
+    def snapshot(self):
+        """The current tables, reloading them if they were invalidated here or elsewhere"""
+        version = cache.get(VERSION_KEY)
+        snapshot = self._snapshot
+        if self._fresh(snapshot, version):
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if not self._fresh(snapshot, version):
+                snapshot = self._snapshot = self._load(version)
+        return snapshot
+
+    def warm(self):
+        try:
+            snapshot = self.snapshot()
+        except DatabaseError as exc:  # e.g. before the first migrate
+            logger.warning('Price catalog not warmed: %s', exc)
+            return
+        logger.info('Price catalog warmed: %d services, %d addons, %d photographers',
+                    len(snapshot.services), len(snapshot.addons), len(snapshot.travel_fees))
+
+    def invalidate(self):
+        """Drop the tables now, and everywhere once the current transaction commits"""
+        self._snapshot = None
+
+        def bump():
+            self._snapshot = None
+            cache.set(VERSION_KEY, time.time_ns(), None)
+        transaction.on_commit(bump)
+
+    def quote(self, lines, travel_fee=None):
+        """Price ``lines`` of ``(service_id, addon_ids, photographer_id)``; raises ``PricingError``.
+
+        ``travel_fee(photographer_id, flat_fee)`` may replace each flat fee.
+        """
+        catalog = self.snapshot()
+        quote, errors, photographers = Quote(), [], {}
+        for index, (service_id, addon_ids, photographer_id) in enumerate(lines):
+            price = catalog.services.get(service_id)
+            if price is None:
+                errors.append(f'line {index}: unknown service {service_id}')
+                continue
+            addons = []
+            for addon_id in dict.fromkeys(addon_ids or ()):
+                addon = catalog.addons.get(addon_id)
+                if addon is None:
+                    errors.append(f'line {index}: unknown addon {addon_id}')
+                elif addon[1] and service_id not in addon[1]:
+                    errors.append(f'line {index}: addon {addon_id} does not apply to service {service_id}')
+                else:
+                    addons.append({'id': addon_id, 'price': addon[0]})
+            total = price + sum((a['price'] for a in addons), ZERO)
+            quote.lines.append({'service': service_id, 'service_price': price, 'addons': addons,
+                                'photographer': photographer_id, 'total': total})
+            quote.subtotal += total
+            if photographer_id is not None and photographer_id not in photographers:
+                photographers[photographer_id] = catalog.travel_fees.get(photographer_id, ZERO)
+        if errors:
+            raise PricingError(errors)
+        if travel_fee is not None:
+            photographers = {pk: travel_fee(pk, fee) for pk, fee in photographers.items()}
+        quote.travel_fees = [{'photographerId': pk, 'fee': fee} for pk, fee in photographers.items() if fee]
+        quote.travel_total = sum((fee['fee'] for fee in quote.travel_fees), ZERO)
+        return quote
+
+
+catalog = PriceCatalog(settings.PRICE_CATALOG_TTL)
@@ -0,0 +1,133 @@
+"""Read replica routing with read-your-writes stickiness.
+
+Reads go to the primary unless a view opts in: ``ReplicaReadMixin`` routes
+the safe ``replica_actions`` of a ViewSet/APIView to a random alias in
+``DATABASE_REPLICAS`` (``async_api_view(replica=True)`` does the same for the
+async views). Writes always go to the primary, and so do reads inside a
+transaction on it.
+
+After a successful write ``ReplicaPinMiddleware`` pins the user to the
+primary for ``REPLICA_PIN_SECONDS`` so they don't read their own change from
+a lagging replica. Other keys can be pinned the same way (the landing page
+snapshot of a changed property is). Pins live in the cache, so they reach
+every worker only with a shared cache backend.
+"""
+import random
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+_target = ContextVar('database_target', default=None)
+
+
+def _pin_key(key):
+    return f'replica-pin:{key}'
+
+
+def user_key(user):
+    return f'user:{user.pk}' if user is not None and user.is_authenticated else None
+
+
+def pin(key):
+    """Send reads that name ``key`` to the primary until replicas have caught up"""
+    if key and settings.DATABASE_REPLICAS:
+        cache.set(_pin_key(key), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(key):
+    return bool(key) and bool(settings.DATABASE_REPLICAS) and cache.get(_pin_key(key)) is not None
+
+
+@contextmanager
+def _route(target):
+    token = _target.set(target)
+    try:
+        yield
+    finally:
+        _target.reset(token)
+
+
+def use_replica(*keys):
+    """Route reads in the block to a replica, unless one of ``keys`` is pinned"""
+    return _route('primary' if any(is_pinned(key) for key in keys) else 'replica')
+
+
+def use_primary():
+    return _route('primary')
+
+
+class ReplicaRouter:
+    """``DATABASE_ROUTERS`` entry: replica reads only where ``use_replica`` asked for them"""
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if _target.get() != 'replica' or not replicas or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the primary's rows, so objects read from either relate
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaReadMixin:
+    """View mixin that reads from a replica for safe requests to ``replica_actions``.
+
+    ViewSets match on ``self.action``; plain APIViews on the lowercased method.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        action = getattr(self, 'action', request.method.lower())
+        if request.method in SAFE_METHODS and action in self.replica_actions:
+            self._replica_reads = ExitStack()
+            self._replica_reads.enter_context(use_replica(user_key(request.user)))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        reads = getattr(self, '_replica_reads', None)
+        if reads is not None:
+            reads.close()
+            self._replica_reads = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReplicaPinMiddleware:
+    """Pin users to the primary for a while after a successful write"""
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            self.pin_user(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            # A session user loads lazily, and the cache is sync
+            await sync_to_async(self.pin_user)(request)
+        return response
+
+    def pin_user(self, request):
+        pin(user_key(getattr(request, 'user', None)))
@@ -0,0 +1,206 @@
+"""Per-user aggregate rollups for dashboards.
+
+Each ``Rollup`` row is one ``(user, metric, key)`` bucket holding a running
+count and total. Signals apply the delta between an instance's loaded and
+saved state, so reading a dashboard is a handful of indexed rows no matter
+how much history a user has. Code that writes with ``bulk_create`` or
+``update()`` bypasses signals and must call ``refresh_rollups`` for the
+users it touched.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Job, JobAddon, Order, Payment, Property, Rollup
+
+ORDER_STATUS = 'order_status'
+JOB_STATUS = 'job_status'
+PAYOUT_STATUS = 'payout_status'
+PAYOUT_MONTH = 'payout_month'
+UNDATED = 'undated'
+
+ZERO = Decimal('0.00')
+
+_dirty = ContextVar('rollups_dirty', default=None)
+
+
+def _dec(value):
+    return Decimal(str(value or 0))
+
+
+def _month(day):
+    return str(day)[:7] if day else UNDATED
+
+
+def order_buckets(order, owner_id=None):
+    if owner_id is None:
+        owner_id = Property.objects.filter(pk=order.property_id).values_list('owner_id', flat=True).first()
+    if owner_id is None:
+        return []
+    return [(owner_id, ORDER_STATUS, order.status, _dec(order.total_amount))]
+
+
+def job_buckets(job):
+    return [(job.photographer_id, JOB_STATUS, job.status, _dec(job.service_price))]
+
+
+def payment_buckets(payment):
+    total = _dec(payment.amount) + _dec(payment.travel_fee)
+    return [
+        (payment.photographer_id, PAYOUT_STATUS, payment.status, total),
+        (payment.photographer_id, PAYOUT_MONTH, _month(payment.date), total),
+    ]
+
+
+def apply(buckets, sign):
+    """Add (``sign=1``) or remove (``sign=-1``) buckets from the rollup table"""
+    for user_id, metric, key, amount in buckets:
+        updated = Rollup.objects.filter(user_id=user_id, metric=metric, key=key).update(
+            count=F('count') + sign, total=F('total') + sign * amount,
+        )
+        if not updated and sign > 0:  # Nothing to remove, e.g. the user is being deleted
+            Rollup.objects.get_or_create(user_id=user_id, metric=metric, key=key)
+            Rollup.objects.filter(user_id=user_id, metric=metric, key=key).update(
+                count=F('count') + sign, total=F('total') + sign * amount,
+            )
+
+
+def is_deferred():
+    return _dirty.get() is not None
+
+
+def mark_dirty(model, objs):
+    """Record the users whose rollups ``objs`` (instances or state snapshots) affect"""
+    dirty = _dirty.get()
+    objs = list(objs)
+    objs += [getattr(obj, '_rollup_state', None) for obj in objs]
+    for obj in objs:
+        if obj is None:
+            continue
+        if model is Order:
+            dirty['properties'].add(obj.property_id)
+        else:
+            dirty['users'].add(obj.photographer_id)
+
+
+@contextmanager
+def deferred_rollups():
+    """Skip per-row rollup deltas and refresh the affected users once on exit.
+
+    For bulk writes: rows passed to ``mark_dirty`` (and rows saved or deleted
+    through signals meanwhile) are recomputed in a fixed number of queries.
+    """
+    if is_deferred():
+        yield
+        return
+    dirty = {'users': set(), 'properties': set()}
+    token = _dirty.set(dirty)
+    try:
+        yield
+    finally:
+        _dirty.reset(token)
+    users = dirty['users'] | set(Property.objects.filter(pk__in=dirty['properties'])
+                                 .values_list('owner_id', flat=True))
+    users.discard(None)
+    if users:
+        refresh_rollups(users)
+
+
+def apply_change(old_buckets, new_buckets):
+    if old_buckets == new_buckets:
+        return
+    with transaction.atomic():
+        apply(old_buckets, -1)
+        apply(new_buckets, 1)
+
+
+def _aggregate(queryset, user_field, key_field, amount):
+    return (queryset
+            .values(user_field, key_field)
+            .annotate(n=Count('pk'), amount=Coalesce(Sum(amount), ZERO))
+            .order_by())
+
+
+@transaction.atomic
+def refresh_rollups(user_ids=None):
+    """Recompute rollups from source rows, for ``user_ids`` or for everyone"""
+    orders = Order.objects.all()
+    jobs = Job.objects.all()
+    payments = Payment.objects.annotate(payout=F('amount') + F('travel_fee'))
+    rollups = Rollup.objects.all()
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        orders = orders.filter(property__owner_id__in=user_ids)
+        jobs = jobs.filter(photographer_id__in=user_ids)
+        payments = payments.filter(photographer_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+
+    totals = defaultdict(lambda: [0, ZERO])
+
+    def add(rows, metric, user_field, key_field, keyer=lambda k: k):
+        for row in rows:
+            bucket = totals[(row[user_field], metric, keyer(row[key_field]))]
+            bucket[0] += row['n']
+            bucket[1] += row['amount']
+
+    add(_aggregate(orders, 'property__owner_id', 'status', 'total_amount'),
+        ORDER_STATUS, 'property__owner_id', 'status')
+    add(_aggregate(jobs, 'photographer_id', 'status', 'service_price'),
+        JOB_STATUS, 'photographer_id', 'status')
+    add(_aggregate(payments, 'photographer_id', 'status', 'payout'),
+        PAYOUT_STATUS, 'photographer_id', 'status')
+    add(_aggregate(payments, 'photographer_id', 'date', 'payout'),
+        PAYOUT_MONTH, 'photographer_id', 'date', keyer=_month)
+
+    rollups.delete()
+    Rollup.objects.bulk_create([
+        Rollup(user_id=user_id, metric=metric, key=key, count=count, total=total)
+        for (user_id, metric, key), (count, total) in totals.items()
+    ], batch_size=1000)
+    return len(totals)
+
+
+def summarize(user):
+    """``{metric: {key: {'count', 'total'}}}`` for one user"""
+    summary = defaultdict(dict)
+    for metric, key, count, total in (Rollup.objects
+                                      .filter(user=user, count__gt=0)
+                                      .order_by('metric', 'key')
+                                      .values_list('metric', 'key', 'count', 'total')):
+        summary[metric][key] = {'count': count, 'total': str(total)}
+    return summary
+
+
+def dashboard_summary(user):
+    summary = summarize(user)
+    return {
+        'revenue_by_status': summary.get(ORDER_STATUS, {}),
+        'jobs_by_status': summary.get(JOB_STATUS, {}),
+        'payouts_by_status': summary.get(PAYOUT_STATUS, {}),
+        'payouts_by_month': summary.get(PAYOUT_MONTH, {}),
+    }
+
+
+def addon_revenue(user):
+    """Addons sold on the photographer's jobs that weren't cancelled, summed in SQL"""
+    addons = JobAddon.objects.filter(job__photographer=user).exclude(job__status='cancelled')
+    return _dec(addons.aggregate(total=Sum('price'))['total']).quantize(ZERO)
+
+
+def photographer_earnings(user):
+    summary = summarize(user)
+    by_status = summary.get(PAYOUT_STATUS, {})
+    return {
+        'total_earned': str(sum((Decimal(v['total']) for v in by_status.values()), ZERO)),
+        'paid': by_status.get('paid', {}).get('total', str(ZERO)),
+        'pending': str(sum((Decimal(v['total']) for k, v in by_status.items() if k != 'paid'), ZERO)),
+        'payouts_by_status': by_status,
+        'payouts_by_month': summary.get(PAYOUT_MONTH, {}),
+        'jobs_by_status': summary.get(JOB_STATUS, {}),
+        'addon_revenue': str(addon_revenue(user)),
+    }
@@ -0,0 +1,417 @@
+"""Day route planning and distance-based travel fees for photographers.
+
+Points come from ``ZipCentroid``, an offline gazetteer of zip code centroids
+loaded with ``load_gazetteer``: an address is placed at the zip code it ends
+with, or else at the centroid of its city's zip codes. Resolved points are
+kept in an in-process ``TTLCache``, like the auth caches, and dropped when the
+``ZipCentroid`` table version (bumped by ``load_gazetteer``) changes, so a
+reload reaches every process that shares the cache backend.
+
+``plan_route`` orders a day's stops to minimise driving while starting each
+within ``ROUTE_TIME_WINDOW`` minutes of its scheduled time: a nearest
+feasible neighbour tour, then Or-opt moves (a run of one to three stops
+moved next to one of its nearest neighbours) until none helps. A candidate
+is re-timed only until its schedule lines up with the current one again,
+so a few hundred stops plan in well under a second.
+"""
+import heapq
+import math
+import re
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+
+from .auth import TTLCache
+from .availability import MINUTES_PER_DAY, parse_time
+from .conditional import versions
+from .models import Job, Photographer, ZipCentroid
+
+EARTH_RADIUS_KM = 6371.0
+NEIGHBOURS = 8
+MAX_SEGMENT = 3
+MAX_PASSES = 50
+MAX_SHIFT = 40  # Furthest a run of stops moves, in positions
+MAX_STEPS = 1_000_000  # Stops re-timed while improving, so crowded late days stop in time
+
+_ZIP_RE = re.compile(r'\b(\d{5})(?:-\d{4})?\s*$')
+
+
+def place_key(city, state):
+    return f'{" ".join((city or "").lower().split())}|{(state or "").strip().lower()}'
+
+
+class Geocoder:
+    """Resolves zip codes and cities to ``(latitude, longitude)`` from ``ZipCentroid``"""
+
+    def __init__(self, maxsize, ttl):
+        self.cache = TTLCache(maxsize, ttl)
+        self.version = None  # Of the ZipCentroid table the cached points came from
+
+    @staticmethod
+    def query(address=None, city=None, state=None, zip_code=None):
+        """Gazetteer keys for an address, best first: its zip code, then its city"""
+        keys = []
+        match = _ZIP_RE.search(zip_code or '') or _ZIP_RE.search(address or '')
+        if match:
+            keys.append(('zip', match.group(1)))
+        if city:
+            keys.append(('place', place_key(city, state)))
+        return tuple(keys)
+
+    def locate_many(self, queries):
+        """``{query: point or None}`` for ``query()`` results, with at most two queries for cache misses"""
+        points = self._resolve({key for query in queries for key in query})
+        return {query: next((points[key] for key in query if points[key] is not None), None)
+                for query in queries}
+
+    def _resolve(self, keys):
+        table = ZipCentroid._meta.db_table
+        version = versions([table])[table]
+        if version != self.version:
+            self.cache.clear()
+            self.version = version
+        found, missing = {}, {'zip': set(), 'place': set()}
+        for key in keys:
+            point = self.cache.get(key)
+            if point is None:
+                missing[key[0]].add(key[1])
+            else:
+                found[key] = point or None
+        if missing['zip']:
+            rows = ZipCentroid.objects.filter(zip_code__in=missing['zip'])
+            points = {z: (lat, lng) for z, lat, lng in rows.values_list('zip_code', 'latitude', 'longitude')}
+            for zip_code in missing['zip']:
+                self._remember(found, ('zip', zip_code), points.get(zip_code))
+        if missing['place']:
+            sums = {}
+            rows = ZipCentroid.objects.filter(place__in=missing['place'])
+            for place, lat, lng in rows.values_list('place', 'latitude', 'longitude'):
+                total = sums.setdefault(place, [0.0, 0.0, 0])
+                total[0] += lat
+                total[1] += lng
+                total[2] += 1
+            for place in missing['place']:
+                total = sums.get(place)
+                self._remember(found, ('place', place), (total[0] / total[2], total[1] / total[2]) if total else None)
+        return found
+
+    def _remember(self, found, key, point):
+        found[key] = point
+        self.cache.set(key, point or False)  # Misses too
+
+    def locate(self, **address):
+        query = self.query(**address)
+        return self.locate_many([query])[query]
+
+
+geocoder = Geocoder(settings.GEOCODE_CACHE_SIZE, settings.GEOCODE_CACHE_TTL)
+
+
+def _projection(points):
+    """Equirectangular projection around the points' mean latitude, in km"""
+    located = [p for p in points if p is not None]
+    if not located:
+        return [None] * len(points)
+    scale = math.cos(math.radians(sum(lat for lat, _ in located) / len(located)))
+    return [None if p is None else (EARTH_RADIUS_KM * math.radians(p[1]) * scale,
+                                    EARTH_RADIUS_KM * math.radians(p[0])) for p in points]
+
+
+def distance_km(a, b):
+    """Great-circle distance between two ``(latitude, longitude)`` points"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+@dataclass
+class Stop:
+    key: object
+    point: tuple = None  # (latitude, longitude), or None if it couldn't be placed
+    opens: int = 0  # Earliest start, minutes after midnight
+    closes: int = MINUTES_PER_DAY  # Latest start without being late
+    duration: int = 0
+
+
+@dataclass
+class Route:
+    stops: list = field(default_factory=list)  # Stop, start minute, travel minutes and km from the previous one
+    start: tuple = None
+    travel_minutes: float = 0.0
+    distance_km: float = 0.0
+    late_minutes: float = 0.0
+
+
+class _Planner:
+    """Or-opt over a precomputed travel-time matrix; index ``n`` is the optional start point"""
+
+    def __init__(self, stops, start=None):
+        self.stops = stops
+        self.n = n = len(stops)
+        xy = _projection([s.point for s in stops] + [start])
+        self.minutes_per_km = 60.0 / settings.ROUTE_SPEED_KMH
+        scale = settings.ROUTE_DETOUR_FACTOR * self.minutes_per_km
+        self.minutes = [[0.0 if a is None or b is None else math.hypot(a[0] - b[0], a[1] - b[1]) * scale
+                         for b in xy] for a in xy]
+        self.depot = n if start is not None else None
+        self.opens = [s.opens for s in stops]
+        self.closes = [s.closes for s in stops]
+        self.durations = [s.duration for s in stops]
+        self.weight = settings.ROUTE_LATENESS_WEIGHT
+        self.neighbours = [heapq.nsmallest(NEIGHBOURS, (j for j in range(n) if j != i), key=self.minutes[i].__getitem__)
+                           for i in range(n)]
+
+    def _step(self, prev, stop, clock, cost):
+        """Drive from ``prev`` (None: nowhere) to ``stop`` leaving at ``clock``; new clock and cost"""
+        travel = self.minutes[prev][stop] if prev is not None else 0.0
+        start = max(clock + travel, self.opens[stop])
+        late = start - self.closes[stop]
+        return start + self.durations[stop], cost + travel + (late * self.weight if late > 0 else 0.0)
+
+    def _times(self, order):
+        """Departure times and running costs for every position of ``order``, and how much
+        later each stop could be reached without anyone from it on being late (``None`` if
+        someone already is)"""
+        departs, costs, arrivals = [], [], []
+        prev, clock, cost, travel = self.depot, 0.0, 0.0, 0.0
+        for stop in order:
+            leg = self.minutes[prev][stop] if prev is not None else 0.0
+            travel += leg
+            clock += leg
+            arrivals.append(clock)
+            clock, cost = self._step(prev, stop, clock - leg, cost)
+            departs.append(clock)
+            costs.append(cost)
+            prev = stop
+        spare, room = [None] * len(order), math.inf
+        for position in range(len(order) - 1, -1, -1):
+            stop = order[position]
+            start = departs[position] - self.durations[stop]
+            if start > self.closes[stop]:
+                break
+            room = start - arrivals[position] + min(self.closes[stop] - start, room)
+            spare[position] = room
+        return departs, costs, spare, travel
+
+    def construct(self):
+        """The cheaper of earliest-deadline-first and a nearest feasible neighbour tour"""
+        tours = [sorted(range(self.n), key=lambda stop: (self.closes[stop], self.opens[stop])), self._nearest()]
+        return min(tours, key=lambda order: self._times(order)[1][-1])
+
+    def _nearest(self):
+        """Repeatedly go to the stop that can start soonest, lateness weighted heavily"""
+        left, order = set(range(self.n)), []
+        prev, clock = self.depot, 0.0
+        while left:
+            def score(stop):
+                travel = self.minutes[prev][stop] if prev is not None else 0.0
+                start = max(clock + travel, self.opens[stop])
+                return start - clock + max(start - self.closes[stop], 0) * self.weight, self.closes[stop], stop
+            stop = min(left, key=score)
+            clock, _ = self._step(prev, stop, clock, 0.0)
+            order.append(stop)
+            left.discard(stop)
+            prev = stop
+        return order
+
+    def _move_cost(self, order, i, length, target, times, limit):
+        """Cost of ``order`` with ``order[i:i + length]`` moved in front of ``order[target]``,
+        or ``None`` once it can't beat ``limit``"""
+        if target < i:
+            first, changed, resume = target, order[i:i + length] + order[target:i], i + length
+        else:
+            first, changed, resume = i, order[i + length:target] + order[i:i + length], target
+        minutes, opens, closes, durations, weight = self.minutes, self.opens, self.closes, self.durations, self.weight
+        departs, costs, spare, travel = times
+        self.steps += len(changed)
+        prev = order[first - 1] if first else self.depot
+        clock, cost = (departs[first - 1], costs[first - 1]) if first else (0.0, 0.0)
+        for stop in changed:
+            if prev is not None:
+                clock += minutes[prev][stop]
+                cost += minutes[prev][stop]
+            if clock < opens[stop]:
+                clock = opens[stop]
+            if clock > closes[stop]:
+                cost += (clock - closes[stop]) * weight
+            if cost >= limit:
+                return None
+            clock += durations[stop]
+            prev = stop
+        total = costs[-1]
+        if resume < len(order) and spare[resume] is not None:
+            # Nobody after the move is late now: if they still won't be, only the leg into it changes
+            stop = order[resume]
+            leg = minutes[prev][stop]
+            old_leg = minutes[order[resume - 1]][stop]
+            if clock + leg <= departs[resume - 1] + old_leg + spare[resume]:
+                cost += leg + total - costs[resume - 1] - old_leg
+                return cost if cost < limit else None
+        self.steps += len(order) - resume
+        for position in range(resume, len(order)):
+            # Same stops as now from here on: the rest costs the same once we're
+            # back in step, and no less while we're behind
+            stop = order[position]
+            if prev is not None:
+                clock += minutes[prev][stop]
+                cost += minutes[prev][stop]
+            if clock < opens[stop]:
+                clock = opens[stop]
+            if clock > closes[stop]:
+                cost += (clock - closes[stop]) * weight
+            clock += durations[stop]
+            rest = total - costs[position]
+            if clock == departs[position]:
+                cost += rest
+                break
+            if cost >= limit or (clock > departs[position] and cost + rest >= limit):
+                return None
+            prev = stop
+        return cost if cost < limit else None
+
+    def improve(self, order):
+        """Apply improving Or-opt moves until none is left (or ``MAX_STEPS`` is spent)"""
+        self.steps = 0
+        times = self._times(order)
+        position = {stop: p for p, stop in enumerate(order)}
+        for _ in range(MAX_PASSES):
+            improved = False
+            for length in range(1, MAX_SEGMENT + 1):
+                for i in range(len(order) - length + 1):
+                    if self.steps > MAX_STEPS:
+                        return order
+                    moved = self._relocate(order, i, length, position, times)
+                    if moved is not None:
+                        order = moved
+                        times = self._times(order)
+                        position = {stop: p for p, stop in enumerate(order)}
+                        improved = True
+            if not improved:
+                break
+        return order
+
+    def _relocate(self, order, i, length, position, times):
+        """The first better order with ``order[i:i + length]`` moved beside a near neighbour, if any"""
+        n, minutes = len(order), self.minutes
+        first, last = order[i], order[i + length - 1]
+        before = order[i - 1] if i else self.depot
+        after = order[i + length] if i + length < n else None
+
+        def leg(a, b):
+            return minutes[a][b] if a is not None and b is not None else 0.0
+
+        # Cost is at least the driving, and a move changes only three legs
+        removed = leg(before, first) + leg(last, after) - leg(before, after)
+        limit = times[1][-1] - 1e-6
+        floor = times[3] - removed
+        targets = {position[v] + 1 for v in self.neighbours[first]}  # After a neighbour of the first stop
+        targets |= {position[v] for v in self.neighbours[last]}  # Before one of the last's
+        for target in sorted(targets):
+            if i <= target <= i + length or abs(target - i) > MAX_SHIFT:
+                continue
+            a = order[target - 1] if target else self.depot
+            b = order[target] if target < n else None
+            if floor + leg(a, first) + leg(last, b) - leg(a, b) >= limit:
+                continue
+            if self._move_cost(order, i, length, target, times, limit) is not None:
+                if target < i:
+                    return order[:target] + order[i:i + length] + order[target:i] + order[i + length:]
+                return order[:i] + order[i + length:target] + order[i:i + length] + order[target:]
+        return None
+
+    def route(self, order, start=None):
+        route = Route(start=start)
+        departs = self._times(order)[0]
+        prev = self.depot
+        for position, stop in enumerate(order):
+            travel = self.minutes[prev][stop] if prev is not None else 0.0
+            km = travel / self.minutes_per_km
+            start = departs[position] - self.durations[stop]
+            route.stops.append((self.stops[stop], start, travel, km))
+            route.travel_minutes += travel
+            route.distance_km += km
+            route.late_minutes += max(start - self.closes[stop], 0)
+            prev = stop
+        return route
+
+
+def plan_route(stops, start=None):
+    """Order ``stops`` (a list of ``Stop``) into a ``Route``, starting from the ``start`` point if given"""
+    if not stops:
+        return Route(start=start)
+    planner = _Planner(stops, start)
+    return planner.route(planner.improve(planner.construct()), start)
+
+
+def format_time(minutes):
+    """``'9:30 AM'``, the format jobs are scheduled in"""
+    hour, minute = divmod(int(round(minutes)) % MINUTES_PER_DAY, 60)
+    return f'{(hour - 1) % 12 + 1}:{minute:02d} {"AM" if hour < 12 else "PM"}'
+
+
+def job_stop(job, point):
+    duration = settings.BOOKING_DEFAULT_DURATION
+    scheduled = parse_time(job.scheduled_time)
+    if scheduled is None:
+        opens, closes = settings.ROUTE_DAY_START, settings.ROUTE_DAY_END - duration
+    else:
+        opens, closes = scheduled - settings.ROUTE_TIME_WINDOW, scheduled + settings.ROUTE_TIME_WINDOW
+    return Stop(key=job, point=point, opens=max(opens, 0), closes=closes, duration=duration)
+
+
+def day_jobs(photographer_id, day):
+    return list(Job.objects.filter(photographer_id=photographer_id, scheduled_date=day)
+                .exclude(status='cancelled').order_by('id')
+                .only('id', 'property_address', 'property_city', 'property_state', 'scheduled_time', 'status'))
+
+
+def base_point(photographer_id):
+    zip_code = (Photographer.objects.filter(user_id=photographer_id)
+                .values_list('base_zip_code', flat=True).first())
+    return geocoder.locate(zip_code=zip_code) if zip_code else None
+
+
+def plan_day(photographer_id, day):
+    """A photographer's non-cancelled jobs on ``day`` as a ``Route``"""
+    jobs = day_jobs(photographer_id, day)
+    queries = [geocoder.query(address=j.property_address, city=j.property_city, state=j.property_state)
+               for j in jobs]
+    points = geocoder.locate_many(queries)
+    return plan_route([job_stop(job, points[query]) for job, query in zip(jobs, queries)],
+                      start=base_point(photographer_id))
+
+
+def detour_km(route, point):
+    """Extra km of the cheapest place to slot ``point`` into ``route``"""
+    path = ([route.start] if route.start is not None else []) + [s.point for s, *_ in route.stops
+                                                                 if s.point is not None]
+    if not path:
+        return 0.0
+    factor = settings.ROUTE_DETOUR_FACTOR
+    best = distance_km(path[-1], point) * factor  # After the last stop
+    if route.start is None:
+        best = min(best, distance_km(point, path[0]) * factor)  # Before the first
+    for a, b in zip(path, path[1:]):
+        best = min(best, (distance_km(a, point) + distance_km(point, b) - distance_km(a, b)) * factor)
+    return max(best, 0.0)
+
+
+def travel_fee(photographer_id, day, point, flat_fee):
+    """``flat_fee`` plus ``TRAVEL_FEE_PER_KM`` for the detour a new job at ``point`` adds to the day"""
+    if point is None or day is None:
+        return flat_fee
+    km = Decimal(str(detour_km(plan_day(photographer_id, day), point)))
+    extra = (km * Decimal(str(settings.TRAVEL_FEE_PER_KM))).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    return flat_fee + extra
+
+
+def travel_pricer(property_obj, days):
+    """A ``catalog.quote`` ``travel_fee`` hook pricing a job at ``property_obj``;
+    ``days`` maps photographer ids to the date they'd shoot it"""
+    point = geocoder.locate(address=property_obj.address, city=property_obj.city, state=property_obj.state,
+                            zip_code=property_obj.zip_code)
+
+    def price(photographer_id, flat_fee):
+        return travel_fee(photographer_id, days.get(photographer_id), point, flat_fee)
+    return price
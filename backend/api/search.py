@@ -0,0 +1,201 @@
+"""Full-text and faceted search over properties, customers and jobs.
+
+Each searchable row is mirrored into a ``SearchDocument`` (its text plus the
+facet columns) by signals, or by ``index_objects`` after bulk writes. The
+text index itself belongs to a pluggable backend chosen by
+``SEARCH_BACKEND``: ``SQLiteFTSBackend`` queries the FTS5 table that
+migration 0008 keeps in sync with triggers, and ``DatabaseBackend`` falls
+back to ``LIKE`` matching on any database.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, FloatField, Q, prefetch_related_objects
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Customer, Job, Property, SearchDocument
+
+FACETS = ('property_type', 'status', 'city')
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def _join(*parts):
+    return ' '.join(str(p) for p in parts if p)
+
+
+def property_document(obj):
+    return {
+        'owner_id': obj.owner_id,
+        'body': _join(obj.address, obj.city, obj.state, obj.zip_code, obj.description,
+                      *(feature.name for feature in obj.features.all())),
+        'property_type': obj.property_type,
+        'status': obj.status,
+        'city': obj.city,
+    }
+
+
+def customer_document(obj):
+    return {
+        'owner_id': None,
+        'body': _join(obj.name, obj.email, obj.company),
+        'property_type': None,
+        'status': None,
+        'city': None,
+    }
+
+
+def job_document(obj):
+    return {
+        'owner_id': obj.photographer_id,
+        'body': _join(obj.client_name, obj.client_email, obj.property_address, obj.property_city),
+        'property_type': None,
+        'status': obj.status,
+        'city': obj.property_city,
+    }
+
+
+SOURCES = {
+    Property: ('property', property_document),
+    Customer: ('customer', customer_document),
+    Job: ('job', job_document),
+}
+MODELS = {kind: model for model, (kind, _) in SOURCES.items()}
+# Relations the document builders read
+PREFETCH = {Property: ('features',)}
+
+
+def terms(query):
+    return _TERM.findall(query or '')
+
+
+class DatabaseBackend:
+    """Portable fallback: every term must appear (as a substring) in the body"""
+
+    def match(self, queryset, query):
+        for term in terms(query):
+            queryset = queryset.filter(body__icontains=term)
+        return queryset
+
+    def rank(self, queryset, query):
+        return queryset.order_by('-id')
+
+
+class SQLiteFTSBackend(DatabaseBackend):
+    """Prefix-matches every term against the ``search_documents_fts`` FTS5 index, ranked by BM25"""
+    table = 'search_documents_fts'
+
+    def expression(self, query):
+        # Quote each term so user input can't inject FTS5 query syntax
+        return ' '.join('"%s"*' % term.replace('"', '') for term in terms(query))
+
+    def match(self, queryset, query):
+        expression = self.expression(query)
+        if not expression:
+            return queryset
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [expression]))
+
+    def rank(self, queryset, query):
+        expression = self.expression(query)
+        if not expression:
+            return super().rank(queryset, query)
+        # FTS5 looks the row up by rowid, so this is one index probe per matching document
+        rank = RawSQL(f'SELECT rank FROM {self.table} WHERE {self.table} MATCH %s '
+                      f'AND {self.table}.rowid = search_documents.id', [expression], output_field=FloatField())
+        return queryset.alias(rank=rank).order_by('rank', 'id')
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {self.table}({self.table}) VALUES ('rebuild')")
+
+
+def get_backend():
+    backend = import_string(settings.SEARCH_BACKEND)()
+    if isinstance(backend, SQLiteFTSBackend) and connection.vendor != 'sqlite':
+        return DatabaseBackend()
+    return backend
+
+
+def index_objects(instances):
+    """Create or refresh the search documents of ``instances`` (one model)"""
+    instances = list(instances)
+    if not instances or type(instances[0]) not in SOURCES:
+        return
+    kind, build = SOURCES[type(instances[0])]
+    prefetch_related_objects(instances, *PREFETCH.get(type(instances[0]), ()))
+    existing = {d.object_id: d for d in SearchDocument.objects.filter(
+        kind=kind, object_id__in=[i.pk for i in instances])}
+    created, changed = [], []
+    for instance in instances:
+        values = build(instance)
+        document = existing.get(instance.pk)
+        if document is None:
+            created.append(SearchDocument(kind=kind, object_id=instance.pk, **values))
+        elif any(getattr(document, k) != v for k, v in values.items()):
+            for key, value in values.items():
+                setattr(document, key, value)
+            changed.append(document)
+    SearchDocument.objects.bulk_create(created)
+    SearchDocument.objects.bulk_update(changed, ['owner_id', 'body', *FACETS])
+
+
+def unindex(model, pks):
+    SearchDocument.objects.filter(kind=SOURCES[model][0], object_id__in=pks).delete()
+
+
+def rebuild_search_index(batch_size=2000):
+    SearchDocument.objects.all().delete()
+    count = 0
+    for model, (kind, build) in SOURCES.items():
+        batch = []
+        queryset = model.objects.prefetch_related(*PREFETCH.get(model, ())).order_by('pk')
+        for instance in queryset.iterator(chunk_size=batch_size):
+            batch.append(SearchDocument(kind=kind, object_id=instance.pk, **build(instance)))
+            if len(batch) >= batch_size:
+                count += len(SearchDocument.objects.bulk_create(batch))
+                batch = []
+        count += len(SearchDocument.objects.bulk_create(batch))
+    backend = get_backend()
+    if hasattr(backend, 'rebuild'):
+        backend.rebuild()
+    return count
+
+
+def searchable_kinds(user):
+    """Admins search everything, photographers also see their own jobs, brokers see properties"""
+    if user.is_staff or user.role == 'admin':
+        return {'property', 'customer', 'job'}
+    if user.role == 'photographer':
+        return {'property', 'job'}
+    return {'property'}
+
+
+def search(user, query, kinds=None, filters=None, limit=20):
+    """Return ``(total, documents, facets)`` for ``query`` within what ``user`` may see.
+
+    Each facet is counted with every filter applied except its own, so the
+    client can offer the other values of a facet that is already selected.
+    """
+    backend = get_backend()
+    allowed = searchable_kinds(user)
+    kinds = allowed & set(kinds) if kinds else allowed
+    filters = {k: v for k, v in (filters or {}).items() if k in FACETS and v}
+
+    queryset = SearchDocument.objects.filter(kind__in=kinds)
+    if 'job' in kinds and not (user.is_staff or user.role == 'admin'):
+        queryset = queryset.filter(~Q(kind='job') | Q(owner_id=user.pk))
+    queryset = backend.match(queryset, query)
+
+    facets = {}
+    for facet in FACETS:
+        others = {k: v for k, v in filters.items() if k != facet}
+        rows = (queryset.filter(**others).exclude(**{f'{facet}__isnull': True})
+                .values(facet).annotate(count=Count('id')).order_by('-count', facet))
+        facets[facet] = {row[facet]: row['count'] for row in rows}
+
+    queryset = queryset.filter(**filters)
+    total = queryset.count()
+    documents = list(backend.rank(queryset, query).only('kind', 'object_id')[:limit])
+    return total, documents, facets
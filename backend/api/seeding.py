@@ -0,0 +1,295 @@
+"""Deterministic synthetic data for benchmarks and query analysis.
+
+Everything is drawn from one ``random.Random(seed)`` and fixed word lists,
+so the same counts and seed always produce the same rows. Rows are written
+with ``bulk_create`` in batches (no signals), then the derived tables
+(bookings, availability, rollups, search documents) are rebuilt once at the
+end. Seeded users and customers use ``seed-`` emails so ``flush`` can remove
+them again. It works the same way in reverse: the rows under them go one
+table at a time without being loaded or sending signals, and only the few
+roots go through ``QuerySet.delete``.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .availability import sync_bookings, sync_photographer_availability
+from .conditional import touch
+from .pricing import catalog
+from .models import (
+    AddonService, Availability, Booking, Customer, Job, JobAddon, Media, MediaTask, Order, OrderService,
+    OrderTravelFee, Payment, Photographer, PhotographerSpecialty, Property, PropertyFeature, PropertyService,
+    Rollup, SearchDocument, Service, UploadSession, User,
+)
+from .rollups import deferred_rollups, refresh_rollups
+from .search import rebuild_search_index
+
+PASSWORD = 'seed-password'
+SEEDED = '(seeded)'
+EPOCH = date(2025, 1, 1)
+DEFAULT_COUNTS = {
+    'brokers': 1_000,
+    'photographers': 500,
+    'customers': 10_000,
+    'properties': 100_000,
+    'media': 1_000_000,
+    'orders': 100_000,
+    'jobs': 500_000,
+    'payments': 500_000,
+}
+
+FIRST_NAMES = ['Ava', 'Liam', 'Mia', 'Noah', 'Zoe', 'Ethan', 'Isla', 'Mateo', 'Nora', 'Leo',
+               'Chloe', 'Omar', 'Priya', 'Diego', 'Hana', 'Felix', 'Sofia', 'Kai', 'Elena', 'Jonah']
+LAST_NAMES = ['Garcia', 'Nguyen', 'Smith', 'Patel', 'Johnson', 'Kim', 'Brown', 'Lopez', 'Martin',
+              'Chen', 'Rossi', 'Müller', 'Okafor', 'Silva', 'Cohen', 'Walker', 'Ito', 'Dubois']
+STREETS = ['Oak', 'Maple', 'Cedar', 'Elm', 'Pine', 'Lakeview', 'Sunset', 'Hillcrest', 'River',
+           'Park', 'Meadow', 'Willow', 'Highland', 'Bay', 'Forest', 'Spring', 'Canyon', 'Harbor']
+SUFFIXES = ['St', 'Ave', 'Blvd', 'Rd', 'Ln', 'Dr', 'Ct', 'Way']
+CITIES = [('Austin', 'TX', '787'), ('Dallas', 'TX', '752'), ('Houston', 'TX', '770'),
+          ('Denver', 'CO', '802'), ('Phoenix', 'AZ', '850'), ('Seattle', 'WA', '981'),
+          ('Miami', 'FL', '331'), ('Atlanta', 'GA', '303'), ('Portland', 'OR', '972'),
+          ('Nashville', 'TN', '372'), ('San Diego', 'CA', '921'), ('Chicago', 'IL', '606')]
+FEATURES = ['Pool', 'Garage', 'Fireplace', 'Hardwood Floors', 'Open Floor Plan', 'Walk-in Closet',
+            'Granite Countertops', 'Smart Home', 'Solar Panels', 'Mountain View', 'Waterfront',
+            'Home Office', 'Wine Cellar', 'Gym', 'Patio', 'Guest House']
+ADJECTIVES = ['Bright', 'Spacious', 'Renovated', 'Charming', 'Modern', 'Cozy', 'Elegant', 'Sunny']
+TIMES = ['8:00 AM', '9:30 AM', '10:00 AM', '11:30 AM', '1:00 PM', '2:30 PM', '4:00 PM']
+SERVICES = [('Photography', 199, 'camera'), ('Video Tour', 349, 'video'), ('Drone', 249, 'plane'),
+            ('3D Scan', 299, 'box'), ('Floor Plan', 99, 'layout')]
+ADDONS = [('Virtual Staging', 49), ('Twilight Shoot', 129), ('Rush Delivery', 75)]
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+class Seeder:
+
+    def __init__(self, counts=None, seed=42, batch_size=5000, log=None):
+        self.counts = {**DEFAULT_COUNTS, **(counts or {})}
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+
+    def create(self, model, rows):
+        """``bulk_create`` ``rows`` in batches and return the new primary keys"""
+        pks = []
+        for batch in _batches(rows, self.batch_size):
+            pks.extend(obj.pk for obj in model.objects.bulk_create(batch))
+        touch(model)
+        self.log(f'{model.__name__}: {len(pks)}')
+        return pks
+
+    def moment(self, days):
+        day = EPOCH + timedelta(days=self.rng.randrange(days))
+        return timezone.make_aware(datetime.combine(day, time(self.rng.randrange(8, 20), self.rng.randrange(60))))
+
+    def name(self):
+        return f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}'
+
+    def address(self):
+        return f'{self.rng.randrange(1, 9999)} {self.rng.choice(STREETS)} {self.rng.choice(SUFFIXES)}'
+
+    @transaction.atomic
+    def run(self, derived=True):
+        rng, n = self.rng, self.counts
+        password = make_password(PASSWORD)
+
+        def users(role, count):
+            for i in range(count):
+                first, last = self.name().split(' ', 1)
+                email = f'seed-{role}-{i}@example.com'
+                yield User(username=email, email=email, password=password, first_name=first,
+                           last_name=last, role=role, company=f'{last} Realty' if role == 'broker' else None)
+
+        self.brokers = self.create(User, users('broker', n['brokers']))
+        self.photographers = self.create(User, users('photographer', n['photographers']))
+        self.admins = self.create(User, [User(username='seed-admin', email='seed-admin@example.com', password=password,
+                                              first_name='Seed', last_name='Admin', role='admin', is_staff=True)])
+        specialties = []
+
+        def photographers():
+            for pk in self.photographers:
+                specialties.append(rng.sample(FEATURES, 2))
+                yield Photographer(user_id=pk, bio='Real estate photographer.',
+                                   rating=Decimal(rng.randrange(300, 501)) / 100, completed_jobs=rng.randrange(500),
+                                   available_dates=[(EPOCH + timedelta(days=d)).isoformat()
+                                                    for d in sorted(rng.sample(range(365), 60))],
+                                   travel_fee=Decimal(rng.choice([0, 25, 50])))
+
+        self.create(PhotographerSpecialty, (
+            PhotographerSpecialty(photographer_id=pk, name=name)
+            for pk, names in zip(self.create(Photographer, photographers()), specialties) for name in names
+        ))
+
+        services = self.create(Service, (
+            Service(name=name, description=f'{name} package {SEEDED}', price=price, icon=icon)
+            for name, price, icon in SERVICES
+        ))
+        addons = self.create(AddonService, (
+            AddonService(name=name, description=f'{name} {SEEDED}', price=price)
+            for name, price in ADDONS
+        ))
+        AddonService.applicable_services.through.objects.bulk_create([
+            AddonService.applicable_services.through(addonservice_id=addon, service_id=service)
+            for addon in addons for service in services
+        ])
+        customers = self.create(Customer, (
+            Customer(name=self.name(), email=f'seed-customer-{i}@example.com', phone=f'555-{i:07d}',
+                     company=rng.choice([None, 'Acme Homes', 'Keystone', 'Summit Realty']),
+                     created_at=self.moment(365))
+            for i in range(n['customers'])
+        ))
+
+        features = []
+
+        def properties():
+            for _ in range(n['properties']):
+                city, state, zip_prefix = rng.choice(CITIES)
+                features.append(rng.sample(FEATURES, rng.randrange(1, 6)))
+                yield Property(
+                    address=self.address(), city=city, state=state, zip_code=f'{zip_prefix}{rng.randrange(100):02d}',
+                    property_type=rng.choice(Property.PROPERTY_TYPE_CHOICES)[0],
+                    square_feet=rng.randrange(600, 6000), bedrooms=rng.randrange(1, 7),
+                    bathrooms=Decimal(rng.randrange(2, 10)) / 2, year_built=rng.randrange(1920, 2025),
+                    price=Decimal(rng.randrange(150, 3000) * 1000),
+                    description=f'{rng.choice(ADJECTIVES)} home in {city}.',
+                    status=rng.choice(Property.STATUS_CHOICES)[0],
+                    landing_page_template=rng.choice(Property.TEMPLATE_CHOICES)[0],
+                    created_at=self.moment(365), owner_id=rng.choice(self.brokers),
+                )
+
+        self.properties = self.create(Property, properties())
+        self.create(PropertyFeature, (PropertyFeature(property_id=pk, name=name)
+                                      for pk, names in zip(self.properties, features) for name in names))
+        self.create(Media, (
+            Media(property_id=rng.choice(self.properties), service_id=rng.choice(services),
+                  type=rng.choices(['photo', 'video', '3d-scan'], [90, 8, 2])[0],
+                  file=f'property_media/seed/{i}.jpg', file_name=f'IMG_{i:07d}.jpg',
+                  file_size=rng.randrange(500_000, 12_000_000), uploaded_at=self.moment(365))
+            for i in range(n['media'])
+        ))
+
+        orders = self.create(Order, (
+            Order(property_id=rng.choice(self.properties), customer_id=rng.choice(customers),
+                  total_amount=Decimal(rng.randrange(99, 1500)),
+                  status=rng.choice(Order.STATUS_CHOICES)[0], created_at=self.moment(365),
+                  due_date=EPOCH + timedelta(days=rng.randrange(30, 400)))
+            for _ in range(n['orders'])
+        ))
+        self.property_services = property_services = self.create(PropertyService, (
+            PropertyService(property_id=rng.choice(self.properties), service_id=rng.choice(services),
+                            photographer_id=rng.choice(self.photographers),
+                            scheduled_date=EPOCH + timedelta(days=rng.randrange(365)),
+                            scheduled_time=rng.choice(TIMES), status=rng.choice(PropertyService.STATUS_CHOICES)[0])
+            for _ in orders
+        ))
+        self.create(OrderService, (OrderService(order_id=o, property_service_id=ps)
+                                   for o, ps in zip(orders, property_services)))
+
+        job_rows, job_addons = [], {}
+
+        def jobs():
+            for _ in range(n['jobs']):
+                city, state, _zip = rng.choice(CITIES)
+                status = rng.choices(['upcoming', 'in-progress', 'completed', 'cancelled'], [30, 5, 60, 5])[0]
+                job = Job(property_address=self.address(), property_city=city, property_state=state,
+                          service_type=rng.choice(SERVICES)[0], scheduled_date=EPOCH + timedelta(days=rng.randrange(365)),
+                          scheduled_time=rng.choice(TIMES), status=status, client_name=self.name(),
+                          client_email=f'client{rng.randrange(100_000)}@example.com',
+                          service_price=Decimal(rng.choice(SERVICES)[1]),
+                          photographer_id=rng.choice(self.photographers))
+                if rng.random() < 0.2:
+                    job_addons[len(job_rows)] = rng.choice(ADDONS)
+                job_rows.append((job.photographer_id, job.scheduled_date, job.service_price))
+                yield job
+
+        self.jobs = self.create(Job, jobs())
+        self.create(JobAddon, (JobAddon(job_id=self.jobs[i], name=name, price=Decimal(price))
+                               for i, (name, price) in job_addons.items()))
+        self.create(Payment, (
+            Payment(photographer_id=job_rows[i][0], job_id=self.jobs[i], amount=job_rows[i][2] * Decimal('0.7'),
+                    travel_fee=Decimal(rng.choice([0, 0, 25])), date=job_rows[i][1] + timedelta(days=7),
+                    status=rng.choices(['pending', 'processing', 'paid'], [25, 5, 70])[0])
+            for i in rng.sample(range(len(self.jobs)), min(n['payments'], len(self.jobs)))  # One per job at most
+        ))
+
+        catalog.invalidate()  # bulk_create sent no signals
+        if derived:
+            self.rebuild_derived()
+        return self
+
+    def rebuild_derived(self):
+        for photographer in Photographer.objects.filter(user_id__in=self.photographers).iterator():
+            sync_photographer_availability(photographer)
+        # A pk range rather than ``pk__in``: half a million ids exceed SQLite's parameter limit
+        fields = ('pk', 'photographer_id', 'scheduled_date', 'scheduled_time')
+        jobs = Job.objects.filter(pk__gte=self.jobs[0]) if self.jobs else Job.objects.none()
+        for batch in _batches(jobs.order_by('pk').only(*fields, 'status').iterator(), self.batch_size):
+            sync_bookings(batch, 'job', active=lambda job: job.status != 'cancelled')
+        services = (PropertyService.objects.filter(pk__gte=self.property_services[0]) if self.property_services
+                    else PropertyService.objects.none())
+        for batch in _batches(services.order_by('pk').only(*fields).iterator(), self.batch_size):
+            sync_bookings(batch, 'property_service')
+        self.log('bookings and availability rebuilt')
+        refresh_rollups(self.brokers + self.photographers)
+        self.log('rollups rebuilt')
+        self.log(f'search documents: {rebuild_search_index()}')
+
+
+def _raw_delete(queryset):
+    """DELETE the rows of ``queryset`` in one statement, as ``Collector`` does for fast deletes:
+    nothing is loaded, no signals are sent and nothing cascades"""
+    return queryset._raw_delete(queryset.db)
+
+
+@transaction.atomic
+def flush():
+    """Delete everything a ``Seeder`` created; returns the number of rows deleted"""
+    users = User.objects.filter(username__startswith='seed-')
+    properties = Property.objects.filter(owner__in=users)
+    jobs = Job.objects.filter(photographer__in=users)
+    # Children before parents; each one a single DELETE over a subquery
+    tables = [
+        SearchDocument.objects.filter(Q(owner__in=users) | Q(kind='property', object_id__in=properties.values('pk'))
+                                      | Q(kind='job', object_id__in=jobs.values('pk'))
+                                      | Q(kind='customer', object_id__in=Customer.objects.filter(
+                                          email__startswith='seed-customer-').values('pk'))),
+        Booking.objects.filter(Q(photographer__in=users) | Q(job__in=jobs)
+                               | Q(property_service__property__in=properties)),
+        Availability.objects.filter(photographer__user__in=users),
+        UploadSession.objects.filter(Q(owner__in=users) | Q(property__in=properties) | Q(job__in=jobs)),
+        MediaTask.objects.filter(media__property__in=properties),
+        Media.objects.filter(property__in=properties),
+        OrderService.objects.filter(Q(order__property__in=properties) | Q(property_service__property__in=properties)),
+        OrderTravelFee.objects.filter(order__property__in=properties),
+        Order.objects.filter(property__in=properties),
+        PropertyService.addons.through.objects.filter(propertyservice__property__in=properties),
+        PropertyService.objects.filter(property__in=properties),
+        PropertyFeature.objects.filter(property__in=properties),
+        properties,
+        Payment.objects.filter(Q(job__in=jobs) | Q(photographer__in=users)),
+        JobAddon.objects.filter(job__in=jobs),
+        jobs,
+        Rollup.objects.filter(user__in=users),
+        PhotographerSpecialty.objects.filter(photographer__user__in=users),
+        Photographer.objects.filter(user__in=users),
+    ]
+    deleted = sum(_raw_delete(queryset) for queryset in tables)
+    touch(*{queryset.model for queryset in tables})
+    # The roots, with what little still refers to them, go through the ORM
+    with deferred_rollups():
+        deleted += users.delete()[0]
+        deleted += Customer.objects.filter(email__startswith='seed-customer-').delete()[0]
+        deleted += Service.objects.filter(description__endswith=SEEDED).delete()[0]
+        deleted += AddonService.objects.filter(description__endswith=SEEDED).delete()[0]
+    catalog.invalidate()
+    return deleted
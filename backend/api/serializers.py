@@ -1,6 +1,15 @@
+from decimal import Decimal
+import re
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from .models import *
+from .availability import sync_bookings
+from .bulk import BulkListSerializer
+from .fields import RelatedListField, RelatedListsMixin, replace_related
+from .pricing import PricingError, catalog
+from .routing import format_time, travel_pricer
 
 User = get_user_model()
 
@@ -11,8 +20,9 @@ class UserSerializer(serializers.ModelSerializer):
                   'role', 'company', 'phone', 'avatar', 'date_joined']
         read_only_fields = ['id', 'date_joined']
 
-class PhotographerSerializer(serializers.ModelSerializer):
+class PhotographerSerializer(RelatedListsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    specialties = RelatedListField(child=serializers.CharField(max_length=100), attribute='name', required=False)
     
     class Meta:
         model = Photographer
@@ -23,7 +33,10 @@ class CustomerSerializer(serializers.ModelSerializer):
         model = Customer
         fields = '__all__'
 
-class PropertySerializer(serializers.ModelSerializer):
+class PropertySerializer(RelatedListsMixin, serializers.ModelSerializer):
+    features = RelatedListField(child=serializers.CharField(max_length=100), attribute='name',
+                                required=False, allow_null=True)
+    
     class Meta:
         model = Property
         fields = '__all__'
@@ -39,43 +52,241 @@ class AddonServiceSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class PropertyServiceSerializer(serializers.ModelSerializer):
+    addon_ids = serializers.PrimaryKeyRelatedField(many=True, source='addons', required=False,
+                                                   queryset=AddonService.objects.all())
+    
     class Meta:
         model = PropertyService
-        fields = '__all__'
+        exclude = ['addons']
+        list_serializer_class = BulkListSerializer
 
-class OrderSerializer(serializers.ModelSerializer):
-    services = PropertyServiceSerializer(many=True, read_only=True, source='order_services')
+class OrderTravelFeeSerializer(serializers.ModelSerializer):
+    photographerId = serializers.PrimaryKeyRelatedField(source='photographer', queryset=User.objects.all(),
+                                                        allow_null=True, required=False)
+    
+    class Meta:
+        model = OrderTravelFee
+        fields = ['photographerId', 'fee']
+        extra_kwargs = {'fee': {'coerce_to_string': False}}
+
+class OrderSerializer(RelatedListsMixin, serializers.ModelSerializer):
+    """Orders are priced by the server: ``total_amount`` and ``travel_fees`` are read-only.
+
+    Orders are created through checkout, which takes the services to price;
+    one created here would have none, so creation is refused. Updates keep
+    the price the order was quoted at.
+    """
+    services = PropertyServiceSerializer(many=True, read_only=True, source='property_services')
+    travel_fees = RelatedListField(child=OrderTravelFeeSerializer(), read_only=True)
     
     class Meta:
         model = Order
-        fields = '__all__'
+        exclude = ['property_services']
+        read_only_fields = ['total_amount']
+        list_serializer_class = BulkListSerializer
+    
+    def validate(self, attrs):
+        if self.instance is None:
+            raise serializers.ValidationError('Create orders with their services through /api/orders/checkout/')
+        return attrs
+
+class CheckoutServiceSerializer(serializers.ModelSerializer):
+    addon_ids = serializers.PrimaryKeyRelatedField(many=True, source='addons', required=False,
+                                                   queryset=AddonService.objects.all())
+    
+    class Meta:
+        model = PropertyService
+        exclude = ['property', 'addons']
+        list_serializer_class = BulkListSerializer
+
+class CheckoutSerializer(RelatedListsMixin, serializers.ModelSerializer):
+    """Creates an Order with its PropertyServices, OrderService links and bookings, priced by the server"""
+    services = CheckoutServiceSerializer(many=True, allow_empty=False)
+    travel_fees = RelatedListField(child=OrderTravelFeeSerializer(), read_only=True)
+    
+    class Meta:
+        model = Order
+        exclude = ['property_services']
+        read_only_fields = ['total_amount']
+    
+    def validate(self, attrs):
+        lines = [(s['service'].pk, [a.pk for a in s.get('addons', [])], getattr(s.get('photographer'), 'pk', None))
+                 for s in attrs['services']]
+        days = {}
+        for s in attrs['services']:
+            if s.get('photographer') and s.get('scheduled_date'):
+                days.setdefault(s['photographer'].pk, s['scheduled_date'])
+        try:
+            quote = catalog.quote(lines, travel_pricer(attrs['property'], days))
+        except PricingError as exc:
+            raise serializers.ValidationError({'services': exc.errors})
+        attrs['total_amount'] = quote.total
+        attrs['travel_fees'] = [{'photographer_id': f['photographerId'], 'fee': f['fee']} for f in quote.travel_fees]
+        return attrs
+    
+    def create(self, validated_data):
+        services = validated_data.pop('services')
+        order = super().create(validated_data)
+        sync_bookings(self.create_property_services(order, services), 'property_service')
+        return order
+    
+    def create_property_services(self, order, services):
+        """Bulk-create the order's property services, their addons and OrderService links"""
+        addons = [attrs.pop('addons', []) for attrs in services]
+        property_services = PropertyService.objects.bulk_create([
+            PropertyService(property=order.property, **attrs) for attrs in services
+        ])
+        replace_related(PropertyService, 'addons', list(zip(property_services, addons)), created=True)
+        OrderService.objects.bulk_create([
+            OrderService(order=order, property_service=ps) for ps in property_services
+        ])
+        return property_services
+
+class QuoteLineSerializer(serializers.Serializer):
+    service = serializers.IntegerField()
+    addon_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    photographer = serializers.IntegerField(required=False, allow_null=True, default=None)
+    scheduled_date = serializers.DateField(required=False, allow_null=True, default=None)
+
+class QuoteSerializer(serializers.Serializer):
+    """Prices order lines from the in-memory price catalog; with ``property``, travel by distance as checkout does"""
+    property = serializers.PrimaryKeyRelatedField(queryset=Property.objects.all(), required=False)
+    services = QuoteLineSerializer(many=True, allow_empty=False, max_length=1000)
+    
+    def validate(self, attrs):
+        lines = [(s['service'], s['addon_ids'], s['photographer']) for s in attrs['services']]
+        travel_fee = None
+        if attrs.get('property'):
+            days = {}
+            for s in attrs['services']:
+                if s['photographer'] is not None and s['scheduled_date']:
+                    days.setdefault(s['photographer'], s['scheduled_date'])
+            travel_fee = travel_pricer(attrs['property'], days)
+        try:
+            attrs['quote'] = catalog.quote(lines, travel_fee)
+        except PricingError as exc:
+            raise serializers.ValidationError({'services': exc.errors})
+        return attrs
+    
+    def to_representation(self, instance):
+        quote = instance['quote']
+        money = lambda value: str(value.quantize(Decimal('0.01')))
+        return {
+            'lines': [{**line, 'service_price': money(line['service_price']), 'total': money(line['total']),
+                       'addons': [{'id': a['id'], 'price': money(a['price'])} for a in line['addons']]}
+                      for line in quote.lines],
+            'travel_fees': [{'photographerId': f['photographerId'], 'fee': float(f['fee'])} for f in quote.travel_fees],
+            'subtotal': money(quote.subtotal),
+            'travel_total': money(quote.travel_total),
+            'total_amount': money(quote.total),
+        }
+
+class RouteSerializer(serializers.BaseSerializer):
+    """A planned ``routing.Route`` of jobs, with suggested start times"""
+    
+    def to_representation(self, route):
+        return {
+            'stops': [{
+                'job': stop.key.pk,
+                'property_address': stop.key.property_address,
+                'property_city': stop.key.property_city,
+                'scheduled_time': stop.key.scheduled_time,
+                'suggested_time': format_time(start),
+                'travel_minutes': round(travel),
+                'distance_km': round(km, 1),
+                'late_minutes': round(max(start - stop.closes, 0)),
+                'located': stop.point is not None,
+            } for stop, start, travel, km in route.stops],
+            'travel_minutes': round(route.travel_minutes),
+            'distance_km': round(route.distance_km, 1),
+            'late_minutes': round(route.late_minutes),
+        }
+
+class SocialRenderSerializer(serializers.BaseSerializer):
+    """One ``social.social_kit`` render: the template and where its image is"""
+    
+    def to_representation(self, render):
+        template, request = render['template'], self.context.get('request')
+        url = default_storage.url(render['file']) if render['file'] else None
+        return {
+            'template': template.pk,
+            'name': template.name,
+            'category': template.category,
+            'width': template.width,
+            'height': template.height,
+            'url': request.build_absolute_uri(url) if request and url else url,
+            'cached': render['cached'],
+            'error': render['error'],
+        }
 
 class MediaSerializer(serializers.ModelSerializer):
     url = serializers.SerializerMethodField()
     thumbnail_url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     
-    def get_url(self, obj):
+    def _build_url(self, url):
+        """Absolute URL when serializing for a request, storage-relative otherwise"""
         request = self.context.get('request')
-        if obj.file and request:
-            return request.build_absolute_uri(obj.file.url)
+        return request.build_absolute_uri(url) if request else url
+    
+    def get_url(self, obj):
+        if obj.file:
+            return self._build_url(obj.file.url)
         return None
     
     def get_thumbnail_url(self, obj):
-        request = self.context.get('request')
-        if obj.thumbnail and request:
-            return request.build_absolute_uri(obj.thumbnail.url)
+        if obj.thumbnail:
+            return self._build_url(obj.thumbnail.url)
         return None
     
+    def get_srcset(self, obj):
+        """Responsive ``srcset`` strings keyed by derivative format"""
+        if not obj.derivatives:
+            return None
+        srcset = {}
+        for d in obj.derivatives:
+            url = self._build_url(default_storage.url(d['file']))
+            srcset.setdefault(d['format'], []).append(f"{url} {d['width']}w")
+        return {fmt: ', '.join(entries) for fmt, entries in srcset.items()}
+    
     class Meta:
         model = Media
         fields = '__all__'
+        read_only_fields = ['thumbnail', 'derivatives']
+
+class JobAddonSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = JobAddon
+        fields = ['name', 'price']
+        extra_kwargs = {'price': {'coerce_to_string': False}}
 
-class JobSerializer(serializers.ModelSerializer):
+class JobSerializer(RelatedListsMixin, serializers.ModelSerializer):
+    addons = RelatedListField(child=JobAddonSerializer(), required=False)
+    
     class Meta:
         model = Job
         fields = '__all__'
+        list_serializer_class = BulkListSerializer
 
 class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'property', 'service', 'job', 'type', 'file_name', 'file_size', 'sha256',
+                  'offset', 'media', 'created_at', 'completed_at']
+        read_only_fields = ['id', 'offset', 'media', 'created_at', 'completed_at']
+    
+    def validate(self, attrs):
+        if not attrs.get('job') and not (attrs.get('property') and attrs.get('service')):
+            raise serializers.ValidationError('Either job or both property and service are required')
+        if attrs['file_size'] < 0:
+            raise serializers.ValidationError({'file_size': 'Must be zero or greater'})
+        if attrs.get('sha256'):
+            attrs['sha256'] = attrs['sha256'].lower()
+            if not re.fullmatch(r'[0-9a-f]{64}', attrs['sha256']):
+                raise serializers.ValidationError({'sha256': 'Must be a hex SHA-256 digest'})
+        return attrs
@@ -0,0 +1,245 @@
+from django.conf import settings
+from django.db import transaction
+from types import SimpleNamespace
+
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .auth import user_cache
+from .bulk import after_delete
+from .conditional import touch
+from .fields import related_lists_saved
+from .availability import sync_booking, sync_photographer_availability
+from .derivatives import delete_derivatives
+from .landing import invalidate_landing_page
+from . import blobs, pricing, rollups, search, sync
+from .models import (
+    AddonService, Customer, Job, JobAddon, Media, MediaTask, Order, OrderTravelFee, Payment, Photographer,
+    PhotographerSpecialty, Property, PropertyFeature, PropertyService, Service, Tombstone, User, ZipCentroid,
+)
+
+
+# Tables that conditional reads (ConditionalMixin views and their
+# conditional_sources) render. Receivers are connected per model: one without
+# a sender runs for every model, and a delete receiver on a model stops
+# cascades to it from being fast deletes.
+VERSIONED_MODELS = (
+    AddonService, Customer, Job, JobAddon, Media, Order, OrderTravelFee, Payment, Photographer,
+    PhotographerSpecialty, Property, PropertyFeature, PropertyService, Service, Tombstone, User, ZipCentroid,
+)
+VERSIONED_M2M = (AddonService.applicable_services.through, PropertyService.addons.through)
+
+
+def touch_table_version(sender, **kwargs):
+    touch(sender)
+
+
+def touch_related_table_versions(sender, instance, action, model, **kwargs):
+    if action.startswith('post_'):
+        touch(type(instance), model)
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(touch_table_version, sender=model)
+    post_delete.connect(touch_table_version, sender=model)
+for through in VERSIONED_M2M:
+    m2m_changed.connect(touch_related_table_versions, sender=through)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.delete(str(instance.pk))
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Job)
+def index_search_document(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_objects([instance])
+
+
+@receiver(related_lists_saved, sender=Property)
+def reindex_property_features(sender, instances, names, **kwargs):
+    # Features are written after the Property's own post_save
+    if 'features' in names:
+        search.index_objects(instances)
+        for instance in instances:
+            invalidate_landing_page(instance.pk)
+
+
+@receiver(post_delete, sender=Property)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Job)
+def unindex_search_document(sender, instance, **kwargs):
+    after_delete(search.unindex, sender, [instance.pk])
+
+
+@receiver(post_save, sender=Media)
+def enqueue_media_derivatives(sender, instance, created, **kwargs):
+    """Queue thumbnail/derivative generation for new photos and videos"""
+    if created and instance.type in ('photo', 'video') and not kwargs.get('raw'):
+        transaction.on_commit(lambda: MediaTask.objects.create(media_id=instance.pk))
+
+
+@receiver(pre_save, sender=Media)
+def remember_stored_media_file(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and not instance._state.adding and (update_fields is None or 'file' in update_fields):
+        instance._stored_file = Media.objects.filter(pk=instance.pk).values_list('file', flat=True).first()
+
+
+@receiver(post_save, sender=Media)
+def count_media_blob(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        blobs.retain([instance.file.name])
+    elif '_stored_file' in instance.__dict__:
+        old = instance.__dict__.pop('_stored_file')
+        if old != instance.file.name:
+            blobs.retain([instance.file.name])
+            blobs.release([old])
+
+
+@receiver(post_delete, sender=Media)
+def release_media_blob(sender, instance, **kwargs):
+    blobs.release([instance.file.name])
+
+
+@receiver(post_delete, sender=Media)
+def delete_media_derivatives(sender, instance, **kwargs):
+    if instance.derivatives:
+        transaction.on_commit(lambda: delete_derivatives(str(settings.MEDIA_ROOT), instance.derivatives))
+
+
+@receiver(post_delete, sender=Job)
+def release_job_upload_blobs(sender, instance, **kwargs):
+    after_delete(blobs.release, blobs.job_files(instance))
+
+
+@receiver([post_save, post_delete], sender=Property)
+def invalidate_property_landing_page(sender, instance, **kwargs):
+    invalidate_landing_page(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Media)
+def invalidate_media_landing_page(sender, instance, **kwargs):
+    invalidate_landing_page(instance.property_id)
+
+
+@receiver([post_save, post_delete], sender=Service)
+@receiver([post_save, post_delete], sender=AddonService)
+@receiver(post_delete, sender=Photographer)
+@receiver(m2m_changed, sender=AddonService.applicable_services.through)
+def invalidate_price_catalog(sender, **kwargs):
+    pricing.catalog.invalidate()
+
+
+@receiver(post_init, sender=Photographer)
+def remember_travel_fee(sender, instance, **kwargs):
+    # Left unset when the field is deferred; the catalog is then dropped on save
+    if 'travel_fee' in instance.__dict__:
+        instance._priced_travel_fee = instance.travel_fee
+
+
+@receiver(post_save, sender=Photographer)
+def invalidate_price_catalog_on_travel_fee(sender, instance, created, update_fields=None, **kwargs):
+    """The catalog only holds a photographer's ``travel_fee``, so other edits leave it alone"""
+    if update_fields is not None and 'travel_fee' not in update_fields:
+        return
+    if created or getattr(instance, '_priced_travel_fee', None) != instance.travel_fee:
+        pricing.catalog.invalidate()
+    instance._priced_travel_fee = instance.travel_fee
+
+
+@receiver(post_save, sender=Photographer)
+def sync_availability(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync_photographer_availability(instance)
+
+
+@receiver(post_save, sender=Job)
+def sync_job_booking(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync_booking(instance.photographer_id, instance.scheduled_date, instance.scheduled_time,
+                     active=instance.status != 'cancelled', job=instance)
+
+
+@receiver(post_save, sender=PropertyService)
+def sync_property_service_booking(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync_booking(instance.photographer_id, instance.scheduled_date, instance.scheduled_time,
+                     property_service=instance)
+
+
+ROLLUP_SOURCES = {
+    Order: (('property_id', 'status', 'total_amount'), rollups.order_buckets),
+    Job: (('photographer_id', 'status', 'service_price'), rollups.job_buckets),
+    Payment: (('photographer_id', 'status', 'amount', 'travel_fee', 'date'), rollups.payment_buckets),
+}
+
+
+def _rollup_state(instance):
+    """The rollup-relevant field values as loaded, or ``None`` if any are deferred"""
+    fields, _ = ROLLUP_SOURCES[type(instance)]
+    if any(f not in instance.__dict__ for f in fields):
+        return None
+    return SimpleNamespace(**{f: instance.__dict__[f] for f in fields})
+
+
+def remember_rollup_state(sender, instance, **kwargs):
+    instance._rollup_state = _rollup_state(instance) if instance.pk is not None else None
+
+
+def load_deferred_rollup_state(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    if getattr(instance, '_rollup_state', None) is None:
+        fields, _ = ROLLUP_SOURCES[sender]
+        values = sender.objects.filter(pk=instance.pk).values(*fields).first()
+        instance._rollup_state = SimpleNamespace(**values) if values else None
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_save, sender=Payment)
+def record_reassigned_for_sync(sender, instance, created, raw=False, **kwargs):
+    # Before update_rollups_on_save replaces _rollup_state
+    if not created and not raw:
+        sync.record_reassigned(sender, [instance])
+
+
+@receiver(post_delete, sender=Job)
+@receiver(post_delete, sender=Payment)
+def record_deleted_for_sync(sender, instance, **kwargs):
+    after_delete(sync.record_removed, sender, [(instance.pk, instance.photographer_id)])
+
+
+def update_rollups_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    _, buckets = ROLLUP_SOURCES[sender]
+    old = getattr(instance, '_rollup_state', None)
+    if rollups.is_deferred():
+        rollups.mark_dirty(sender, [old, instance])
+        instance._rollup_state = _rollup_state(instance)
+        return
+    old_buckets = buckets(old) if old is not None and not created else []
+    rollups.apply_change(old_buckets, buckets(instance))
+    instance._rollup_state = _rollup_state(instance)
+
+
+def update_rollups_on_delete(sender, instance, **kwargs):
+    _, buckets = ROLLUP_SOURCES[sender]
+    old = getattr(instance, '_rollup_state', None)
+    if rollups.is_deferred():
+        rollups.mark_dirty(sender, [old])
+    elif old is not None:
+        rollups.apply_change(buckets(old), [])
+
+
+for model in ROLLUP_SOURCES:
+    post_init.connect(remember_rollup_state, sender=model)
+    pre_save.connect(load_deferred_rollup_state, sender=model)
+    pre_delete.connect(load_deferred_rollup_state, sender=model)
+    post_save.connect(update_rollups_on_save, sender=model)
+    post_delete.connect(update_rollups_on_delete, sender=model)
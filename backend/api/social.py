@@ -0,0 +1,329 @@
+"""Server-side rendering of social media ``Template``s for a property.
+
+``render_template`` draws a layout the way ``TemplateEditor`` draws it on a
+canvas (shapes, photos fitted by ``objectFit``, centred lines of text). Like
+``render_derivatives`` it is a plain function over file paths, so
+``social_kit`` can run it on a process pool. Each render is keyed by a hash
+of the filled-in layout (the template's current elements, the property's
+details and the photos' files) and stored as ``renders/<key>.png``, so
+asking again costs a stat until the template, property or photo changes.
+
+Templates are edited by hand in the browser, so ``prepare`` drops elements
+without a drawable box and styling numbers that aren't numbers; a template
+that still fails to draw is reported in its own render's ``error``.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal
+from functools import lru_cache
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from PIL import Image, ImageColor, ImageDraw, ImageFont, ImageOps
+
+from .models import Media
+
+logger = logging.getLogger(__name__)
+
+RENDERER_VERSION = 1  # Bump when drawing changes, to retire cached renders
+RENDER_DIR = 'renders'
+FORMATS = {
+    'png': ('PNG', {}),
+    'jpg': ('JPEG', {'quality': 90, 'optimize': True}),
+}
+LINE_HEIGHT = 1.2
+TEXT_PADDING = 8
+MAX_SIZE = 8192  # Canvas side, in pixels
+MAX_FONT_SIZE = 1000
+
+# Sample copy in the stock templates, replaced with the property's details
+# in the same order as ``TemplateEditor``
+PLACEHOLDERS = (
+    ('123 Ocean Drive', '{address}', 'address'),
+    ('Miami Beach', '{city}', 'city'),
+    ('$2,500,000', '${price}', 'price'),
+    ('4 Bed', '{bedrooms} Bed', 'bedrooms'),
+    ('3 Bath', '{bathrooms} Bath', 'bathrooms'),
+    ('3,200 SqFt', '{square_feet} SqFt', 'square_feet'),
+    ('3,200 SF', '{square_feet} SF', 'square_feet'),
+    ('4 Bedrooms', '{bedrooms} Bedrooms', 'bedrooms'),
+    ('3 Bathrooms', '{bathrooms} Bathrooms', 'bathrooms'),
+)
+
+
+class RenderError(Exception):
+    """A template could not be rendered"""
+
+
+def _color(value, default, opacity=1):
+    try:
+        rgb = ImageColor.getrgb(value or default)
+    except ValueError:
+        rgb = ImageColor.getrgb(default)
+    return (*rgb[:3], round(255 * opacity))
+
+
+@lru_cache(maxsize=64)
+def _font(weight, size):
+    bold = str(weight or '400') in ('bold', '600', '700', '800', '900')
+    try:
+        return ImageFont.truetype(settings.TEMPLATE_FONTS['bold' if bold else 'regular'], size)
+    except OSError:
+        return ImageFont.load_default(size)
+
+
+def _draw_image(canvas, element, opacity):
+    box = (round(element['width']), round(element['height']))
+    if box[0] <= 0 or box[1] <= 0:
+        return
+    try:
+        with Image.open(element['path']) as source:
+            # Decode big JPEGs at a reduced scale; either side may end up across the box
+            source.draft('RGB', (max(box), max(box)))
+            image = ImageOps.exif_transpose(source).convert('RGB')
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise RenderError(f'{element["path"]}: {exc}')
+    fit = element.get('objectFit') or 'cover'
+    offset = (0, 0)
+    if fit == 'cover':
+        image = ImageOps.fit(image, box, Image.LANCZOS)
+    elif fit == 'contain':
+        image = ImageOps.contain(image, box, Image.LANCZOS)
+        offset = ((box[0] - image.width) // 2, (box[1] - image.height) // 2)
+    else:
+        image = image.resize(box, Image.LANCZOS)
+    # Clipped to the element's (rounded) box, as the canvas clips it
+    mask = Image.new('L', box, 0)
+    ImageDraw.Draw(mask).rounded_rectangle((0, 0, box[0] - 1, box[1] - 1), radius=element.get('borderRadius') or 0,
+                                           fill=round(255 * opacity))
+    mask = mask.crop((*offset, offset[0] + image.width, offset[1] + image.height))
+    canvas.paste(image, (round(element['x']) + offset[0], round(element['y']) + offset[1]), mask)
+
+
+def _draw_text(draw, element, opacity):
+    size = element.get('fontSize') or 24
+    font = _font(element.get('fontWeight'), size)
+    fill = _color(element.get('color'), '#000000', opacity)
+    lines = element['content'].split('\n')
+    line_height = size * LINE_HEIGHT
+    top = element['y'] + (element['height'] - len(lines) * line_height) / 2 + size * 0.8
+    align = element.get('textAlign') or 'left'
+    if align == 'center':
+        x, anchor = element['x'] + element['width'] / 2, 'ms'
+    elif align == 'right':
+        x, anchor = element['x'] + element['width'] - TEXT_PADDING, 'rs'
+    else:
+        x, anchor = element['x'] + TEXT_PADDING, 'ls'
+    for index, line in enumerate(lines):
+        draw.text((x, top + index * line_height), line, font=font, fill=fill, anchor=anchor)
+
+
+def render_template(layout, output_path, file_format='png'):
+    """Draw ``layout`` (``width``, ``height``, ``background``, ``elements``) to ``output_path``.
+
+    Image elements carry the local ``path`` of their photo. The file is
+    written next to ``output_path`` and renamed into place, so a reader never
+    sees half of one.
+    """
+    canvas = Image.new('RGB', (layout['width'], layout['height']), _color(layout.get('background'), '#ffffff')[:3])
+    draw = ImageDraw.Draw(canvas, 'RGBA')
+    for element in layout['elements']:
+        opacity = element.get('opacity') or 1  # As on the canvas, 0 means unset
+        kind = element.get('type')
+        if kind == 'shape':
+            box = (element['x'], element['y'], element['x'] + element['width'] - 1,
+                   element['y'] + element['height'] - 1)
+            draw.rounded_rectangle(box, radius=element.get('borderRadius') or 0,
+                                   fill=_color(element.get('backgroundColor'), '#000000', opacity))
+        elif kind == 'image' and element.get('path'):
+            _draw_image(canvas, element, opacity)
+        elif kind == 'text' and element.get('content'):
+            _draw_text(draw, element, opacity)
+
+    fmt, options = FORMATS[file_format]
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    partial = f'{output_path}.{os.getpid()}.part'
+    canvas.save(partial, fmt, **options)
+    os.replace(partial, output_path)
+    return output_path
+
+
+def _number(value):
+    """``value`` the way the editor's ``toLocaleString`` shows it: ``2,500,000``, ``2.5``"""
+    if isinstance(value, Decimal):
+        return f'{value.normalize():,f}'
+    return f'{value:,}'
+
+
+def property_details(property_obj):
+    """Text the placeholders are replaced with; empty values leave the sample copy"""
+    details = {'address': property_obj.address, 'city': property_obj.city}
+    for name in ('price', 'bedrooms', 'bathrooms', 'square_feet'):
+        value = getattr(property_obj, name)
+        details[name] = _number(value) if value else None
+    return details
+
+
+def fill_text(content, details):
+    for sample, replacement, name in PLACEHOLDERS:
+        if sample in content and details.get(name):
+            content = content.replace(sample, replacement.format(**details), 1)
+    return content
+
+
+def _local_path(url):
+    """Path of a media file named by its URL, or None for anything else (nothing is downloaded)"""
+    path = urlparse(url or '').path
+    if not path.startswith(settings.MEDIA_URL):
+        return None
+    try:
+        path = default_storage.path(path[len(settings.MEDIA_URL):])
+    except SuspiciousFileOperation:
+        return None
+    return path if os.path.isfile(path) else None
+
+
+def _photo_path(photo, width):
+    """The smallest copy of ``photo`` at least ``width`` wide: a JPEG derivative, else the original"""
+    if photo is None:
+        return None
+    for derivative in sorted(photo.derivatives or [], key=lambda d: d['width']):
+        if derivative['format'] == 'jpg' and derivative['width'] >= width:
+            path = default_storage.path(derivative['file'])
+            if os.path.isfile(path):
+                return path
+    path = photo.file.path if photo.file else None
+    return path if path and os.path.isfile(path) else None
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _placed(element):
+    """Whether ``element`` has a position and a box at least a pixel across"""
+    return (isinstance(element, dict) and all(_is_number(element.get(k)) for k in ('x', 'y', 'width', 'height'))
+            and element['width'] >= 1 and element['height'] >= 1)
+
+
+def _clean_style(element):
+    """Drop styling numbers the renderer can't use; each then falls back to its default"""
+    for name in ('fontSize', 'borderRadius', 'opacity'):
+        value = element.get(name)
+        if value is not None and not (_is_number(value) and value >= 0):
+            del element[name]
+    if element.get('fontSize') is not None:
+        element['fontSize'] = min(max(round(element['fontSize']), 1), MAX_FONT_SIZE)
+    if element.get('opacity') is not None:
+        element['opacity'] = min(element['opacity'], 1)
+    return element
+
+
+def prepare(template, details, photo, file_format):
+    """``(layout, key)``: ``template`` filled in for a property, and the hash naming its render.
+
+    Empty image elements get the property's first photo, as in the editor.
+    Raises ``RenderError`` for a template without a drawable size.
+    """
+    if not (0 < template.width <= MAX_SIZE and 0 < template.height <= MAX_SIZE):
+        raise RenderError(f'Template size {template.width}x{template.height} is not between 1 and {MAX_SIZE}')
+    elements = []
+    for element in template.elements or []:
+        if not _placed(element):
+            continue
+        element = _clean_style(dict(element))
+        if element.get('type') == 'text' and element.get('content'):
+            element['content'] = fill_text(str(element['content']), details)
+        elif element.get('type') == 'image':
+            path = _local_path(element.pop('imageUrl', None)) or _photo_path(photo, element['width'])
+            if path:
+                stat = os.stat(path)
+                element.update(path=path, stat=[stat.st_size, stat.st_mtime_ns])
+        elements.append(element)
+    layout = {'width': template.width, 'height': template.height,
+              'background': template.background_color, 'elements': elements}
+    key = json.dumps([RENDERER_VERSION, file_format, layout], sort_keys=True, default=str)
+    return layout, hashlib.blake2b(key.encode('utf-8'), digest_size=20).hexdigest()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.TEMPLATE_RENDER_WORKERS)
+        return _pool
+
+
+def _discard_executor(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+
+def _render_error(template, exc):
+    """The ``error`` reported for ``template``; anything but a ``RenderError`` is logged too"""
+    if isinstance(exc, RenderError):
+        return str(exc)
+    logger.error('Rendering template %s failed', template.pk, exc_info=exc)
+    return 'Could not render template'
+
+
+def social_kit(property_obj, templates, file_format='png'):
+    """Render ``templates`` for ``property_obj``, reusing earlier renders.
+
+    Returns ``{'template', 'file', 'cached', 'error'}`` dicts in order; the
+    missing renders are drawn in parallel on a process pool shared by the
+    requests this process serves (in-process when only one is missing, or
+    ``TEMPLATE_RENDER_WORKERS`` is 0).
+    """
+    details = property_details(property_obj)
+    photo = (Media.objects.filter(property=property_obj, type='photo').order_by('uploaded_at', 'id')
+             .only('id', 'file', 'derivatives').first())
+    renders, pending = [], []
+    for template in templates:
+        try:
+            layout, key = prepare(template, details, photo, file_format)
+        except Exception as exc:
+            renders.append({'template': template, 'file': None, 'cached': False,
+                            'error': _render_error(template, exc)})
+            continue
+        name = f'{RENDER_DIR}/{key[:2]}/{key}.{file_format}'
+        render = {'template': template, 'file': name, 'cached': default_storage.exists(name), 'error': None}
+        if not render['cached']:
+            pending.append((render, layout, default_storage.path(name)))
+        renders.append(render)
+
+    if len(pending) == 1 or not settings.TEMPLATE_RENDER_WORKERS:
+        for render, layout, path in pending:
+            try:
+                render_template(layout, path, file_format)
+            except Exception as exc:
+                render['error'] = _render_error(render['template'], exc)
+    elif pending:
+        pool = _executor()
+        futures = [(render, pool.submit(render_template, layout, path, file_format))
+                   for render, layout, path in pending]
+        for render, future in futures:
+            try:
+                future.result()
+            except BrokenProcessPool:
+                _discard_executor(pool)
+                render['error'] = 'Renderer unavailable, try again'
+            except Exception as exc:
+                render['error'] = _render_error(render['template'], exc)
+    for render in renders:
+        if render['error']:
+            render['file'] = None
+    return renders
@@ -0,0 +1,160 @@
+"""Content-addressed storage for uploaded media.
+
+``BlobStorage`` files every save under the SHA-256 of its bytes
+(``blobs/ab/cd/<digest>.jpg``) and records it as a ``Blob``; saving content
+that is already stored writes nothing and returns the existing name, so a
+re-delivered shoot takes no extra disk. The hashing upload handlers digest
+multipart uploads as they stream in, so the storage doesn't read them again.
+The CRC-32 taken in the same pass is kept on the ``Blob`` for ZIP archives.
+
+``Blob.refs`` counts the ``Media`` rows and job uploads using a blob
+(``api.blobs`` keeps it up to date); ``collect_blobs`` deletes the ones left
+unreferenced for ``BLOB_GC_GRACE`` seconds. The grace covers the moment
+between storing a file and committing the row that refers to it.
+"""
+import hashlib
+import os
+import tempfile
+import zlib
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.db import transaction
+from django.utils import timezone
+
+CHUNK_SIZE = 64 * 1024
+BLOB_DIR = 'blobs'
+
+
+def blob_name(digest, name=''):
+    """Storage name for ``digest``, keeping the extension of ``name`` so URLs get a content type"""
+    ext = os.path.splitext(name)[1].lower()
+    if len(ext) > 10 or not ext[1:].isalnum():
+        ext = ''
+    return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(f'{BLOB_DIR}/')
+
+
+class Checksum:
+    """SHA-256 and CRC-32 of a stream, updated in one pass"""
+
+    def __init__(self):
+        self.sha256 = hashlib.sha256()
+        self.crc32 = 0
+
+    def update(self, data):
+        self.sha256.update(data)
+        self.crc32 = zlib.crc32(data, self.crc32)
+
+
+def file_checksum(path):
+    """``(sha256 hex digest, crc32)`` of the file at ``path``"""
+    checksum = Checksum()
+    with open(path, 'rb') as fh:
+        while block := fh.read(CHUNK_SIZE):
+            checksum.update(block)
+    return checksum.sha256.hexdigest(), checksum.crc32
+
+
+class DiskFile(File):
+    """A file already on disk that the storage may move into place"""
+
+    def temporary_file_path(self):
+        return self.name
+
+
+class BlobStorage(FileSystemStorage):
+    """FileSystemStorage that keeps one file per distinct content"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('allow_overwrite', True)  # Same name, same bytes
+        super().__init__(**kwargs)
+
+    def get_available_name(self, name, max_length=None):
+        return name  # ``_save`` picks the real name from the content
+
+    def _save(self, name, content):
+        spooled = None
+        # Set by the hashing upload handlers
+        digest, crc32 = getattr(content, 'sha256', None), getattr(content, 'crc32', None)
+        if digest is None:
+            if hasattr(content, 'temporary_file_path'):
+                digest, crc32 = file_checksum(content.temporary_file_path())
+            else:
+                spooled, digest, crc32 = self._spool(content)
+                content = DiskFile(open(spooled, 'rb'), spooled)
+        try:
+            return self.store(digest, content, name, crc32)
+        finally:
+            if spooled is not None:
+                content.close()
+                if os.path.exists(spooled):
+                    os.remove(spooled)
+
+    def _spool(self, content):
+        """Copy ``content`` to a temporary file beside the blobs, hashing it on the way"""
+        directory = self.path('tmp')
+        os.makedirs(directory, exist_ok=True)
+        checksum = Checksum()
+        fd, path = tempfile.mkstemp(dir=directory, suffix='.upload')
+        with os.fdopen(fd, 'wb') as fh:
+            for chunk in content.chunks(CHUNK_SIZE):
+                checksum.update(chunk)
+                fh.write(chunk)
+        return path, checksum.sha256.hexdigest(), checksum.crc32
+
+    def store(self, digest, content, name='', crc32=None):
+        """Name of the blob for ``content`` (whose SHA-256 is ``digest``), writing it only if it's new"""
+        Blob = apps.get_model('api', 'Blob')
+        size = content.size
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(digest=digest).first()
+            if blob is None or not self.exists(blob.name):
+                target = blob.name if blob is not None else blob_name(digest, name)
+                super()._save(target, content)
+                if blob is None:
+                    blob, _ = Blob.objects.get_or_create(digest=digest, defaults={
+                        'name': target, 'size': size, 'crc32': crc32})
+            updates = {'last_used_at': timezone.now()}
+            if blob.crc32 is None and crc32 is not None:
+                updates['crc32'] = crc32
+            Blob.objects.filter(pk=digest).update(**updates)
+        return blob.name
+
+
+class _HashingMixin:
+    """Upload handler mixin that sets ``sha256`` and ``crc32`` on the file it completes"""
+
+    def _hashing(self):
+        return True
+
+    def new_file(self, *args, **kwargs):
+        self.checksum = Checksum()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self._hashing():
+            self.checksum.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.checksum.sha256.hexdigest()
+            file.crc32 = self.checksum.crc32
+        return file
+
+
+class HashingMemoryFileUploadHandler(_HashingMixin, MemoryFileUploadHandler):
+
+    def _hashing(self):
+        return self.activated  # Otherwise the chunks pass on to the next handler
+
+
+class HashingTemporaryFileUploadHandler(_HashingMixin, TemporaryFileUploadHandler):
+    pass
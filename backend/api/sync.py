@@ -0,0 +1,105 @@
+"""Delta sync of a photographer's jobs and payments.
+
+A full list comes with a ``Sync-Token`` header (the time the request
+started). Sending it back as ``?since=<token>`` returns only what changed
+after it: ``changed`` rows (by ``updated_at``) and the ids of ``deleted``
+ones, which signals record as a ``Tombstone`` when a row is deleted or
+moves to another photographer. A row committed up to ``SYNC_OVERLAP``
+seconds after its ``updated_at`` is still picked up, at the cost of some
+rows arriving twice; clients upsert ``changed`` and drop ``deleted``.
+
+Tombstones are kept ``SYNC_TOMBSTONE_DAYS`` (``prune_tombstones`` deletes
+older ones), so an older token gets 410 and the client starts over.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from .conditional import touch
+from .models import Job, Payment, Tombstone
+
+KINDS = {Job: 'job', Payment: 'payment'}
+
+
+class SyncExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Sync token expired; fetch the full list again'
+    default_code = 'sync_expired'
+
+
+def make_token(moment):
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def parse_token(token):
+    """The moment a token was issued; raises ``ValidationError`` or ``SyncExpired``"""
+    try:
+        since = datetime.fromtimestamp(int(token) / 1_000_000, tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise serializers.ValidationError({'since': 'Invalid sync token'})
+    if since < timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS):
+        raise SyncExpired()
+    return since
+
+
+def record_removed(model, rows):
+    """Tombstone ``(object_id, owner_id)`` pairs of ``model`` rows gone from their owner's list"""
+    rows = [(pk, owner_id) for pk, owner_id in rows if owner_id is not None]
+    if rows:
+        Tombstone.objects.bulk_create([Tombstone(kind=KINDS[model], object_id=pk, owner_id=owner_id)
+                                       for pk, owner_id in rows])
+        touch(Tombstone)
+
+
+def record_reassigned(model, instances):
+    """Tombstone rows whose photographer changed since they were loaded.
+
+    Uses the ``_rollup_state`` the rollup signals keep on every Job and
+    Payment, so call it before they refresh it in ``post_save``.
+    """
+    rows = []
+    for instance in instances:
+        old = getattr(instance, '_rollup_state', None)
+        if old is not None and old.photographer_id != instance.photographer_id:
+            rows.append((instance.pk, old.photographer_id))
+    record_removed(model, rows)
+
+
+def prune_tombstones():
+    """Delete tombstones older than the retention window; returns how many"""
+    cutoff = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
+
+
+def sync_payload(user, since, scope, queryset, render):
+    """``(data, token)`` for ``sync_response``; ``since`` is the ``?since=`` value or ``None``"""
+    token = make_token(timezone.now())
+    if since is None:
+        return render(queryset), token
+
+    since = parse_token(since) - timedelta(seconds=settings.SYNC_OVERLAP)
+    changed = queryset.filter(updated_at__gte=since)
+    rows = render(changed)
+    left = scope.filter(updated_at__gte=since).exclude(pk__in=changed.values('pk')).values_list('pk', flat=True)
+    deleted = set(Tombstone.objects.filter(kind=KINDS[scope.model], owner_id=user.pk,
+                                           deleted_at__gte=since).values_list('object_id', flat=True))
+    deleted = sorted((deleted | set(left)) - {row['id'] for row in rows})
+    return {'changed': rows, 'deleted': deleted, 'next': token}, token
+
+
+def sync_response(request, scope, queryset, render):
+    """The full ``queryset``, or with ``?since=`` the changes to it since then.
+
+    ``scope`` is all of the user's rows and ``queryset`` the ones the request
+    asked for, so rows that stopped matching a filter are reported deleted.
+    ``render`` turns a queryset into the serialized list.
+    """
+    data, token = sync_payload(request.user, request.query_params.get('since'), scope, queryset, render)
+    response = Response(data)
+    response['Sync-Token'] = token
+    return response
@@ -0,0 +1,52 @@
+import shutil
+import tempfile
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ..models import Job, Property, Service, User
+
+
+def make_user(username, role='broker', **kwargs):
+    return User.objects.create_user(username, f'{username}@example.com', 'pw', role=role, **kwargs)
+
+
+def make_property(owner, **kwargs):
+    return Property.objects.create(**{'address': '1 Oak St', 'city': 'Austin', 'state': 'TX', 'zip_code': '78701',
+                                      'property_type': 'house', 'owner': owner, **kwargs})
+
+
+def make_service(**kwargs):
+    return Service.objects.create(**{'name': 'Photography', 'description': 'Stills', 'price': Decimal('199.00'),
+                                     'icon': 'camera', **kwargs})
+
+
+def make_job(photographer, **kwargs):
+    return Job.objects.create(**{
+        'property_address': '1 Oak St', 'property_city': 'Austin', 'property_state': 'TX',
+        'service_type': 'Photography', 'scheduled_date': date(2030, 1, 7), 'scheduled_time': '9:30 AM',
+        'client_name': 'Ava Kim', 'client_email': 'ava@example.com', 'service_price': Decimal('100.00'),
+        'photographer': photographer, **kwargs})
+
+
+class APITestCase(TestCase):
+    """A ``TestCase`` whose ``self.client`` is signed in as ``self.user``, a broker"""
+
+    def setUp(self):
+        self.user = make_user('broker')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class TempMediaRootMixin:
+    """Points ``MEDIA_ROOT`` (and so media storage) at a temporary directory for each test"""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_root = override_settings(MEDIA_ROOT=self.media_root)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
@@ -0,0 +1,97 @@
+import os
+import zipfile
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+
+from .. import archive
+from ..archive import parse_range
+from ..models import Media, media_storage
+from .helpers import APITestCase, TempMediaRootMixin, make_property, make_service
+
+
+class ArchiveTests(TempMediaRootMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.property = make_property(self.user)
+        self.photos, self.video = make_service(), make_service(name='Video')
+        self.files = {
+            'photo/front.jpg': os.urandom(3000),
+            'photo/front (1).jpg': os.urandom(5000),
+            'video/tour.mp4': os.urandom(7000),
+        }
+        self.add('photo', 'front.jpg', self.files['photo/front.jpg'])
+        self.add('photo', 'front.jpg', self.files['photo/front (1).jpg'])
+        # Stored before blobs, so its CRC-32 isn't known up front
+        os.makedirs(os.path.join(self.media_root, 'property_media'))
+        with open(os.path.join(self.media_root, 'property_media', 'tour.mp4'), 'wb') as fh:
+            fh.write(self.files['video/tour.mp4'])
+        Media.objects.create(property=self.property, service=self.video, type='video',
+                             file='property_media/tour.mp4', file_name='tour.mp4', file_size=7000)
+        self.url = f'/api/properties/{self.property.pk}/media/archive/'
+
+    def add(self, media_type, file_name, content):
+        name = media_storage().save(f'property_media/{file_name}', ContentFile(content))
+        return Media.objects.create(property=self.property, service=self.photos, type=media_type, file=name,
+                                    file_name=file_name, file_size=len(content))
+
+    def download(self, **headers):
+        response = self.client.get(self.url, **headers)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_whole_archive(self):
+        response, body = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn(f'property-{self.property.pk}-media.zip', response['Content-Disposition'])
+        with zipfile.ZipFile(BytesIO(body)) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual({name: zf.read(name) for name in zf.namelist()}, self.files)
+
+    def test_ranges_resume_the_same_bytes(self):
+        _, body = self.download()
+        size = len(body)
+        for start, end in ((0, 99), (100, 4000), (4000, 12000), (5500, size - 1), (size - 22, size - 1)):
+            with self.subTest(start=start, end=end):
+                response, part = self.download(HTTP_RANGE=f'bytes={start}-{end}')
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{size}')
+                self.assertEqual(part, body[start:end + 1])
+        response, part = self.download(HTTP_RANGE='bytes=-10')
+        self.assertEqual(part, body[-10:])
+
+    def test_if_range_and_unsatisfiable_ranges(self):
+        response, body = self.download()
+        etag = response['ETag']
+        response, _ = self.download(HTTP_RANGE='bytes=10-', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        response, stale = self.download(HTTP_RANGE='bytes=10-', HTTP_IF_RANGE='"other"')
+        self.assertEqual((response.status_code, stale), (200, body))
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(body)}-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, f'bytes */{len(body)}'))
+
+    def test_filters(self):
+        with zipfile.ZipFile(BytesIO(self.client.get(self.url, {'type': 'video'}).getvalue())) as zf:
+            self.assertEqual(zf.namelist(), ['video/tour.mp4'])
+        with zipfile.ZipFile(BytesIO(self.client.get(self.url, {'service': self.photos.pk}).getvalue())) as zf:
+            self.assertEqual(zf.namelist(), ['photo/front.jpg', 'photo/front (1).jpg'])
+        self.assertEqual(self.client.get(self.url, {'service': 'x'}).status_code, 400)
+
+    def test_streams_in_chunks(self):
+        big = os.urandom(archive.CHUNK_SIZE * 2 + 1)
+        self.add('photo', 'big.jpg', big)
+        self.assertLessEqual(max(len(chunk) for chunk in self.client.get(self.url).streaming_content),
+                             archive.CHUNK_SIZE)
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=5-', 10), (5, 9))
+        self.assertEqual(parse_range('bytes=5-50', 10), (5, 9))
+        self.assertEqual(parse_range('bytes=-3', 10), (7, 9))
+        for header in (None, 'items=0-1', 'bytes=0-1,3-4', 'bytes=a-b'):
+            self.assertIsNone(parse_range(header, 10))
+        for header in ('bytes=10-', 'bytes=5-4', 'bytes=-0'):
+            with self.assertRaises(ValueError):
+                parse_range(header, 10)
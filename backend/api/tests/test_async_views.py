@@ -0,0 +1,124 @@
+import json
+import os
+
+from asgiref.sync import async_to_sync
+from django.core.files.base import ContentFile
+from django.test import Client, TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .. import uploads
+from ..models import Media, UploadSession, media_storage
+from .helpers import APITestCase, TempMediaRootMixin, make_job, make_property, make_service, make_user
+
+
+async def _join(chunks):
+    return b''.join([chunk async for chunk in chunks])
+
+
+class AsyncViewTests(TempMediaRootMixin, APITestCase):
+    """The async endpoints answer like their DRF counterparts"""
+
+    def setUp(self):
+        super().setUp()
+        self.bearer = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.property = make_property(self.user)
+        service = make_service()
+        for i in range(2):
+            name = media_storage().save(f'property_media/{i}.jpg', ContentFile(os.urandom(2000)))
+            Media.objects.create(property=self.property, service=service, type='photo', file=name,
+                                 file_name=f'{i}.jpg', file_size=2000)
+
+    def test_property_media(self):
+        response = self.bearer.get(f'/api/async/properties/{self.property.pk}/media/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.client.get(f'/api/properties/{self.property.pk}/media/').content)
+        self.assertEqual(self.bearer.get('/api/async/properties/0/media/').status_code, 404)
+
+    def test_media_archive(self):
+        url = f'properties/{self.property.pk}/media/archive/'
+        body = b''.join(self.client.get(f'/api/{url}').streaming_content)
+        response = self.bearer.get(f'/api/async/{url}', HTTP_RANGE='bytes=100-2500')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(async_to_sync(_join)(response.streaming_content), body[100:2501])
+
+    def test_authentication_and_methods(self):
+        url = f'/api/async/properties/{self.property.pk}/media/'
+        response = Client().get(url)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+        self.assertEqual(Client(HTTP_AUTHORIZATION='Bearer junk').get(url).status_code, 401)
+        response = self.bearer.post(url)
+        self.assertEqual((response.status_code, response['Allow']), (405, 'GET'))
+
+
+@override_settings(SYNC_OVERLAP=0)
+class AsyncPhotographerJobsTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.photographer = make_user('shooter', role='photographer')
+        self.client.force_authenticate(self.photographer)
+        self.bearer = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.photographer)}')
+        self.kept, self.changed, self.deleted = [make_job(self.photographer) for _ in range(3)]
+
+    def get(self, query=''):
+        drf = self.client.get(f'/api/photographers/jobs/{query}')
+        response = self.bearer.get(f'/api/async/photographers/jobs/{query}')
+        self.assertEqual(response.status_code, drf.status_code)
+        data, expected = json.loads(response.content), json.loads(drf.content)
+        if isinstance(data, dict):  # Tokens are the time each request started
+            data.pop('next', None)
+            expected.pop('next', None)
+        self.assertEqual(data, expected)
+        return response
+
+    def test_full_list_then_changes(self):
+        response = self.get()
+        self.assertEqual(len(json.loads(response.content)), 3)
+        token = response['Sync-Token']
+
+        self.changed.status = 'completed'
+        self.changed.save()
+        deleted_pk = self.deleted.pk
+        self.deleted.delete()
+
+        data = json.loads(self.get(f'?since={token}').content)
+        self.assertEqual([row['id'] for row in data['changed']], [self.changed.pk])
+        self.assertEqual(data['deleted'], [deleted_pk])
+
+    def test_bad_token(self):
+        self.assertEqual(self.get('?since=soon').status_code, 400)
+
+
+class AsyncUploadChunkTests(TempMediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('broker')
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.session = UploadSession.objects.create(owner=self.user, property=make_property(self.user),
+                                                    service=make_service(), type='video', file_name='tour.mp4',
+                                                    file_size=20)
+
+    def patch(self, data, offset):
+        return self.client.generic('PATCH', f'/api/async/uploads/{self.session.pk}/', data,
+                                   'application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_chunks_are_checked_written_and_recorded(self):
+        response = self.patch(b'0123456789', 0)
+        self.assertEqual((response.status_code, response['Upload-Offset']), (204, '10'))
+        self.assertEqual(self.patch(b'0123456789', 0).status_code, 409)
+        self.assertEqual(self.patch(b'0123456789' * 2, 10).status_code, 413)
+        self.assertEqual(self.patch(b'abcdefghij', 10).status_code, 204)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.offset, 20)
+        with open(uploads.part_path(self.session), 'rb') as fh:
+            self.assertEqual(fh.read(), b'0123456789abcdefghij')
+
+    def test_locked_and_unknown_sessions(self):
+        with uploads.locked_part(self.session):
+            self.assertEqual(self.patch(b'0123456789', 0).status_code, 423)
+        self.assertEqual(self.patch(b'0123456789', 'x').status_code, 400)
+        other = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(make_user("stranger"))}')
+        response = other.generic('PATCH', f'/api/async/uploads/{self.session.pk}/', b'0', HTTP_UPLOAD_OFFSET='0')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,128 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from ..auth import BlacklistIndex, BloomFilter, CachedRefreshToken, TTLCache, blacklist_index, user_cache
+from .helpers import make_user
+
+
+class TTLCacheTests(TestCase):
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+
+    def test_entries_expire(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        with mock.patch('api.auth.time.monotonic', return_value=1000.0):
+            cache.set('a', 1)
+        with mock.patch('api.auth.time.monotonic', return_value=1059.0):
+            self.assertEqual(cache.get('a'), 1)
+        with mock.patch('api.auth.time.monotonic', return_value=1061.0):
+            self.assertIsNone(cache.get('a'))
+
+
+class BloomFilterTests(TestCase):
+
+    def test_no_false_negatives_and_few_false_positives(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f'in-{i}')
+        self.assertTrue(all(f'in-{i}' in bloom for i in range(1000)))
+        self.assertLess(sum(f'out-{i}' in bloom for i in range(10000)), 300)
+
+
+def jti(token):
+    return token.payload['jti']
+
+
+class BlacklistIndexTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user('broker')
+
+    def blacklist_elsewhere(self):
+        """A token blacklisted by another process: in the table, not in this index"""
+        token = CachedRefreshToken.for_user(self.user)
+        outstanding = OutstandingToken.objects.get(jti=jti(token))
+        BlacklistedToken.objects.create(token=outstanding)
+        return token
+
+    def test_top_ups_follow_the_refresh_interval(self):
+        index = BlacklistIndex(refresh_interval=30, overlap=300)
+        first = self.blacklist_elsewhere()
+        with mock.patch('api.auth.time.monotonic', return_value=1000.0):
+            self.assertTrue(index.might_contain(jti(first)))
+            second = self.blacklist_elsewhere()
+            with self.assertNumQueries(0):
+                self.assertFalse(index.might_contain(jti(second)))
+        with mock.patch('api.auth.time.monotonic', return_value=1031.0):
+            self.assertTrue(index.might_contain(jti(second)))
+
+    def test_saturated_filter_is_rebuilt_larger(self):
+        index = BlacklistIndex(refresh_interval=0, capacity=2)
+        tokens = [self.blacklist_elsewhere() for _ in range(5)]
+        self.assertTrue(all(index.might_contain(jti(token)) for token in tokens))
+        self.assertGreaterEqual(index.capacity, 5)
+
+
+class CachedAuthTests(TestCase):
+
+    def setUp(self):
+        user_cache.clear()
+        blacklist_index.reset()
+        self.user = make_user('broker')
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post('/api/auth/login/', {'email': 'broker', 'password': 'pw'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        return response.data['refresh']
+
+    def test_user_is_resolved_from_the_cache(self):
+        self.login()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/auth/me/').data['username'], 'broker')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/auth/me/').status_code, 200)
+
+    def test_user_saves_drop_the_cached_user(self):
+        self.login()
+        self.client.get('/api/auth/me/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/me/').status_code, 401)
+
+    def test_password_change_revokes_cached_tokens(self):
+        self.login()
+        self.client.get('/api/auth/me/')
+        with mock.patch('api.auth.api_settings.CHECK_REVOKE_TOKEN', True):
+            cached = user_cache.get(str(self.user.pk))
+            cached.set_password('new')  # As if the cache were stale in this process
+            self.assertEqual(self.client.get('/api/auth/me/').status_code, 401)
+
+    def test_refresh_rotation_and_logout_blacklist(self):
+        refresh = self.login()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/auth/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 200)
+        # The Bloom filter answered "not blacklisted" without a per-token lookup
+        self.assertFalse([q for q in queries if 'FROM "token_blacklist_blacklistedtoken"' in q['sql']
+                          and '"token_blacklist_outstandingtoken"."jti" =' in q['sql']])
+
+        # The rotated-out token was blacklisted
+        self.assertEqual(self.client.post('/api/auth/refresh/', {'refresh': refresh}, format='json').status_code, 401)
+
+        rotated = response.data['refresh']
+        self.assertEqual(self.client.post('/api/auth/logout/', {'refresh': rotated}, format='json').status_code, 205)
+        self.assertEqual(self.client.post('/api/auth/refresh/', {'refresh': rotated}, format='json').status_code, 401)
+        self.assertEqual(self.client.post('/api/auth/logout/', {'refresh': 'junk'}, format='json').status_code, 400)
@@ -0,0 +1,94 @@
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+
+from ..availability import find_available_photographers, parse_time
+from ..models import Availability, Booking, Photographer, ZipCentroid
+from .helpers import APITestCase, make_job, make_user
+
+DAY = date(2030, 1, 7)
+
+
+class AvailabilityTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        ZipCentroid.objects.create(zip_code='78701', city='Austin', state='TX', place='austin|tx',
+                                   latitude=30.27, longitude=-97.74)
+        ZipCentroid.objects.create(zip_code='75201', city='Dallas', state='TX', place='dallas|tx',
+                                   latitude=32.79, longitude=-96.80)
+
+    def add_photographer(self, username, rating, zip_code=None):
+        return Photographer.objects.create(user=make_user(username, role='photographer'), bio='',
+                                           rating=Decimal(rating), available_dates=[DAY.isoformat()],
+                                           base_zip_code=zip_code)
+
+    def available(self, **params):
+        response = self.client.get('/api/photographers/available/', {'date': DAY.isoformat(), **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data]
+
+    def test_parse_time(self):
+        self.assertEqual([parse_time(v) for v in ('14:30', '2:30 PM', '9am', '12 am', '13pm', '25:00', None)],
+                         [870, 870, 540, 0, None, None, None])
+
+    def test_intervals_carry_the_base_city(self):
+        austin = self.add_photographer('austin', '4.5', '78701-1234')
+        anywhere = self.add_photographer('anywhere', '4.0')
+        self.assertEqual(Availability.objects.get(photographer=austin).city, 'Austin')
+        self.assertIsNone(Availability.objects.get(photographer=anywhere).city)
+
+        austin.base_zip_code = '75201'
+        austin.save()
+        self.assertEqual(Availability.objects.get(photographer=austin).city, 'Dallas')
+
+    def test_best_free_photographers_in_a_city(self):
+        austin = self.add_photographer('austin', '4.5', '78701')
+        dallas = self.add_photographer('dallas', '5.0', '75201')
+        anywhere = self.add_photographer('anywhere', '4.0')
+        make_job(austin.user, scheduled_date=DAY, scheduled_time='10:00 AM')
+
+        self.assertEqual(self.available(), [dallas.pk, anywhere.pk])  # Austin is booked part of the day
+        self.assertEqual(self.available(time='8:00'), [dallas.pk, austin.pk, anywhere.pk])
+        self.assertEqual(self.available(city=' austin ', time='8:00'), [austin.pk, anywhere.pk])
+        self.assertEqual(self.available(city='Austin', time='10:30'), [anywhere.pk])
+        self.assertEqual(self.available(city='Houston', limit=5), [anywhere.pk])
+        self.assertEqual(self.available(limit=1), [dallas.pk])
+        self.assertEqual(self.available(date='2030-01-08'), [])
+        self.assertEqual(list(find_available_photographers(DAY, start=600, duration=30, city='Dallas')),
+                         [dallas, anywhere])
+
+    def test_bad_parameters(self):
+        for params in ({'date': ''}, {'time': '25:00'}, {'limit': 'x'}, {'duration': '-5'}):
+            with self.subTest(params=params):
+                response = self.client.get('/api/photographers/available/', {'date': DAY.isoformat(), **params})
+                self.assertEqual(response.status_code, 400)
+
+    def test_cancelled_jobs_free_the_slot(self):
+        photographer = self.add_photographer('austin', '4.5', '78701')
+        job = make_job(photographer.user, scheduled_date=DAY, scheduled_time='10:00')
+        self.assertEqual(Booking.objects.get(job=job).start_minute, 600)
+        job.status = 'cancelled'
+        job.save()
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(self.available(time='10:00'), [photographer.pk])
+
+    def test_gazetteer_reload_re_resolves_cities(self):
+        photographer = self.add_photographer('austin', '4.5', '78701')
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as f:
+            f.write('zip,city,state,lat,lng\n78701,Round Rock,TX,30.5,-97.6\n')
+            f.flush()
+            call_command('load_gazetteer', f.name, stdout=StringIO())
+        self.assertEqual(Availability.objects.get(photographer=photographer).city, 'Round Rock')
+
+    def test_rebuild(self):
+        photographer = self.add_photographer('austin', '4.5', '78701')
+        make_job(photographer.user, scheduled_date=DAY, scheduled_time='10:00')
+        Availability.objects.all().delete()
+        Booking.objects.all().delete()
+        call_command('rebuild_availability', stdout=StringIO())
+        self.assertEqual(Availability.objects.get().city, 'Austin')
+        self.assertEqual(Booking.objects.count(), 1)
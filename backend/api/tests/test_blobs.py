@@ -0,0 +1,124 @@
+import hashlib
+from datetime import timedelta
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import blobs
+from ..models import Blob, Media, media_storage
+from .helpers import APITestCase, TempMediaRootMixin, make_job, make_property, make_service, make_user
+
+CONTENT = b'abc'
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+
+
+class BlobRefcountTests(TempMediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner = make_user('broker')
+        self.property = make_property(self.owner)
+        self.service = make_service()
+
+    def add_media(self, name):
+        return Media.objects.create(property=self.property, service=self.service, type='photo', file=name,
+                                    file_name='IMG_0001.jpg', file_size=len(CONTENT))
+
+    def test_same_content_is_stored_once_and_counted(self):
+        storage = media_storage()
+        name = storage.save('property_media/a.jpg', ContentFile(CONTENT))
+        self.assertEqual(storage.save('property_media/b.jpg', ContentFile(CONTENT)), name)
+        blob = Blob.objects.get()
+        self.assertEqual((blob.digest, blob.name, blob.size, blob.refs), (DIGEST, name, 3, 0))
+
+        first, second = self.add_media(name), self.add_media(name)
+        self.assertEqual(Blob.objects.get().refs, 2)
+        first.delete()
+        self.assertEqual(Blob.objects.get().refs, 1)
+        self.assertEqual(blobs.collect_blobs(grace=0), (0, 0))
+
+        second.delete()
+        self.assertEqual(Blob.objects.get().refs, 0)
+        stdout = StringIO()
+        call_command('collect_blobs', grace=0, stdout=stdout)
+        self.assertEqual(stdout.getvalue().strip(), 'Deleted 1 blobs (3 bytes)')
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(storage.exists(name))
+
+    def test_unreferenced_blobs_wait_out_the_grace(self):
+        media_storage().save('property_media/a.jpg', ContentFile(CONTENT))
+        self.assertEqual(blobs.collect_blobs(grace=3600), (0, 0))
+        self.assertTrue(Blob.objects.exists())
+
+    def test_refiling_and_job_uploads_move_the_counts(self):
+        storage = media_storage()
+        old = storage.save('property_media/a.jpg', ContentFile(CONTENT))
+        new = storage.save('property_media/b.jpg', ContentFile(b'def'))
+        media = self.add_media(old)
+        media.file = new
+        media.save()
+        self.assertEqual(dict(Blob.objects.values_list('name', 'refs')), {old: 0, new: 1})
+
+        job = make_job(make_user('shooter', role='photographer'),
+                       uploaded_files=[{'name': 'a.jpg', 'file': old, 'size': 3}])
+        with self.captureOnCommitCallbacks(execute=True):
+            Blob.objects.filter(name=old).update(refs=1)  # What the upload counted
+            job.delete()
+        self.assertEqual(Blob.objects.get(name=old).refs, 0)
+
+    def test_collection_recounts_a_drifted_count(self):
+        name = media_storage().save('property_media/a.jpg', ContentFile(CONTENT))
+        self.add_media(name)
+        make_job(make_user('shooter', role='photographer'), uploaded_files=[{'name': 'a.jpg', 'file': name}])
+        Blob.objects.update(refs=0, last_used_at=timezone.now() - timedelta(days=1))
+        with self.assertLogs('api.blobs', 'WARNING'):
+            self.assertEqual(blobs.collect_blobs(grace=0), (0, 0))
+        self.assertEqual(Blob.objects.get().refs, 2)
+        self.assertTrue(media_storage().exists(name))
+
+    def test_claim_needs_a_blob_the_user_has(self):
+        name = media_storage().save('property_media/a.jpg', ContentFile(CONTENT))
+        self.assertIsNone(blobs.claim(DIGEST, 3, self.owner))
+        self.add_media(name)
+        self.assertEqual(blobs.claim(DIGEST, 3, self.owner), name)
+        self.assertIsNone(blobs.claim(DIGEST, 3, make_user('stranger')))
+        self.assertIsNone(blobs.claim(DIGEST, 4, self.owner))
+
+        photographer = make_user('shooter', role='photographer')
+        self.assertIsNone(blobs.claim(DIGEST, 3, photographer))
+        make_job(photographer, uploaded_files=[{'name': 'a.jpg', 'file': name, 'size': 3}])
+        self.assertEqual(blobs.claim(DIGEST, 3, photographer), name)
+
+
+class BlobReuseUploadTests(TempMediaRootMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.service = make_service()
+        name = media_storage().save('property_media/a.jpg', ContentFile(CONTENT))
+        Media.objects.create(property=make_property(self.user), service=self.service, type='photo', file=name,
+                             file_name='a.jpg', file_size=len(CONTENT))
+
+    def open_session(self):
+        return self.client.post('/api/uploads/', {
+            'property': make_property(self.user).pk, 'service': self.service.pk, 'type': 'photo',
+            'file_name': 'copy.jpg', 'file_size': len(CONTENT), 'sha256': DIGEST.upper()}, format='json')
+
+    def test_owner_skips_the_transfer(self):
+        response = self.open_session()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Upload-Offset'], str(len(CONTENT)))
+        self.assertIsNotNone(response.data['completed_at'])
+        self.assertEqual(Blob.objects.get().refs, 2)
+
+    def test_others_send_the_file_like_anyone_else(self):
+        self.user = make_user('stranger')
+        self.client.force_authenticate(self.user)
+        response = self.open_session()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Upload-Offset'], '0')
+        self.assertIsNone(response.data['completed_at'])
+        self.assertEqual(Media.objects.count(), 1)
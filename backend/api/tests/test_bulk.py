@@ -0,0 +1,77 @@
+from datetime import date
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .. import search
+from ..models import Booking, Job, SearchDocument, Tombstone
+from .helpers import APITestCase, make_job, make_property, make_service, make_user
+
+
+class BulkWriteTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.photographer = make_user('shooter', role='photographer')
+        self.jobs = [make_job(self.photographer) for _ in range(3)]
+
+    def test_patch_accepts_string_ids_and_resyncs_bookings(self):
+        rows = [{'id': str(job.pk), 'scheduled_time': '2:30 PM'} for job in self.jobs[:2]]
+        rows.append({'id': self.jobs[2].pk, 'status': 'cancelled'})
+        response = self.client.patch('/api/jobs/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Job.objects.filter(scheduled_time='2:30 PM').count(), 2)
+        self.assertEqual(set(Booking.objects.values_list('job_id', 'start_minute')),
+                         {(self.jobs[0].pk, 14 * 60 + 30), (self.jobs[1].pk, 14 * 60 + 30)})
+
+    def test_invalid_ids_are_rejected(self):
+        response = self.client.patch('/api/jobs/bulk/', [{'id': 'abc', 'status': 'completed'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['ids'], ['abc'])
+        response = self.client.delete('/api/jobs/bulk/', {'ids': [self.jobs[0].pk, None]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Job.objects.count(), 3)
+
+    def test_missing_ids_are_not_found(self):
+        response = self.client.patch('/api/jobs/bulk/', [{'id': 999999, 'status': 'completed'}], format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['ids'], [999999])
+
+    def test_delete_by_string_ids(self):
+        ids = [str(job.pk) for job in self.jobs[:2]]
+        response = self.client.delete('/api/jobs/bulk/', {'ids': ids}, format='json')
+        self.assertEqual(response.data, {'deleted': 2})
+        self.assertEqual(list(Job.objects.values_list('pk', flat=True)), [self.jobs[2].pk])
+
+    def test_create_property_services_books_photographers(self):
+        property_obj = make_property(self.user)
+        service = make_service(name='Drone')
+        rows = [{'property': property_obj.pk, 'service': service.pk, 'photographer': self.photographer.pk,
+                 'scheduled_date': '2030-01-08', 'scheduled_time': '10:00 AM'},
+                {'property': property_obj.pk, 'service': service.pk}]
+        response = self.client.post('/api/property-services/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 2)
+        booking = Booking.objects.get(property_service__isnull=False)
+        self.assertEqual((booking.photographer_id, booking.date, booking.start_minute),
+                         (self.photographer.pk, date(2030, 1, 8), 10 * 60))
+
+    def test_batch_size_does_not_add_queries(self):
+        def count(method, rows):
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)('/api/jobs/bulk/', rows, format='json')
+            self.assertLess(response.status_code, 300)
+            return len(queries)
+
+        more = [make_job(self.photographer) for _ in range(7)]
+        for method, rows in (('patch', lambda jobs: [{'id': job.pk, 'status': 'completed'} for job in jobs]),
+                             ('delete', lambda jobs: {'ids': [job.pk for job in jobs]})):
+            with self.subTest(method=method):
+                self.assertEqual(count(method, rows(self.jobs[:1])), count(method, rows(more)))
+
+    def test_delete_bookkeeping_is_batched(self):
+        search.index_objects(self.jobs)
+        self.client.delete('/api/jobs/bulk/', {'ids': [job.pk for job in self.jobs]}, format='json')
+        self.assertEqual(sorted(Tombstone.objects.values_list('object_id', flat=True)),
+                         sorted(job.pk for job in self.jobs))
+        self.assertFalse(SearchDocument.objects.exists())
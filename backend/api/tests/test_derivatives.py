@@ -0,0 +1,90 @@
+import os
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.utils import timezone
+from PIL import Image
+
+from ..derivatives import DerivativeError, render_derivatives
+from ..models import Media, MediaTask, media_storage
+from .helpers import APITestCase, TempMediaRootMixin, make_property, make_service
+
+
+def jpeg(width=800, height=600):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), (200, 120, 40)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class DerivativePipelineTests(TempMediaRootMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.property = make_property(self.user)
+        self.service = make_service()
+
+    def add_photo(self, content=None):
+        name = media_storage().save('property_media/house.jpg', ContentFile(content or jpeg()))
+        with self.captureOnCommitCallbacks(execute=True):
+            return Media.objects.create(property=self.property, service=self.service, type='photo', file=name,
+                                        file_name='house.jpg', file_size=1)
+
+    def process(self, **options):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('process_media_tasks', once=True, workers=1, stdout=StringIO(), stderr=StringIO(),
+                         **options)
+
+    def test_render_sizes_and_formats(self):
+        path = os.path.join(self.media_root, 'source.jpg')
+        with open(path, 'wb') as fh:
+            fh.write(jpeg(800, 400))
+        derivatives = render_derivatives(path, self.media_root, 'stem')
+        self.assertEqual(sorted((d['width'], d['format']) for d in derivatives),
+                         [(320, 'jpg'), (320, 'webp'), (640, 'jpg'), (640, 'webp')])
+        self.assertEqual({d['height'] for d in derivatives if d['width'] == 320}, {160})
+        for derivative in derivatives:
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, derivative['file'])))
+        with self.assertRaises(DerivativeError):
+            render_derivatives(__file__, self.media_root, 'stem')
+
+    def test_new_photo_is_queued_and_processed(self):
+        media = self.add_photo()
+        self.assertEqual(MediaTask.objects.get().status, 'pending')
+        stale = self.client.get('/api/media/')
+        self.process()
+
+        media.refresh_from_db()
+        self.assertTrue(media.thumbnail.name.endswith('_320w.jpg'))
+        self.assertEqual(len(media.derivatives), 4)
+        self.assertEqual(MediaTask.objects.get().status, 'done')
+        # The worker's update() bumps the table version, so clients don't get a stale 304
+        response = self.client.get('/api/media/', HTTP_IF_NONE_MATCH=stale['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('320w', response.data['results'][0]['srcset']['webp'])
+
+    def test_broken_file_is_retried_then_failed(self):
+        self.add_photo(b'not an image')
+        for attempt in range(3):
+            self.process(max_attempts=3)
+        task = MediaTask.objects.get()
+        self.assertEqual((task.status, task.attempts), ('failed', 3))
+        self.assertTrue(task.error)
+
+    def test_abandoned_task_is_reclaimed(self):
+        self.add_photo()
+        MediaTask.objects.update(status='running', started_at=timezone.now() - timedelta(hours=1))
+        self.process(timeout=60)
+        task = MediaTask.objects.get()
+        self.assertEqual((task.status, task.attempts), ('done', 2))
+
+    def test_deleting_media_deletes_derivatives(self):
+        media = self.add_photo()
+        self.process()
+        media.refresh_from_db()
+        paths = [os.path.join(self.media_root, d['file']) for d in media.derivatives]
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+        with self.captureOnCommitCallbacks(execute=True):
+            media.delete()
+        self.assertFalse(any(os.path.exists(path) for path in paths))
@@ -0,0 +1,108 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.test import override_settings
+
+from ..eager import QueryBudgetExceeded
+from ..models import (
+    AddonService, Customer, JobAddon, Media, Order, OrderService, OrderTravelFee, Photographer,
+    PhotographerSpecialty, PropertyFeature, PropertyService,
+)
+from ..views import JobViewSet
+from .helpers import APITestCase, make_job, make_property, make_service, make_user
+
+
+class QueryCountTests(APITestCase):
+    """Each ViewSet's reads cost a fixed number of queries, however many rows and relations they render"""
+
+    def setUp(self):
+        super().setUp()
+        self.service = make_service()
+        self.addon = AddonService.objects.create(name='Twilight Shoot', description='Dusk', price=Decimal('129.00'))
+        self.photographer = make_user('shooter', role='photographer')
+
+    def assertFlat(self, url, queries, add_row):
+        """``url`` runs ``queries`` queries with one row and with three"""
+        add_row(0)
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        add_row(1)
+        add_row(2)
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 3)
+
+    def add_property(self, i):
+        property_obj = make_property(self.user, address=f'{i} Oak St')
+        PropertyFeature.objects.bulk_create([PropertyFeature(property=property_obj, name=name)
+                                             for name in ('Pool', 'Garage')])
+        return property_obj
+
+    def add_property_service(self, i, property_obj=None):
+        property_service = PropertyService.objects.create(property=property_obj or self.add_property(i),
+                                                          service=self.service, photographer=self.photographer)
+        property_service.addons.add(self.addon)
+        return property_service
+
+    def test_properties(self):
+        self.assertFlat('/api/properties/', 2, self.add_property)
+
+    def test_property_services(self):
+        self.assertFlat('/api/property-services/', 2, self.add_property_service)
+
+    def test_orders(self):
+        def add_order(i):
+            order = Order.objects.create(property=self.add_property(i), total_amount=Decimal('328.00'))
+            OrderService.objects.create(order=order, property_service=self.add_property_service(i, order.property))
+            OrderTravelFee.objects.create(order=order, photographer=self.photographer, fee=Decimal('25.00'))
+        self.assertFlat('/api/orders/', 4, add_order)
+
+    def test_customers(self):
+        self.assertFlat('/api/customers/', 1, lambda i: Customer.objects.create(
+            name=f'Customer {i}', email=f'c{i}@example.com', phone='555-0100'))
+
+    def test_photographers(self):
+        def add_photographer(i):
+            profile = Photographer.objects.create(user=make_user(f'shooter{i}', role='photographer'), bio='')
+            PhotographerSpecialty.objects.create(photographer=profile, name='Drone')
+        self.assertFlat('/api/photographers/', 2, add_photographer)
+
+    def test_jobs(self):
+        def add_job(i):
+            JobAddon.objects.create(job=make_job(self.photographer), name='Rush Delivery', price=Decimal('75.00'))
+        self.assertFlat('/api/jobs/', 2, add_job)
+
+    def test_media(self):
+        property_obj = make_property(self.user)
+        self.assertFlat('/api/media/', 1, lambda i: Media.objects.create(
+            property=property_obj, service=self.service, type='photo', file=f'property_media/{i}.jpg',
+            file_name=f'{i}.jpg', file_size=1))
+
+    def test_property_detail_actions(self):
+        property_obj = self.add_property(0)
+        for i in range(3):
+            self.add_property_service(i, property_obj)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(f'/api/properties/{property_obj.pk}/').status_code, 200)
+        with self.assertNumQueries(4):
+            self.assertEqual(len(self.client.get(f'/api/properties/{property_obj.pk}/services/').data), 3)
+
+
+class QueryBudgetTests(APITestCase):
+
+    def test_tests_run_with_raise(self):
+        self.assertEqual(settings.QUERY_BUDGET, 'raise')
+
+    def test_going_over_budget_fails_the_request(self):
+        make_job(make_user('shooter', role='photographer'))
+        with mock.patch.object(JobViewSet, 'query_budget', 1), self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/api/jobs/')
+
+    @override_settings(QUERY_BUDGET='warn')
+    def test_warn_logs_and_answers(self):
+        make_job(make_user('shooter', role='photographer'))
+        with mock.patch.object(JobViewSet, 'query_budget', 1), self.assertLogs('api.eager', 'WARNING') as logs:
+            self.assertEqual(self.client.get('/api/jobs/').status_code, 200)
+        self.assertIn('JobViewSet.list ran 2 queries (budget 1)', logs.output[0])
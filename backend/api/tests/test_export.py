@@ -0,0 +1,89 @@
+import csv
+import io
+import re
+import zipfile
+from datetime import date
+from decimal import Decimal
+
+from django.test import override_settings
+
+from ..models import Customer, Payment
+from .helpers import APITestCase, make_job, make_user
+
+
+def content(response):
+    return b''.join(response.streaming_content)
+
+
+def sheet_rows(data):
+    """Cell values of each row of an exported workbook's sheet"""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        xml = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+    return [re.findall(r'<(?:v|t xml:space="preserve")>(.*?)</', row) for row in re.findall(r'<row>(.*?)</row>', xml)]
+
+
+class ExportTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.photographer = make_user('shooter', role='photographer')
+        self.done = make_job(self.photographer, status='completed', client_name='=HYPERLINK("x")',
+                             notes='Gate code 42', scheduled_date=date(2030, 1, 8))
+        self.upcoming = make_job(self.photographer)
+
+    def test_csv_follows_the_list_filters(self):
+        response = self.client.get('/api/export/jobs.csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertRegex(response['Content-Disposition'], r'^attachment; filename="jobs-\d{4}-\d{2}-\d{2}\.csv"$')
+        rows = list(csv.DictReader(io.StringIO(content(response).decode('utf-8'))))
+        self.assertEqual([int(row['id']) for row in rows], [self.upcoming.pk, self.done.pk])  # As the list orders them
+        self.assertNotIn('uploaded_files', rows[0])
+        self.assertEqual((rows[0]['service_price'], rows[0]['notes'], rows[0]['photographer']),
+                         ('100.00', '', str(self.photographer.pk)))
+        self.assertEqual(rows[1]['client_name'], '\'=HYPERLINK("x")')  # Not run as a formula
+
+        response = self.client.get('/api/export/jobs.csv', {'status': 'completed'})
+        rows = list(csv.DictReader(io.StringIO(content(response).decode('utf-8'))))
+        self.assertEqual([(int(row['id']), row['scheduled_date']) for row in rows], [(self.done.pk, '2030-01-08')])
+
+    def test_header_goes_out_before_the_query(self):
+        response = self.client.get('/api/export/jobs.csv')
+        chunks = iter(response.streaming_content)
+        with self.assertNumQueries(0):
+            self.assertTrue(next(chunks).startswith(b'id,property_address,'))
+        with self.assertNumQueries(1):
+            self.assertEqual(len(b''.join(chunks).splitlines()), 2)
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_xlsx(self):
+        Customer.objects.bulk_create([Customer(name=f'Client {i}', email=f'c{i}@example.com', phone='555')
+                                      for i in range(5)])
+        response = self.client.get('/api/export/customers.xlsx')
+        self.assertEqual(response['Content-Type'],
+                         'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        rows = sheet_rows(content(response))
+        self.assertEqual(rows[0], ['id', 'name', 'email', 'phone', 'company', 'created_at'])
+        self.assertEqual([row[1] for row in rows[1:]], [f'Client {i}' for i in reversed(range(5))])
+        self.assertEqual(len(rows[1]), 5)  # An empty company is an empty cell
+        self.assertGreater(float(rows[1][-1]), 45000)  # Dates are Excel serial numbers
+
+    def test_payments_are_scoped_to_their_photographer(self):
+        mine = Payment.objects.create(photographer=self.photographer, job=self.done, amount=Decimal('100.00'))
+        other = make_user('other', role='photographer')
+        theirs = Payment.objects.create(photographer=other, job=make_job(other), amount=Decimal('80.00'))
+        ids = lambda: [row[0] for row in csv.reader(io.StringIO(
+            content(self.client.get('/api/export/payments.csv')).decode('utf-8')))][1:]
+
+        self.client.force_authenticate(self.photographer)
+        self.assertEqual(ids(), [str(mine.pk)])
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_authenticate(self.user)
+        self.assertEqual(ids(), [str(theirs.pk), str(mine.pk)])
+
+    def test_unknown_exports(self):
+        self.assertEqual(self.client.get('/api/export/users.csv').status_code, 404)
+        self.assertEqual(self.client.get('/api/export/jobs.pdf').status_code, 404)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/export/jobs.csv').status_code, 401)
@@ -0,0 +1,94 @@
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from ..eager import plan_queryset
+from ..flat import FlatSerializer
+from ..models import JobAddon, Media, PropertyFeature
+from ..renderers import FastJSONParser, FastJSONRenderer
+from ..serializers import JobSerializer, MediaSerializer, PropertySerializer
+from .helpers import APITestCase, make_job, make_property, make_service, make_user
+
+
+class FastJSONTests(TestCase):
+    data = {
+        'id': 7, 'price': Decimal('549000.50'), 'date': date(2030, 1, 7), 'uuid': uuid.UUID(int=5),
+        'at': datetime(2030, 1, 7, 9, 30, 0, 123456, tzinfo=timezone.utc), 'naive': datetime(2030, 1, 7, 9, 30),
+        'text': 'Café   line   “quoted” </script>', 'nested': [{'a': None, 'b': True, 'c': 1.5}],
+        3: 'int key',
+    }
+
+    def test_output_matches_json_renderer(self):
+        for data in (self.data, [self.data] * 3, {}, [], 'plain'):
+            with self.subTest(data=data):
+                self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_falls_back_for_indent_and_unknown_values(self):
+        context = {'indent': 2}
+        self.assertEqual(FastJSONRenderer().render(self.data, 'application/json', context),
+                         JSONRenderer().render(self.data, 'application/json', context))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+        with self.assertRaises(TypeError):
+            FastJSONRenderer().render({'bad': object()})
+
+    def test_parser(self):
+        body = JSONRenderer().render(self.data)
+        self.assertEqual(FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"a": '))
+
+
+class FlatSerializerTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        service = make_service()
+        for i in range(3):
+            property_obj = make_property(self.user, address=f'{i} Oak St', bathrooms=Decimal('2.5'),
+                                         price=Decimal('550000.00') if i else None)
+            PropertyFeature.objects.bulk_create([PropertyFeature(property=property_obj, name=name)
+                                                 for name in ('Pool', 'Garage')[:i]])
+            Media.objects.create(property=property_obj, service=service, type='photo',
+                                 file=f'property_media/{i}.jpg', file_name=f'{i}.jpg', file_size=4_000_000,
+                                 derivatives=[{'width': 320, 'format': 'jpg', 'file': f'derivatives/{i}_320w.jpg'}])
+            job = make_job(make_user(f'shooter{i}', role='photographer'), notes='Gate code “1234”' if i else None)
+            JobAddon.objects.bulk_create([JobAddon(job=job, name='Drone', price=Decimal('99.00'))] * i)
+        self.context = {'request': Request(APIRequestFactory().get('/'))}
+
+    def test_rows_match_the_model_serializer(self):
+        for serializer_class in (JobSerializer, MediaSerializer, PropertySerializer):
+            with self.subTest(serializer=serializer_class.__name__):
+                queryset = serializer_class.Meta.model.objects.order_by('pk')
+                flat = FlatSerializer(serializer_class, context=self.context)
+                expected = serializer_class(plan_queryset(queryset, serializer_class), many=True,
+                                            context=self.context).data
+                with self.assertNumQueries(1 + sum(kind == 'many' for _, kind, _ in flat.plan)):
+                    rows = flat.to_representation(flat.values(queryset.all()))
+                self.assertEqual(FastJSONRenderer().render(rows), JSONRenderer().render(expected))
+
+    def test_list_endpoints_render_flat_rows(self):
+        for url in ('/api/jobs/', '/api/media/', '/api/properties/'):
+            with self.subTest(url=url):
+                rows = self.client.get(url).data['results']
+                self.assertEqual(len(rows), 3)
+                pk = rows[0]['id']
+                detail = self.client.get(f'{url}{pk}/').data
+                self.assertEqual(JSONRenderer().render(rows[0]), JSONRenderer().render(detail))
+
+
+class BenchmarkSerializationTests(TestCase):
+
+    def test_checks_output_is_identical(self):
+        stdout = StringIO()
+        call_command('benchmark_serialization', rows=20, repeat=1, stdout=stdout)
+        for name in ('JobSerializer', 'MediaSerializer', 'PropertySerializer'):
+            self.assertIn(name, stdout.getvalue())
@@ -0,0 +1,54 @@
+import json
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..models import Media
+from .helpers import make_property, make_service, make_user
+
+
+class LandingPageTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.property = make_property(make_user('broker'), status='active', landing_page_template='luxury')
+        self.url = f'/api/property/{self.property.pk}/'
+
+    def test_public_snapshot(self):
+        Media.objects.create(property=self.property, service=make_service(), type='photo',
+                             file='property_media/a.jpg', file_name='a.jpg', file_size=1)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        payload = json.loads(response.content)
+        self.assertEqual(payload['template'], 'luxury')
+        self.assertEqual(payload['property']['address'], '1 Oak St')
+        self.assertNotIn('owner', payload['property'])
+        self.assertEqual([m['file_name'] for m in payload['media']], ['a.jpg'])
+        self.assertIn('public', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+        self.assertEqual(cached.content, response.content)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_changes_drop_the_snapshot_on_commit(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.property.address = '2 Elm St'
+            self.property.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['property']['address'], '2 Elm St')
+
+    def test_drafts_and_missing_properties_are_not_found(self):
+        self.assertEqual(self.client.get(f'/api/property/{self.property.pk + 100}/').status_code, 404)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.property.status = 'draft'
+            self.property.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    async def test_async_variant_serves_the_same_snapshot(self):
+        response = await self.async_client.get(f'/api/async/property/{self.property.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, (await self.async_client.get(self.url)).content)
@@ -0,0 +1,98 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ..auth import user_cache
+from ..metrics import collapse, count_query, registry
+from .helpers import APITestCase, make_property
+
+
+class InstrumentationTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.property = make_property(self.user)
+
+    def sample(self, name, **labels):
+        """The value of one sample in the scrape, or None"""
+        pairs = ','.join(f'{k}="{v}"' for k, v in labels.items())
+        for line in self.client.get('/metrics').content.decode().splitlines():
+            if line.startswith(f'aerea_{name}{{{pairs}}} '):
+                return float(line.rsplit(' ', 1)[1])
+        return None
+
+    def test_requests_are_recorded_per_view(self):
+        response = self.client.get('/api/properties/')
+        self.assertEqual(response.status_code, 200)
+        self.client.get(f'/api/properties/{self.property.pk}/')
+        self.client.get('/api/properties/0/')
+
+        view = {'view': 'PropertyViewSet.list', 'method': 'GET'}
+        self.assertEqual(self.sample('requests_total', **view, status='200'), 1)
+        self.assertEqual(self.sample('requests_total', view='PropertyViewSet.retrieve', method='GET',
+                                     status='404'), 1)
+        self.assertEqual(self.sample('request_duration_seconds_count', **view), 1)
+        self.assertEqual(self.sample('request_duration_seconds_bucket', **view, le='+Inf'), 1)
+        self.assertGreater(self.sample('db_queries_total', **view), 0)
+        self.assertGreater(self.sample('serialize_seconds_total', **view), 0)
+        self.assertGreater(self.sample('render_seconds_total', **view), 0)
+        self.assertEqual(self.sample('response_bytes_total', **view), len(response.content))
+
+    def test_async_view_queries_are_counted(self):
+        user_cache.clear()
+        # As when the thread that runs sync_to_async work opens its connection after startup
+        connection_created.send(sender=connection.__class__, connection=connection)
+        response = async_to_sync(AsyncClient().get)(
+            f'/api/async/properties/{self.property.pk}/media/',
+            headers={'Authorization': f'Bearer {AccessToken.for_user(self.user)}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(registry.queries[('api.async_views.property_media', 'GET')], 3)
+
+    def test_new_connections_get_the_hook(self):
+        fresh = connections.create_connection('default')
+        try:
+            fresh.ensure_connection()
+            self.assertEqual(fresh.execute_wrappers.count(count_query), 1)
+        finally:
+            fresh.close()
+
+    def test_scrape_access(self):
+        with override_settings(METRICS_ALLOWED_NETWORKS=('10.0.0.0/8',)):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code, 200)
+        with override_settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+
+class ProfilerTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_slow_requests_are_dumped(self):
+        with override_settings(PROFILE_SLOW_REQUESTS=0, PROFILE_DIR=self.directory), \
+                self.assertLogs('api.metrics', 'WARNING'):
+            self.client.get('/api/properties/')
+        [dump] = self.directory.iterdir()
+        self.assertIn('PropertyViewSet.list', dump.name)
+        self.assertTrue(dump.name.endswith('.folded'))
+
+    def test_collapse(self):
+        def inner():
+            import sys
+            return collapse(sys._getframe())
+        stack = inner()
+        self.assertTrue(stack.endswith(f'{__name__}.ProfilerTests.test_collapse;'
+                                       f'{__name__}.ProfilerTests.test_collapse.<locals>.inner'))
@@ -0,0 +1,67 @@
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+
+from django.utils import timezone
+
+from ..models import Property, PropertyService
+from .helpers import APITestCase, make_property, make_service
+
+
+class KeysetPaginationTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        moment = timezone.now()
+        # Ties on created_at: the id tiebreak must neither skip nor repeat rows
+        for i in range(8):
+            make_property(self.user, created_at=moment - timedelta(minutes=i // 3))
+        self.ordered = list(Property.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def ids(self, response):
+        return [row['id'] for row in response.data['results']]
+
+    def test_pages_walk_every_row_once_in_order(self):
+        seen, url = [], '/api/properties/?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 3)
+            seen += self.ids(response)
+            url = response.data['next']
+        self.assertEqual(seen, self.ordered)
+
+    def test_previous_link_returns_the_page_before(self):
+        first = self.client.get('/api/properties/?page_size=3')
+        second = self.client.get(first.data['next'])
+        self.assertIsNone(first.data['previous'])
+        self.assertEqual(self.ids(self.client.get(second.data['previous'])), self.ids(first))
+
+    def test_rows_inserted_ahead_do_not_shift_later_pages(self):
+        first = self.client.get('/api/properties/?page_size=3')
+        make_property(self.user)
+        self.assertEqual(self.ids(self.client.get(first.data['next'])), self.ordered[3:6])
+
+    def test_page_size_is_capped(self):
+        response = self.client.get('/api/properties/?page_size=100000')
+        self.assertEqual(len(response.data['results']), 8)
+        self.assertIsNone(response.data['next'])
+
+    def test_invalid_cursors_are_not_found(self):
+        wrong_arity = urlsafe_b64encode(b'{"p": [1], "r": 0}').decode()
+        for cursor in ('bogus', wrong_arity):
+            self.assertEqual(self.client.get(f'/api/properties/?cursor={cursor}').status_code, 404)
+
+    def test_deep_pages_are_a_range_scan(self):
+        url = self.client.get('/api/properties/?page_size=3').data['next']
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(self.ids(response), self.ordered[3:6])
+
+    def test_filtered_pages(self):
+        service = make_service()
+        properties = list(Property.objects.order_by('pk')[:2])
+        for property_obj in properties + properties[:1]:
+            PropertyService.objects.create(property=property_obj, service=service)
+        response = self.client.get(f'/api/property-services/?property={properties[0].pk}')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(self.client.get('/api/property-services/?property=x').status_code, 400)
@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+
+from .. import payouts
+from ..models import JobAddon, Payment, Photographer, PayoutRun
+from ..rollups import photographer_earnings
+from .helpers import make_job, make_user
+
+
+class PayoutTests(TestCase):
+
+    def setUp(self):
+        self.photographer = make_user('shooter', role='photographer')
+        Photographer.objects.create(user=self.photographer, bio='', travel_fee=Decimal('10.00'))
+        self.jobs = [make_job(self.photographer, status='completed') for _ in range(3)]
+        JobAddon.objects.bulk_create([JobAddon(job=self.jobs[0], name='Drone', price=Decimal('50.00')),
+                                      JobAddon(job=self.jobs[0], name='Twilight', price=Decimal('25.50'))])
+        make_job(self.photographer, status='upcoming')
+
+    def test_create_payments_pays_each_completed_job_once(self):
+        self.assertEqual(payouts.create_payments(batch_size=2), (3, Decimal('405.50')))
+        self.assertEqual(payouts.create_payments(), (0, Decimal('0.00')))
+        # The service price and its addons, plus the travel fee
+        self.assertEqual([(p.amount, p.travel_fee, p.status) for p in Payment.objects.order_by('job_id')],
+                         [(Decimal('175.50'), Decimal('10.00'), 'pending')]
+                         + [(Decimal('100.00'), Decimal('10.00'), 'pending')] * 2)
+        self.assertEqual(photographer_earnings(self.photographer)['pending'], '405.50')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Payment.objects.create(job=self.jobs[0], photographer=self.photographer, amount=Decimal('1.00'))
+
+    def test_claim_and_settle(self):
+        payouts.create_payments()
+        run = payouts.claim()
+        self.assertEqual((run.payment_count, run.total), (3, Decimal('405.50')))
+        self.assertEqual(set(Payment.objects.values_list('status', flat=True)), {'processing'})
+        self.assertIsNone(payouts.claim())
+
+        lines = list(payouts.csv_lines(run))
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].rstrip().endswith('3,375.50,30.00,405.50'))
+
+        self.assertEqual(payouts.settle(run), 3)
+        self.assertEqual(payouts.settle(run), 0)
+        self.assertEqual(set(Payment.objects.values_list('status', flat=True)), {'paid'})
+        self.assertEqual(photographer_earnings(self.photographer)['paid'], '405.50')
+
+    def test_run_payouts_command(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'run.csv')
+        stdout = StringIO()
+        call_command('run_payouts', output=path, stdout=stdout)
+        run = PayoutRun.objects.get()
+        self.assertIn(f'Payout run {run.pk}: 3 payments, 405.50', stdout.getvalue())
+        with open(path) as fh:
+            self.assertEqual(fh.read().splitlines()[0], ','.join(payouts.CSV_COLUMNS))
+        call_command('run_payouts', settle=run.pk, stdout=stdout)
+        self.assertEqual(PayoutRun.objects.get().status, 'paid')
@@ -0,0 +1,155 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ..models import AddonService, Booking, Order, Photographer, PropertyService
+from ..pricing import PricingError, catalog
+from .helpers import APITestCase, make_property, make_service, make_user
+
+
+class PricingTestCase(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.property = make_property(self.user)
+        self.service = make_service()
+        self.addon = AddonService.objects.create(name='Twilight Shoot', description='Dusk', price=Decimal('129.00'))
+        self.photographer = make_user('shooter', role='photographer')
+        Photographer.objects.create(user=self.photographer, bio='', travel_fee=Decimal('25.00'))
+
+
+class PriceCatalogTests(PricingTestCase):
+
+    def test_quote(self):
+        drone = make_service(name='Drone', price=Decimal('99.00'))
+        quote = catalog.quote([(self.service.pk, [self.addon.pk, self.addon.pk], self.photographer.pk),
+                               (drone.pk, [], self.photographer.pk)])
+        self.assertEqual([line['total'] for line in quote.lines], [Decimal('328.00'), Decimal('99.00')])
+        self.assertEqual(quote.travel_fees, [{'photographerId': self.photographer.pk, 'fee': Decimal('25.00')}])
+        self.assertEqual(quote.total, Decimal('452.00'))
+        quote = catalog.quote([(drone.pk, [], self.photographer.pk)], lambda pk, fee: fee + 10)
+        self.assertEqual(quote.travel_total, Decimal('35.00'))
+
+    def test_errors_name_every_bad_line(self):
+        self.addon.applicable_services.add(make_service(name='Video'))
+        with self.assertRaises(PricingError) as raised:
+            catalog.quote([(self.service.pk, [self.addon.pk], None), (0, [], None), (self.service.pk, [0], None)])
+        self.assertEqual(raised.exception.errors, [
+            f'line 0: addon {self.addon.pk} does not apply to service {self.service.pk}',
+            'line 1: unknown service 0',
+            'line 2: unknown addon 0',
+        ])
+
+    def test_quotes_come_from_memory_until_prices_change(self):
+        catalog.snapshot()
+        with self.assertNumQueries(0):
+            catalog.quote([(self.service.pk, [self.addon.pk], self.photographer.pk)] * 1000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.price = Decimal('149.00')
+            self.service.save()
+        self.assertEqual(catalog.quote([(self.service.pk, [], None)]).total, Decimal('149.00'))
+
+        photographer = Photographer.objects.get(user=self.photographer)
+        with self.captureOnCommitCallbacks(execute=True):
+            photographer.bio = 'Dusk specialist'
+            photographer.save()
+        snapshot = catalog.snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            photographer.travel_fee = Decimal('40.00')
+            photographer.save()
+        self.assertIsNot(catalog.snapshot(), snapshot)
+        self.assertEqual(catalog.quote([(self.service.pk, [], self.photographer.pk)]).travel_total,
+                         Decimal('40.00'))
+
+    def test_other_processes_reload_after_a_change(self):
+        snapshot = catalog.snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            catalog.invalidate()
+        catalog._snapshot = snapshot  # As if this process had kept its tables
+        self.assertIsNot(catalog.snapshot(), snapshot)
+
+
+class QuoteEndpointTests(PricingTestCase):
+
+    def test_quote(self):
+        response = self.client.post('/api/orders/quote/', {'services': [
+            {'service': self.service.pk, 'addon_ids': [self.addon.pk], 'photographer': self.photographer.pk},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['lines'][0]['total'], '328.00')
+        self.assertEqual(response.data['travel_fees'], [{'photographerId': self.photographer.pk, 'fee': 25.0}])
+        self.assertEqual(response.data['total_amount'], '353.00')
+        self.assertFalse(Order.objects.exists())
+
+    def test_unknown_service(self):
+        response = self.client.post('/api/orders/quote/', {'services': [{'service': 0}]}, format='json')
+        self.assertEqual((response.status_code, response.data['services']), (400, ['line 0: unknown service 0']))
+
+
+class CheckoutTests(PricingTestCase):
+
+    def checkout(self, **line):
+        return self.client.post('/api/orders/checkout/', {
+            'property': self.property.pk, 'total_amount': '1.00',
+            'services': [{'service': self.service.pk, 'addon_ids': [self.addon.pk], **line}],
+        }, format='json')
+
+    def test_server_prices_the_order(self):
+        response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get()
+        self.assertEqual(order.total_amount, Decimal('328.00'))
+        self.assertEqual(list(order.property_services.values_list('service_id', flat=True)), [self.service.pk])
+        self.assertEqual(list(order.property_services.get().addons.values_list('pk', flat=True)), [self.addon.pk])
+
+    def test_travel_fee_and_booking(self):
+        response = self.checkout(photographer=self.photographer.pk, scheduled_date='2030-01-07',
+                                 scheduled_time='1:00 PM')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.get().total_amount, Decimal('353.00'))
+        self.assertEqual(response.data['travel_fees'], [{'photographerId': self.photographer.pk, 'fee': 25.0}])
+        booking = Booking.objects.get()
+        self.assertEqual((booking.property_service_id, booking.start_minute),
+                         (PropertyService.objects.get().pk, 13 * 60))
+
+    def test_query_count_does_not_grow_with_lines(self):
+        def count(lines):
+            catalog.snapshot()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/api/orders/checkout/', {'property': self.property.pk, 'services': [
+                    {'service': self.service.pk, 'addon_ids': [self.addon.pk], 'photographer': self.photographer.pk,
+                     'scheduled_date': '2030-01-07', 'scheduled_time': f'{8 + i}:00 AM'} for i in range(lines)
+                ]}, format='json')
+            self.assertEqual(response.status_code, 201)
+            return len(queries)
+        count(1)  # Warms the zip centroid lookups too
+        self.assertEqual(count(1), count(4))
+
+    def test_unknown_service_creates_nothing(self):
+        response = self.client.post('/api/orders/checkout/', {
+            'property': self.property.pk, 'services': [{'service': self.service.pk + 100}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_orders_are_only_created_by_checkout(self):
+        response = self.client.post('/api/orders/', {'property': self.property.pk, 'total_amount': '500.00'},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('/api/orders/checkout/', str(response.data))
+        response = self.client.post('/api/orders/bulk/', [{'property': self.property.pk}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_updates_keep_the_quoted_price(self):
+        pk = self.checkout().data['id']
+        response = self.client.patch(f'/api/orders/{pk}/', {'status': 'paid', 'total_amount': '1.00'},
+                                     format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['status'], response.data['total_amount']), ('paid', '328.00'))
+        response = self.client.patch('/api/orders/bulk/', [{'id': pk, 'status': 'completed'}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.get().status, 'completed')
@@ -0,0 +1,63 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+
+from ..management.commands.analyze_queries import access_pattern, covered, propose, shape
+from ..models import Availability, Order, Photographer
+from .helpers import make_property, make_user
+
+
+class AccessPatternTests(TestCase):
+
+    def test_equality_range_and_order_columns(self):
+        sql = ('SELECT "jobs"."id" FROM "jobs" WHERE ("jobs"."photographer_id" = 3 AND "jobs"."status" = '
+               "'upcoming' AND \"jobs\".\"scheduled_date\" >= '2030-01-01') ORDER BY \"jobs\".\"scheduled_date\" ASC, "
+               '"jobs"."id" ASC LIMIT 21')
+        pattern = access_pattern(sql)
+        self.assertEqual(pattern, ('jobs', ['photographer_id', 'status'], [], ['scheduled_date', 'id']))
+        self.assertEqual(propose(pattern), ['photographer_id', 'status', 'scheduled_date', 'id'])
+        self.assertEqual(shape(sql).count('?'), 4)
+
+    def test_keyset_predicates_count_as_sort_columns(self):
+        sql = ('SELECT "orders"."id" FROM "orders" WHERE ("orders"."status" = \'paid\' AND '
+               '("orders"."created_at" < \'2030-01-01\' OR ("orders"."created_at" = \'2030-01-01\' AND '
+               '"orders"."id" < 5))) ORDER BY "orders"."created_at" DESC, "orders"."id" DESC')
+        self.assertEqual(access_pattern(sql), ('orders', ['status'], [], ['created_at', 'id']))
+
+    def test_values_order_by_position_and_non_selects(self):
+        sql = ('SELECT "media"."type", "media"."uploaded_at" FROM "media" WHERE "media"."property_id" = 1 '
+               'ORDER BY 2 DESC')
+        self.assertEqual(access_pattern(sql), ('media', ['property_id'], [], ['uploaded_at']))
+        self.assertIsNone(access_pattern('UPDATE "media" SET "type" = \'photo\''))
+        self.assertEqual(propose(('media', [], [], [])), [])
+
+    def test_covered(self):
+        indexes = [['property_id', 'type', 'uploaded_at', 'id']]
+        self.assertTrue(covered(['type', 'property_id', 'uploaded_at'], indexes, ['type', 'property_id']))
+        self.assertFalse(covered(['property_id', 'uploaded_at'], indexes, ['property_id']))
+
+
+class AnalyzeQueriesTests(TestCase):
+
+    def test_shipped_indexes_cover_the_default_endpoints(self):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('analyze_queries', seed=200, benchmark=True, repeat=1, stdout=stdout, stderr=stderr)
+        output = stdout.getvalue()
+        self.assertEqual(stderr.getvalue(), '')
+        self.assertIn('No missing indexes.', output)
+        self.assertNotIn('[MISSING]', output)
+        self.assertIn('Without/with api.0009_query_indexes', output)
+
+
+class ConstraintTests(TestCase):
+
+    def test_intervals_and_amounts_are_checked(self):
+        photographer = Photographer.objects.create(user=make_user('shooter', role='photographer'), bio='')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Availability.objects.create(photographer=photographer, date='2030-01-07', start_minute=600,
+                                        end_minute=600)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Order.objects.create(property=make_property(make_user('broker')), total_amount=Decimal('-1.00'))
@@ -0,0 +1,126 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+from ..models import AddonService, JobAddon, Photographer, PropertyFeature
+from .helpers import APITestCase, make_job, make_property, make_service, make_user
+
+
+class RelatedListTests(APITestCase):
+    """Child tables behind the lists the API has always sent"""
+
+    def test_property_features(self):
+        response = self.client.post('/api/properties/', {
+            'address': '5 Bay Rd', 'city': 'Austin', 'state': 'TX', 'zip_code': '78701', 'property_type': 'house',
+            'owner': self.user.pk, 'features': ['Pool', 'Garage'],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['features'], ['Pool', 'Garage'])
+        pk = response.data['id']
+
+        response = self.client.patch(f'/api/properties/{pk}/', {'features': ['Garage', 'Dock']}, format='json')
+        self.assertEqual(response.data['features'], ['Garage', 'Dock'])
+        self.assertEqual(list(PropertyFeature.objects.filter(property=pk).values_list('name', flat=True)),
+                         ['Garage', 'Dock'])
+        make_property(self.user)
+        self.assertEqual([row['id'] for row in self.client.get('/api/properties/?feature=Dock').data['results']],
+                         [pk])
+
+        response = self.client.patch(f'/api/properties/{pk}/', {'features': None}, format='json')
+        self.assertEqual(response.data['features'], [])
+
+    def test_photographer_specialties(self):
+        wedding = Photographer.objects.create(user=make_user('a', role='photographer'), bio='')
+        Photographer.objects.create(user=make_user('b', role='photographer'), bio='')
+        response = self.client.patch(f'/api/photographers/{wedding.pk}/', {'specialties': ['Twilight', 'Drone']},
+                                     format='json')
+        self.assertEqual(response.data['specialties'], ['Twilight', 'Drone'])
+        response = self.client.get('/api/photographers/', {'specialty': 'Drone'})
+        self.assertEqual([row['id'] for row in response.data['results']], [wedding.pk])
+
+    def test_property_service_addon_ids(self):
+        service = make_service()
+        staging, plan = [AddonService.objects.create(name=name, description='', price=Decimal('25.00'))
+                         for name in ('Staging', 'Floor Plan')]
+        staging.applicable_services.add(service)
+        response = self.client.post('/api/property-services/', {
+            'property': make_property(self.user).pk, 'service': service.pk, 'addon_ids': [plan.pk, staging.pk],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(response.data['addon_ids']), sorted([plan.pk, staging.pk]))
+        self.assertEqual(self.client.get(f'/api/property-services/{response.data["id"]}/').data['addon_ids'],
+                         response.data['addon_ids'])
+        self.assertEqual(list(service.addons.all()), [staging])
+
+    def test_job_addons_and_addon_revenue(self):
+        photographer = make_user('shooter', role='photographer')
+        job = make_job(photographer)
+        cancelled = make_job(photographer, status='cancelled')
+        addons = [{'name': 'Drone', 'price': 50.0}, {'name': 'Twilight', 'price': 75.5}]
+        response = self.client.patch(f'/api/jobs/{job.pk}/', {'addons': addons}, format='json')
+        self.assertEqual(response.data['addons'], addons)
+        response = self.client.patch('/api/jobs/bulk/', [{'id': cancelled.pk, 'addons': [addons[0]]}],
+                                     format='json')
+        self.assertEqual(response.data[0]['addons'], [addons[0]])
+        self.assertEqual(JobAddon.objects.count(), 3)
+
+        self.client.force_authenticate(photographer)
+        self.assertEqual(self.client.get('/api/photographers/earnings/').data['addon_revenue'], '125.50')
+
+
+class NormalizeMigrationTests(TransactionTestCase):
+    """0010 copies the JSON columns into the new tables and drops what doesn't fit"""
+    before = [('api', '0009_query_indexes')]
+    after = [('api', '0010_normalize_json_lists')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_forwards_and_backwards(self):
+        apps = self.migrate(self.before)
+        User = apps.get_model('api', 'User')
+        user = User.objects.create(username='shooter', email='s@example.com', role='photographer')
+        service = apps.get_model('api', 'Service').objects.create(name='Photos', description='', price=1,
+                                                                  icon='camera')
+        apps.get_model('api', 'Photographer').objects.create(user=user, bio='',
+                                                             specialties=[' Drone ', '', 7, 'Twilight'])
+        prop = apps.get_model('api', 'Property').objects.create(
+            address='1 Oak St', city='Austin', state='TX', zip_code='78701', property_type='house', owner=user,
+            features=['Pool'])
+        apps.get_model('api', 'Order').objects.create(
+            property=prop, total_amount=10,
+            travel_fees=[{'photographerId': user.pk, 'fee': '12.5'}, {'photographerId': 999, 'fee': 3},
+                         {'fee': 'lots'}])
+        apps.get_model('api', 'Job').objects.create(
+            property_address='1 Oak St', property_city='Austin', property_state='TX', service_type='Photos',
+            scheduled_date='2030-01-07', scheduled_time='9:30 AM', client_name='Ava', client_email='a@x.com',
+            service_price=100, photographer=user, addons=[{'name': 'Drone', 'price': 50}, {'name': 'Free'}])
+        addon = apps.get_model('api', 'AddonService').objects.create(
+            name='Staging', description='', price=25, applicable_services=[service.pk, 999, 'x'])
+        apps.get_model('api', 'PropertyService').objects.create(property=prop, service=service,
+                                                                addon_ids=[addon.pk, 999])
+
+        apps = self.migrate(self.after)
+        names = lambda model: list(apps.get_model('api', model).objects.values_list('name', flat=True))
+        self.assertEqual(names('PhotographerSpecialty'), ['Drone', 'Twilight'])
+        self.assertEqual(names('PropertyFeature'), ['Pool'])
+        self.assertEqual(list(apps.get_model('api', 'OrderTravelFee').objects.values_list('photographer_id', 'fee')),
+                         [(user.pk, Decimal('12.50')), (None, Decimal('3.00'))])
+        self.assertEqual(list(apps.get_model('api', 'JobAddon').objects.values_list('name', 'price')),
+                         [('Drone', Decimal('50.00'))])
+        addon = apps.get_model('api', 'AddonService').objects.get()
+        self.assertEqual(list(addon.applicable_services.values_list('pk', flat=True)), [service.pk])
+        self.assertEqual(list(apps.get_model('api', 'PropertyService').objects.get().addons.all()), [addon])
+
+        apps = self.migrate(self.before)
+        self.assertEqual(apps.get_model('api', 'Photographer').objects.get().specialties, ['Drone', 'Twilight'])
+        self.assertEqual(apps.get_model('api', 'PropertyService').objects.get().addon_ids, [addon.pk])
@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from ..models import Customer, Property
+from ..replicas import ReplicaRouter, pin, use_primary, use_replica, user_key
+from .helpers import make_property, make_user
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaTests(TransactionTestCase):
+    """Two SQLite databases: the in-memory test database as primary and a file as its replica"""
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        configured = connections.configure_settings({
+            'default': connections.settings[DEFAULT_DB_ALIAS],
+            'replica': {'ENGINE': 'django.db.backends.sqlite3',
+                        'NAME': os.path.join(cls.directory, 'replica.sqlite3')},
+        })
+        connections.settings['replica'] = configured['replica']
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('broker')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.property = make_property(self.user, address='1 Oak St')
+        self.replicate()
+        # The primary moves on; the replica hasn't caught up
+        Property.objects.filter(pk=self.property.pk).update(address='2 Elm St')
+
+    def replicate(self):
+        primary, replica = connections[DEFAULT_DB_ALIAS], connections['replica']
+        primary.ensure_connection()
+        replica.ensure_connection()
+        primary.connection.backup(replica.connection)
+
+    def address(self):
+        response = self.client.get(f'/api/properties/{self.property.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['address']
+
+    def test_safe_actions_read_the_replica(self):
+        self.assertEqual(self.address(), '1 Oak St')
+        self.assertEqual([row['address'] for row in self.client.get('/api/properties/').data['results']],
+                         ['1 Oak St'])
+
+    def test_writes_go_to_the_primary_and_pin_the_writer(self):
+        response = self.client.patch(f'/api/properties/{self.property.pk}/', {'city': 'Dallas'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Property.objects.using('replica').get(pk=self.property.pk).city, 'Austin')
+        self.assertEqual(Property.objects.get(pk=self.property.pk).city, 'Dallas')
+        # Reads their own write while pinned
+        self.assertEqual(self.address(), '2 Elm St')
+        self.client.force_authenticate(make_user('other'))
+        self.assertEqual(self.address(), '1 Oak St')
+
+        cache.clear()  # The pin expired
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.address(), '1 Oak St')
+
+    def test_failed_writes_do_not_pin(self):
+        response = self.client.patch(f'/api/properties/{self.property.pk}/', {'status': 'nope'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.address(), '1 Oak St')
+
+    def test_exports_stream_from_the_replica(self):
+        customer = Customer.objects.create(name='Ava Kim', email='ava@example.com', phone='555')
+        self.replicate()
+        Customer.objects.filter(pk=customer.pk).update(name='Ava Lee')
+        response = self.client.get('/api/export/customers.csv')
+        # Rows are read after the view returns, outside its use_replica()
+        self.assertIn(b'Ava Kim', b''.join(response.streaming_content))
+
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Property), DEFAULT_DB_ALIAS)
+        with use_replica():
+            self.assertEqual(router.db_for_read(Property), 'replica')
+            self.assertEqual(router.db_for_write(Property), DEFAULT_DB_ALIAS)
+            with use_primary():
+                self.assertEqual(router.db_for_read(Property), DEFAULT_DB_ALIAS)
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Property), DEFAULT_DB_ALIAS)
+        pin(user_key(self.user))
+        with use_replica(user_key(self.user)):
+            self.assertEqual(router.db_for_read(Property), DEFAULT_DB_ALIAS)
+        self.assertFalse(router.allow_migrate('replica', 'api'))
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, 'api'))
+        with override_settings(DATABASE_REPLICAS=[]), use_replica():
+            self.assertEqual(router.db_for_read(Property), DEFAULT_DB_ALIAS)
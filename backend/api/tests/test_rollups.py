@@ -0,0 +1,87 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+
+from .. import rollups
+from ..models import JobAddon, Order, Payment, Rollup
+from .helpers import APITestCase, make_job, make_property, make_user
+
+
+def snapshot():
+    return sorted(Rollup.objects.filter(count__gt=0).values_list('user_id', 'metric', 'key', 'count', 'total'))
+
+
+class RollupTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.property = make_property(self.user)
+        self.photographer = make_user('shooter', role='photographer')
+
+    def add_history(self):
+        Order.objects.create(property=self.property, total_amount=Decimal('300.00'), status='paid')
+        order = Order.objects.create(property=self.property, total_amount=Decimal('120.50'))
+        job = make_job(self.photographer, status='completed')
+        other = make_job(self.photographer, service_price=Decimal('80.00'))
+        Payment.objects.create(photographer=self.photographer, job=job, amount=Decimal('100.00'),
+                               travel_fee=Decimal('25.00'), status='paid', date=date(2030, 1, 9))
+        Payment.objects.create(photographer=self.photographer, job=other, amount=Decimal('40.00'))
+        return order, job
+
+    def test_saves_and_deletes_apply_deltas(self):
+        order, job = self.add_history()
+        summary = rollups.dashboard_summary(self.user)['revenue_by_status']
+        self.assertEqual(summary, {'draft': {'count': 1, 'total': '120.50'}, 'paid': {'count': 1, 'total': '300.00'}})
+
+        order.status = 'paid'
+        order.save()
+        job.status = 'cancelled'
+        job.save()
+        Order.objects.filter(status='paid').first().delete()
+        incremental = snapshot()
+        rollups.refresh_rollups()
+        self.assertEqual(snapshot(), incremental)
+        self.assertEqual(rollups.dashboard_summary(self.user)['revenue_by_status'],
+                         {'paid': {'count': 1, 'total': '120.50'}})
+
+    def test_deferred_rollups_refresh_once(self):
+        with rollups.deferred_rollups():
+            self.add_history()
+            Order.objects.filter(property=self.property).update(status='completed')
+            rollups.mark_dirty(Order, Order.objects.all())
+            self.assertFalse(Rollup.objects.exists())
+        self.assertEqual(rollups.dashboard_summary(self.user)['revenue_by_status'],
+                         {'completed': {'count': 2, 'total': '420.50'}})
+
+    def test_endpoints_read_a_fixed_number_of_rows(self):
+        self.add_history()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/dashboard/summary/')
+        self.assertEqual(response.data['revenue_by_status']['paid'], {'count': 1, 'total': '300.00'})
+        for _ in range(5):
+            Order.objects.create(property=self.property, total_amount=Decimal('10.00'))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/dashboard/summary/').data['revenue_by_status']['draft']['count'], 6)
+
+    def test_earnings(self):
+        _, job = self.add_history()
+        JobAddon.objects.create(job=job, name='Drone', price=Decimal('50.00'))
+        self.client.force_authenticate(self.photographer)
+        data = self.client.get('/api/photographers/earnings/').data
+        self.assertEqual((data['total_earned'], data['paid'], data['pending']), ('165.00', '125.00', '40.00'))
+        self.assertEqual(data['payouts_by_month'], {'2030-01': {'count': 1, 'total': '125.00'},
+                                                    rollups.UNDATED: {'count': 1, 'total': '40.00'}})
+        self.assertEqual(data['jobs_by_status'], {'completed': {'count': 1, 'total': '100.00'},
+                                                  'upcoming': {'count': 1, 'total': '80.00'}})
+        self.assertEqual(data['addon_revenue'], '50.00')
+
+    def test_rebuild_command(self):
+        self.add_history()
+        expected = snapshot()
+        Rollup.objects.all().update(count=0, total=0)
+        call_command('rebuild_rollups', users=[self.photographer.pk], stdout=StringIO())
+        self.assertEqual(snapshot(), [row for row in expected if row[0] == self.photographer.pk])
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(snapshot(), expected)
@@ -0,0 +1,149 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Photographer, ZipCentroid
+from ..routing import Stop, detour_km, format_time, geocoder, place_key, plan_day, plan_route, travel_fee
+from .helpers import APITestCase, make_job, make_user
+
+DAY = date(2030, 1, 7)
+CENTROIDS = [
+    ('78701', 'Austin', 'TX', 30.2711, -97.7437),
+    ('78702', 'Austin', 'TX', 30.2638, -97.7166),
+    ('78613', 'Cedar Park', 'TX', 30.5052, -97.8203),
+    ('78660', 'Pflugerville', 'TX', 30.4394, -97.6200),
+]
+
+
+def load_centroids():
+    ZipCentroid.objects.bulk_create([
+        ZipCentroid(zip_code=zip_code, city=city, state=state, place=place_key(city, state), latitude=lat,
+                    longitude=lng) for zip_code, city, state, lat, lng in CENTROIDS])
+    geocoder.cache.clear()
+
+
+class GeocoderTests(TestCase):
+
+    def setUp(self):
+        load_centroids()
+
+    def test_zip_code_first_then_city(self):
+        self.assertEqual(geocoder.locate(address='1 Oak St, Austin TX 78702', city='Austin', state='TX'),
+                         (30.2638, -97.7166))
+        self.assertEqual(geocoder.locate(zip_code='78613-1234'), (30.5052, -97.8203))
+        lat, lng = geocoder.locate(address='1 Oak St', city=' austin ', state='tx')
+        self.assertAlmostEqual(lat, (30.2711 + 30.2638) / 2)
+        self.assertAlmostEqual(lng, (-97.7437 - 97.7166) / 2)
+        self.assertIsNone(geocoder.locate(address='1 Oak St 99999', city='Nowhere', state='TX'))
+
+    def test_points_are_cached_until_the_gazetteer_changes(self):
+        queries = [geocoder.query(zip_code='78701'), geocoder.query(zip_code='99999')]
+        with self.assertNumQueries(1):
+            geocoder.locate_many(queries)
+        with self.assertNumQueries(0):  # Misses are remembered too
+            self.assertEqual(geocoder.locate_many(queries), {queries[0]: (30.2711, -97.7437), queries[1]: None})
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'zips.csv')
+        with open(path, 'w') as f:
+            f.write('zip,primary_city,state_id,lat,lng\n78701,Austin,TX,31.0,-97.7437\n701,Bad,TX,x,y\n')
+        stdout = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):  # load_gazetteer bumps the table version
+            call_command('load_gazetteer', path, stdout=stdout)
+        self.assertEqual(stdout.getvalue().strip(), 'Loaded 1 zip code centroids (1 rows skipped)')
+        self.assertEqual(geocoder.locate(zip_code='78701'), (31.0, -97.7437))
+        self.assertIsNone(geocoder.locate(zip_code='78702'))
+
+
+class PlanRouteTests(TestCase):
+
+    def test_stops_are_visited_in_driving_order(self):
+        points = [(30.0, -97.0 - 0.05 * i) for i in range(8)]
+        stops = [Stop(key=i, point=points[i], opens=480, closes=1200, duration=30) for i in range(8)]
+        random.Random(1).shuffle(stops)
+        route = plan_route(stops, start=(30.0, -96.95))
+        self.assertEqual([stop.key for stop, *_ in route.stops], list(range(8)))
+        self.assertEqual(route.late_minutes, 0)
+        self.assertAlmostEqual(route.distance_km, sum(km for *_, km in route.stops))
+
+    def test_time_windows_beat_distance(self):
+        near = Stop(key='near', point=(30.0, -97.01), opens=480, closes=1200, duration=60)
+        far = Stop(key='far', point=(30.0, -97.3), opens=480, closes=490, duration=60)
+        route = plan_route([near, far], start=(30.0, -97.0))
+        self.assertEqual([stop.key for stop, *_ in route.stops], ['far', 'near'])
+        self.assertEqual(route.stops[0][1], 480)  # Waits for the window to open
+        self.assertEqual(route.late_minutes, 0)
+
+    def test_unplaced_stops_and_empty_days(self):
+        route = plan_route([Stop(key='lost', opens=600, closes=700), Stop(key='here', point=(30.0, -97.0),
+                                                                          opens=480, closes=500)])
+        self.assertEqual([stop.key for stop, *_ in route.stops], ['here', 'lost'])
+        self.assertEqual(route.travel_minutes, 0)
+        self.assertEqual(plan_route([]).stops, [])
+
+    def test_hundreds_of_stops_plan_in_under_a_second(self):
+        rng = random.Random(7)
+        stops = []
+        for i in range(300):
+            scheduled = rng.randrange(480, 1140)
+            stops.append(Stop(key=i, point=(30.0 + rng.random() * 0.5, -97.5 + rng.random() * 0.5),
+                              opens=scheduled - 60, closes=scheduled + 60, duration=20))
+        started = time.perf_counter()
+        route = plan_route(stops, start=(30.25, -97.25))
+        self.assertLess(time.perf_counter() - started, 1.0)
+        self.assertEqual(sorted(stop.key for stop, *_ in route.stops), list(range(300)))
+
+    def test_format_time(self):
+        self.assertEqual([format_time(m) for m in (0, 570, 720, 1439.6)],
+                         ['12:00 AM', '9:30 AM', '12:00 PM', '12:00 AM'])
+
+
+class DayRouteTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        load_centroids()
+        self.photographer = make_user('shooter', role='photographer')
+        Photographer.objects.create(user=self.photographer, bio='', travel_fee=Decimal('25.00'),
+                                    base_zip_code='78701')
+        self.client.force_authenticate(self.photographer)
+        self.cedar = make_job(self.photographer, property_address='9 Elm St 78613', property_city='Cedar Park',
+                              scheduled_time='2:00 PM')
+        self.east = make_job(self.photographer, property_address='4 Pine St 78702', scheduled_time='9:00 AM')
+        self.lost = make_job(self.photographer, property_address='1 Nowhere Rd', property_city='Atlantis',
+                             scheduled_time='5:00 PM')
+        make_job(self.photographer, property_address='2 Oak St 78702', status='cancelled')
+        make_job(make_user('other', role='photographer'), property_address='3 Oak St 78660')
+
+    def test_route_endpoint(self):
+        response = self.client.get('/api/photographers/jobs/route/', {'date': '2030-01-07'})
+        self.assertEqual(response.status_code, 200)
+        stops = response.data['stops']
+        self.assertEqual([s['job'] for s in stops], [self.east.pk, self.cedar.pk, self.lost.pk])
+        # As early as the window allows, which leaves the most slack for the stops after
+        self.assertEqual([s['suggested_time'] for s in stops], ['8:00 AM', '1:00 PM', '4:00 PM'])
+        self.assertEqual([s['located'] for s in stops], [True, True, False])
+        self.assertGreater(stops[1]['distance_km'], 20)
+        self.assertEqual(response.data['late_minutes'], 0)
+        self.assertEqual(self.client.get('/api/photographers/jobs/route/').status_code, 400)
+        self.assertEqual(self.client.get('/api/photographers/jobs/route/', {'date': '2030-13-01'}).status_code, 400)
+
+    def test_travel_fee_charges_the_detour(self):
+        flat = Decimal('25.00')
+        pflugerville = geocoder.locate(zip_code='78660')
+        self.assertEqual(travel_fee(self.photographer.pk, None, pflugerville, flat), flat)
+        self.assertEqual(travel_fee(self.photographer.pk, DAY, geocoder.locate(zip_code='78613'), flat), flat)
+
+        km = detour_km(plan_day(self.photographer.pk, DAY), pflugerville)
+        self.assertGreater(km, 10)
+        self.assertEqual(travel_fee(self.photographer.pk, DAY, pflugerville, flat),
+                         flat + (Decimal(str(km)) * Decimal('0.60')).quantize(Decimal('0.01')))
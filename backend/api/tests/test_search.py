@@ -0,0 +1,86 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+
+from ..models import Customer, Property, SearchDocument
+from .helpers import APITestCase, make_job, make_property, make_user
+
+
+class SearchTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.condo = make_property(self.user, address='12 Harbor View', city='Austin', property_type='condo')
+        self.house = make_property(self.user, address='9 Harbor Lane', city='Dallas', status='active')
+        self.ranch = make_property(self.user, address='400 Prairie Rd', city='Austin')
+        self.customer = Customer.objects.create(name='Ava Harbor', email='ava@harbor.com', phone='555-0100',
+                                                company='Harbor Realty')
+        self.photographer = make_user('shooter', role='photographer')
+        self.job = make_job(self.photographer, client_name='Noah Harbor', property_city='Houston')
+        make_job(make_user('other', role='photographer'), client_name='Mia Harbor')
+
+    def search(self, **params):
+        response = self.client.get('/api/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def ids(self, data):
+        return sorted((row['type'], row['id']) for row in data['results'])
+
+    def test_prefix_terms_and_facets(self):
+        data = self.search(q='harb')
+        self.assertEqual(self.ids(data), [('property', self.condo.pk), ('property', self.house.pk)])
+        self.assertEqual(data['facets']['city'], {'Austin': 1, 'Dallas': 1})
+        self.assertIn('Harbor', data['results'][0]['object']['address'])
+
+        # A facet is counted without its own filter, so the other cities stay on offer
+        data = self.search(q='harbor', city='Austin')
+        self.assertEqual((data['count'], self.ids(data)), (1, [('property', self.condo.pk)]))
+        self.assertEqual(data['facets']['city'], {'Austin': 1, 'Dallas': 1})
+        self.assertEqual(data['facets']['property_type'], {'condo': 1})
+        self.assertEqual(self.search(q='austin prairie')['count'], 1)
+
+    def test_what_each_role_may_search(self):
+        self.assertEqual({row['type'] for row in self.search(q='harbor')['results']}, {'property'})
+
+        self.client.force_authenticate(self.photographer)
+        data = self.search(q='harbor', type='job,customer')
+        self.assertEqual(self.ids(data), [('job', self.job.pk)])
+
+        self.client.force_authenticate(make_user('admin', role='admin'))
+        data = self.search(q='harbor', type='customer,job')
+        self.assertEqual({row['type'] for row in data['results']}, {'customer', 'job'})
+        self.assertEqual(data['count'], 3)
+
+    def test_index_follows_saves_and_deletes(self):
+        response = self.client.patch(f'/api/properties/{self.ranch.pk}/', {'features': ['Infinity Pool']},
+                                     format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ids(self.search(q='infinity')), [('property', self.ranch.pk)])
+
+        self.ranch.city = 'Round Rock'
+        self.ranch.save()
+        self.assertEqual(self.search(q='round rock')['count'], 1)
+        pk = self.ranch.pk
+        self.ranch.delete()
+        self.assertEqual(self.search(q='infinity')['count'], 0)
+        self.assertFalse(SearchDocument.objects.filter(kind='property', object_id=pk).exists())
+
+    def test_query_syntax_is_not_interpreted(self):
+        for q in ('"harbor', 'harbor OR', 'NEAR(harbor view)', '*', 'harbor AND -x'):
+            with self.subTest(q=q):
+                self.search(q=q)
+        self.assertEqual(self.client.get('/api/search/', {'limit': 'x'}).status_code, 400)
+
+    @override_settings(SEARCH_BACKEND='api.search.DatabaseBackend')
+    def test_database_backend(self):
+        data = self.search(q='harbor view')
+        self.assertEqual(self.ids(data), [('property', self.condo.pk)])
+        self.assertEqual(data['facets']['property_type'], {'condo': 1})
+
+    def test_rebuild(self):
+        Property.objects.filter(pk=self.ranch.pk).update(description='Horse barn')  # No signals
+        self.assertEqual(self.search(q='barn')['count'], 0)
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.ids(self.search(q='barn')), [('property', self.ranch.pk)])
@@ -0,0 +1,53 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Blob, Booking, Job, Media, Order, Payment, Photographer, Property, PropertyService, User
+from ..seeding import Seeder, flush
+from .helpers import make_property, make_user
+
+
+class SeederTests(TestCase):
+    counts = {'brokers': 2, 'photographers': 3, 'customers': 4, 'properties': 6, 'media': 8,
+              'orders': 5, 'jobs': 10, 'payments': 6}
+
+    def test_same_seed_same_rows(self):
+        Seeder(self.counts, seed=7, batch_size=4).run(derived=False)
+        first = list(Property.objects.order_by('pk').values_list('address', 'city', 'price'))
+        flush()
+        Seeder(self.counts, seed=7, batch_size=4).run(derived=False)
+        self.assertEqual(list(Property.objects.order_by('pk').values_list('address', 'city', 'price')), first)
+
+    def test_seeds_bookings_and_flushes_everything(self):
+        existing = make_user('broker')
+        make_property(existing)
+        Seeder(self.counts, batch_size=4).run()
+        scheduled = PropertyService.objects.filter(photographer__isnull=False, scheduled_date__isnull=False,
+                                                   scheduled_time__isnull=False)
+        self.assertEqual(Booking.objects.filter(property_service__isnull=False).count(), scheduled.count())
+        self.assertTrue(Booking.objects.filter(job__isnull=False).exists())
+
+        self.assertGreater(flush(), 0)
+        self.assertEqual(list(User.objects.values_list('username', flat=True)), ['broker'])
+        self.assertEqual(Property.objects.count(), 1)
+        for model in (Media, Order, PropertyService, Job, Payment, Booking, Photographer, Blob):
+            self.assertFalse(model.objects.exists(), model.__name__)
+
+
+class BenchmarkTests(TestCase):
+
+    def test_report_covers_seeded_routes(self):
+        Seeder(SeederTests.counts, batch_size=4).run()
+        with tempfile.NamedTemporaryFile('r', suffix='.json') as output:
+            call_command('benchmark_api', iterations=2, warmup=0, filter='^(properties|jobs|orders)',
+                         output=output.name, stdout=StringIO())
+            report = json.load(output)
+        self.assertIn('/api/properties/{pk}/', report['endpoints'])
+        self.assertIn('/api/jobs/', report['endpoints'])
+        for route, result in report['endpoints'].items():
+            self.assertEqual(result['status'], 200, route)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(report['meta']['rows']['Property'], SeederTests.counts['properties'])
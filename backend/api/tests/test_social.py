@@ -0,0 +1,130 @@
+import os
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.test import override_settings
+from PIL import Image
+
+from ..models import Media, Template, media_storage
+from ..social import fill_text, property_details, render_template
+from .helpers import APITestCase, TempMediaRootMixin, make_property, make_service
+
+RED, BLUE = (220, 30, 30), (20, 40, 200)
+
+
+def jpeg(color, width=400, height=300):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+
+def make_template(name='Just Listed', elements=(), **kwargs):
+    return Template.objects.create(**{'name': name, 'category': 'listing', 'thumbnail': '', 'width': 200,
+                                      'height': 100, 'background_color': '#ffffff', 'elements': list(elements),
+                                      **kwargs})
+
+
+def close_to(pixel, color, slack=24):
+    return all(abs(a - b) <= slack for a, b in zip(pixel, color))
+
+
+class RenderTemplateTests(TempMediaRootMixin, APITestCase):
+
+    def test_shapes_text_and_background(self):
+        path = os.path.join(self.media_root, 'out.png')
+        render_template({'width': 200, 'height': 100, 'background': '#00ff00', 'elements': [
+            {'type': 'shape', 'x': 0, 'y': 0, 'width': 100, 'height': 100, 'backgroundColor': '#dc1e1e'},
+            {'type': 'text', 'x': 100, 'y': 0, 'width': 100, 'height': 100, 'content': 'Sold',
+             'fontSize': 40, 'color': '#0000ff', 'textAlign': 'center'},
+        ]}, path)
+        with Image.open(path) as image:
+            self.assertEqual(image.size, (200, 100))
+            self.assertTrue(close_to(image.getpixel((50, 50)), RED))
+            self.assertEqual(image.getpixel((195, 5)), (0, 255, 0))
+            self.assertTrue(any(close_to(image.getpixel((x, y)), (0, 0, 255), 60)
+                                for x in range(100, 200) for y in range(30, 70)))
+        self.assertEqual(os.listdir(self.media_root), ['out.png'])  # No part file left behind
+
+    def test_property_details_fill_the_sample_copy(self):
+        details = property_details(make_property(self.user, price=Decimal('2500000.00'), bedrooms=3,
+                                                 bathrooms=Decimal('2.5')))
+        self.assertEqual(fill_text('123 Ocean Drive\n$2,500,000 · 4 Bed · 3 Bath · 3,200 SqFt', details),
+                         '1 Oak St\n$2,500,000 · 3 Bed · 2.5 Bath · 3,200 SqFt')
+
+
+@override_settings(TEMPLATE_RENDER_WORKERS=0)
+class SocialKitTests(TempMediaRootMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.property = make_property(self.user, price=Decimal('450000.00'))
+        self.url = f'/api/properties/{self.property.pk}/social-kit/'
+        name = media_storage().save('property_media/front.jpg', ContentFile(jpeg(BLUE)))
+        Media.objects.create(property=self.property, service=make_service(), type='photo', file=name,
+                             file_name='front.jpg', file_size=1)
+
+    def image(self, render):
+        path = os.path.join(self.media_root, render['url'].split('/media/', 1)[1])
+        return Image.open(path)
+
+    def test_renders_are_cached_until_the_property_changes(self):
+        template = make_template(elements=[
+            {'type': 'image', 'x': 0, 'y': 0, 'width': 100, 'height': 100, 'imageUrl': ''},
+            {'type': 'text', 'x': 100, 'y': 0, 'width': 100, 'height': 100, 'content': '$2,500,000'},
+        ])
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        [render] = response.data
+        self.assertEqual((render['template'], render['cached'], render['error']), (template.pk, False, None))
+        self.assertTrue(render['url'].startswith('http://testserver/media/renders/'))
+        with self.image(render) as image:
+            self.assertTrue(close_to(image.getpixel((50, 50)), BLUE))  # Empty image elements get the first photo
+
+        self.assertEqual(self.client.get(self.url).data, [{**render, 'cached': True}])
+        self.property.price = Decimal('475000.00')
+        self.property.save()
+        render = self.client.get(self.url).data[0]
+        self.assertFalse(render['cached'])
+        self.assertEqual(self.client.get(self.url, {'output': 'jpg'}).data[0]['url'][-4:], '.jpg')
+
+    def test_a_broken_template_reports_its_own_error(self):
+        good = make_template(elements=[{'type': 'shape', 'x': 0, 'y': 0, 'width': 10, 'height': 10}])
+        empty = make_template(width=0)
+        sloppy = make_template(elements=[
+            {'type': 'shape', 'x': 'left', 'y': 0, 'width': 10, 'height': 10},
+            {'type': 'text', 'x': 0, 'y': 0, 'width': 50, 'height': 50, 'content': 'Hi', 'fontSize': 'big',
+             'opacity': -1},
+        ])
+        with open(os.path.join(self.media_root, 'notes.jpg'), 'w') as fh:
+            fh.write('not a photo')
+        unreadable = make_template(elements=[
+            {'type': 'image', 'x': 0, 'y': 0, 'width': 50, 'height': 50, 'imageUrl': '/media/notes.jpg'}])
+
+        response = self.client.get(self.url)
+        self.assertEqual([r['template'] for r in response.data], [good.pk, empty.pk, sloppy.pk, unreadable.pk])
+        errors = {r['template']: r['error'] for r in response.data}
+        self.assertIsNone(errors[good.pk])
+        self.assertEqual(errors[empty.pk], 'Template size 0x100 is not between 1 and 8192')
+        self.assertIsNone(errors[sloppy.pk])
+        self.assertIn('notes.jpg', errors[unreadable.pk])
+        self.assertEqual([r['url'] is None for r in response.data], [False, True, False, True])
+
+    def test_choosing_templates_and_output(self):
+        first, second = make_template('One'), make_template('Two')
+        response = self.client.get(self.url, {'template': f'{second.pk}'})
+        self.assertEqual([r['template'] for r in response.data], [second.pk])
+        self.assertEqual(self.client.get(self.url, {'template': 'one'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'output': 'gif'}).status_code, 400)
+        self.assertEqual(len(self.client.get(self.url, {'template': f'{first.pk},{second.pk}'}).data), 2)
+
+    @override_settings(TEMPLATE_RENDER_WORKERS=2)
+    def test_several_renders_go_to_the_process_pool(self):
+        colors = ['#ff0000', '#00ff00', '#0000ff']
+        for color in colors:
+            make_template(color, background_color=color)
+        response = self.client.get(self.url)
+        self.assertEqual([r['error'] for r in response.data], [None] * 3)
+        for render, color in zip(response.data, colors):
+            with self.image(render) as image:
+                self.assertEqual('#%02x%02x%02x' % image.getpixel((0, 0)), color)
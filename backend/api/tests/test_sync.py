@@ -0,0 +1,125 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date
+
+from ..models import Payment, Tombstone
+from .helpers import APITestCase, make_job, make_property, make_user
+
+
+@override_settings(SYNC_OVERLAP=0)
+class DeltaSyncTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.photographer = make_user('shooter', role='photographer')
+        self.client.force_authenticate(self.photographer)
+        self.kept, self.changed, self.deleted, self.moved = [make_job(self.photographer) for _ in range(4)]
+
+    def test_since_returns_changes_and_deletions(self):
+        response = self.client.get('/api/photographers/jobs/')
+        self.assertEqual(len(response.data), 4)
+        token = response['Sync-Token']
+
+        self.changed.status = 'completed'
+        self.changed.save()
+        deleted_pk = self.deleted.pk
+        self.deleted.delete()
+        self.client.patch('/api/jobs/bulk/', [{'id': self.moved.pk, 'photographer': self.user.pk}], format='json')
+
+        response = self.client.get(f'/api/photographers/jobs/?since={token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['changed']], [self.changed.pk])
+        self.assertEqual(response.data['deleted'], sorted([deleted_pk, self.moved.pk]))
+        self.assertEqual(response.data['next'], response['Sync-Token'])
+
+        response = self.client.get(f'/api/photographers/jobs/?since={response["Sync-Token"]}')
+        self.assertEqual((response.data['changed'], response.data['deleted']), ([], []))
+
+    def test_payments(self):
+        paid = Payment.objects.create(photographer=self.photographer, job=self.kept, amount=Decimal('100.00'))
+        other = Payment.objects.create(photographer=self.photographer, job=self.changed, amount=Decimal('50.00'))
+        response = self.client.get('/api/photographers/payments/')
+        self.assertEqual({row['id'] for row in response.data}, {paid.pk, other.pk})
+        token = response['Sync-Token']
+
+        paid.status = 'paid'
+        paid.save()
+        other_pk = other.pk
+        other.delete()
+        response = self.client.get('/api/photographers/payments/', {'since': token, 'status': 'paid'})
+        self.assertEqual([row['id'] for row in response.data['changed']], [paid.pk])
+        self.assertEqual(response.data['deleted'], [other_pk])
+
+    def test_bad_and_expired_tokens(self):
+        self.assertEqual(self.client.get('/api/photographers/jobs/?since=soon').status_code, 400)
+        old = int((timezone.now() - timedelta(days=365)).timestamp() * 1_000_000)
+        self.assertEqual(self.client.get(f'/api/photographers/jobs/?since={old}').status_code, 410)
+
+    def test_prune_tombstones(self):
+        deleted, old = self.deleted.pk, self.moved.pk
+        self.deleted.delete()
+        self.moved.delete()
+        Tombstone.objects.filter(object_id=old).update(deleted_at=timezone.now() - timedelta(days=31))
+        stdout = StringIO()
+        call_command('prune_tombstones', stdout=stdout)
+        self.assertEqual(stdout.getvalue().strip(), 'Deleted 1 tombstones')
+        self.assertEqual(list(Tombstone.objects.values_list('object_id', flat=True)), [deleted])
+
+
+class ConditionalRequestTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.property = make_property(self.user)
+
+    def get(self, url, **headers):
+        return self.client.get(url, **headers)
+
+    def write(self, func, *args, **kwargs):
+        # Table versions are bumped on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            return func(*args, **kwargs)
+
+    def test_etag_and_last_modified(self):
+        url = f'/api/properties/{self.property.pk}/'
+        response = self.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Last-Modified is never the current second, which a later write could share
+        self.assertLessEqual(parse_http_date(last_modified), time.time() - 1)
+        self.assertEqual(self.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)).status_code, 304)
+        self.assertEqual(self.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() - 3600)).status_code, 200)
+
+        self.write(self.client.patch, url, {'features': ['Pool']}, format='json')
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_validators_depend_on_the_tables_rendered(self):
+        url = '/api/properties/'
+        etag = self.get(url)['ETag']
+        self.write(make_job, make_user('shooter', role='photographer'))  # Not part of a property
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.write(make_property, self.user)
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_validators_are_per_user_and_query(self):
+        url = '/api/properties/'
+        etag = self.get(url)['ETag']
+        self.assertEqual(self.get(f'{url}?city=Austin', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.client.force_authenticate(make_user('other'))
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_writes_are_not_conditional(self):
+        url = f'/api/properties/{self.property.pk}/'
+        etag = self.get(url)['ETag']
+        with mock.patch('api.conditional.get_conditional_response') as conditional:
+            self.write(self.client.patch, url, {'city': 'Dallas'}, format='json')
+        conditional.assert_not_called()
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,136 @@
+import base64
+import hashlib
+import os
+from io import BytesIO
+
+from django.db import connection
+
+from .. import uploads
+from ..models import Job, Media, UploadSession
+from .helpers import APITestCase, TempMediaRootMixin, make_job, make_property, make_service, make_user
+
+CONTENT = b'0123456789' * 1000
+
+
+def checksum(data, algorithm='sha256'):
+    return f'{algorithm} {base64.b64encode(hashlib.new(algorithm, data).digest()).decode()}'
+
+
+class ResumableUploadTests(TempMediaRootMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.property = make_property(self.user)
+        self.service = make_service()
+
+    def open_session(self, **data):
+        response = self.client.post('/api/uploads/', {
+            'property': self.property.pk, 'service': self.service.pk, 'type': 'video',
+            'file_name': 'tour.mp4', 'file_size': len(CONTENT), **data}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response
+
+    def patch(self, pk, data, offset, **headers):
+        return self.client.generic('PATCH', f'/api/uploads/{pk}/', data, 'application/offset+octet-stream',
+                                   HTTP_UPLOAD_OFFSET=str(offset), **headers)
+
+    def test_chunks_resume_and_finalize_into_media(self):
+        response = self.open_session()
+        pk = response.data['id']
+        self.assertEqual(response['Upload-Offset'], '0')
+        self.assertTrue(response['Location'].endswith(f'/api/uploads/{pk}/'))
+
+        first, rest = CONTENT[:4000], CONTENT[4000:]
+        response = self.patch(pk, first, 0, HTTP_UPLOAD_CHECKSUM=checksum(first))
+        self.assertEqual((response.status_code, response['Upload-Offset']), (204, '4000'))
+        # The connection dropped; the client asks where to resume
+        self.assertEqual(self.client.get(f'/api/uploads/{pk}/')['Upload-Offset'], '4000')
+        self.assertEqual(self.client.post(f'/api/uploads/{pk}/finalize/').status_code, 409)
+        self.assertEqual(self.patch(pk, rest, 4000, HTTP_UPLOAD_CHECKSUM=checksum(rest, 'md5')).status_code, 204)
+
+        response = self.client.post(f'/api/uploads/{pk}/finalize/')
+        self.assertEqual(response.status_code, 201)
+        media = Media.objects.get()
+        self.assertEqual((media.file_size, media.file_name, media.type), (len(CONTENT), 'tour.mp4', 'video'))
+        with media.file.open('rb') as fh:
+            self.assertEqual(fh.read(), CONTENT)
+        self.assertFalse(os.path.exists(uploads.part_path(UploadSession.objects.get())))
+        self.assertEqual(self.client.post(f'/api/uploads/{pk}/finalize/').status_code, 409)
+        self.assertEqual(self.patch(pk, b'', len(CONTENT)).status_code, 409)
+
+    def test_rejected_chunks_leave_the_offset(self):
+        pk = self.open_session().data['id']
+        self.assertEqual(self.patch(pk, CONTENT[:10], 5).status_code, 409)
+        self.assertEqual(self.patch(pk, CONTENT[:10], 0, HTTP_UPLOAD_CHECKSUM=checksum(b'other')).status_code, 460)
+        self.assertEqual(self.patch(pk, CONTENT + b'!', 0).status_code, 413)
+        self.assertEqual(self.patch(pk, CONTENT[:10], 0, HTTP_UPLOAD_CHECKSUM='crc32 AAAA').status_code, 400)
+        self.assertEqual(self.patch(pk, CONTENT[:10], 'x').status_code, 400)
+        session = UploadSession.objects.get()
+        self.assertEqual(session.offset, 0)
+        self.assertEqual(os.path.getsize(uploads.part_path(session)), 0)
+
+    def test_other_users_sessions_are_not_found(self):
+        pk = self.open_session().data['id']
+        self.client.force_authenticate(make_user('stranger'))
+        self.assertEqual(self.patch(pk, CONTENT[:10], 0).status_code, 404)
+        self.assertEqual(self.client.post(f'/api/uploads/{pk}/finalize/').status_code, 404)
+
+    def test_chunk_streams_outside_a_transaction(self):
+        pk = self.open_session().data['id']
+        depth = len(connection.atomic_blocks)
+        test = self
+
+        class Stream(BytesIO):
+            def read(self, size=-1):
+                test.assertEqual(len(connection.atomic_blocks), depth)
+                return super().read(size)
+
+        session = uploads.receive_chunk(UploadSession.objects.all(), pk, Stream(CONTENT[:100]), 0)
+        self.assertEqual(session.offset, 100)
+
+    def test_concurrent_chunk_is_locked_out(self):
+        pk = self.open_session().data['id']
+        with uploads.locked_part(UploadSession.objects.get()):
+            self.assertEqual(self.patch(pk, CONTENT[:10], 0).status_code, 423)
+        self.assertEqual(self.patch(pk, CONTENT[:10], 0).status_code, 204)
+
+    def test_offset_moved_during_the_chunk(self):
+        pk = self.open_session().data['id']
+
+        class Stream(BytesIO):
+            def read(self, size=-1):
+                UploadSession.objects.filter(pk=pk).update(offset=50)
+                return super().read(size)
+
+        with self.assertRaises(uploads.ChunkError) as raised:
+            uploads.receive_chunk(UploadSession.objects.all(), pk, Stream(CONTENT[:10]), 0)
+        self.assertEqual(raised.exception.status, 409)
+        self.assertEqual(UploadSession.objects.get().offset, 50)
+
+    def test_second_finalize_does_not_store_again(self):
+        pk = self.open_session().data['id']
+        self.patch(pk, CONTENT, 0)
+        session = UploadSession.objects.get()
+        uploads.finalize(session)
+        with self.assertRaises(uploads.ChunkError) as raised:
+            uploads.finalize(session)
+        self.assertEqual(raised.exception.status, 409)
+        with self.assertRaises(uploads.ChunkError):
+            uploads.complete(session, Media.objects.get().file.name)
+        self.assertEqual(Media.objects.count(), 1)
+
+    def test_job_upload(self):
+        job = make_job(self.user)
+        pk = self.open_session(job=job.pk, property=None, service=None, file_name='raw.zip').data['id']
+        self.patch(pk, CONTENT, 0)
+        response = self.client.post(f'/api/uploads/{pk}/finalize/')
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNotNone(response.data['completed_at'])
+        files = Job.objects.get().uploaded_files
+        self.assertEqual([(f['name'], f['size']) for f in files], [('raw.zip', len(CONTENT))])
+        self.assertFalse(Media.objects.exists())
+
+    def test_session_needs_a_target(self):
+        response = self.client.post('/api/uploads/', {'type': 'photo', 'file_name': 'a.jpg', 'file_size': 1},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,218 @@
+import base64
+import fcntl
+import hashlib
+import os
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import blobs
+from .conditional import touch
+from .models import Job, Media, UploadSession, media_storage
+from .storage import DiskFile
+
+CHUNK_SIZE = 64 * 1024
+CHECKSUM_ALGORITHMS = {'md5', 'sha1', 'sha256'}
+
+
+class ChunkError(Exception):
+    """A PATCH chunk was rejected; ``status`` is the HTTP status to answer with"""
+
+    def __init__(self, detail, status):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+def part_path(session):
+    return os.path.join(settings.MEDIA_ROOT, 'uploads', f'{session.pk}.part')
+
+
+def parse_checksum(header):
+    """Parse a tus ``Upload-Checksum: <algorithm> <base64 digest>`` header"""
+    if not header:
+        return None
+    try:
+        algorithm, digest = header.split(' ', 1)
+        digest = base64.b64decode(digest, validate=True)
+    except ValueError:
+        raise ChunkError('Malformed Upload-Checksum header', 400)
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise ChunkError(f'Unsupported checksum algorithm {algorithm!r}', 400)
+    return algorithm, digest
+
+
+def write_chunk(fh, session, stream, offset, checksum=None):
+    """Stream one chunk from ``stream`` into the open part file ``fh`` at ``offset``.
+
+    Nothing is buffered beyond ``CHUNK_SIZE``; if the chunk overruns the
+    declared length or fails its checksum, the part file is truncated back to
+    ``offset`` so the client can simply retry from there. Returns the offset
+    after the chunk. Only file I/O: the caller checks and records offsets.
+    """
+    digest = hashlib.new(checksum[0]) if checksum else None
+    written = 0
+    fh.truncate(offset)
+    while True:
+        block = stream.read(CHUNK_SIZE)
+        if not block:
+            break
+        written += len(block)
+        if offset + written > session.file_size:
+            fh.truncate(offset)
+            raise ChunkError('Chunk exceeds Upload-Length', 413)
+        if digest:
+            digest.update(block)
+        fh.write(block)
+    fh.flush()
+
+    if digest and digest.digest() != checksum[1]:
+        fh.truncate(offset)
+        raise ChunkError('Checksum mismatch', 460)
+    return offset + written
+
+
+@contextmanager
+def locked_part(session):
+    """The session's part file, open for appending and locked against other writers.
+
+    A second request writing the same session gets ``ChunkError`` 423 instead
+    of interleaving its bytes. The lock is the file's, not a thread's, so the
+    file may be handed to another thread while it's held.
+    """
+    path = part_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'ab') as fh:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise ChunkError('Another chunk is being written to this upload', 423)
+        yield fh
+
+
+def check_chunk(sessions, pk, offset):
+    """Session ``pk``, if it's still open and at ``offset``; raises ``ChunkError`` otherwise"""
+    with transaction.atomic():
+        session = sessions.select_for_update().get(pk=pk)
+    if session.completed_at:
+        raise ChunkError('Upload already finalized', 409)
+    if offset != session.offset:
+        raise ChunkError(f'Upload-Offset {offset} does not match {session.offset}', 409)
+    return session
+
+
+def record_chunk(sessions, session, offset, end):
+    """Move the session from ``offset`` to ``end``, if nothing else moved or closed it meanwhile"""
+    with transaction.atomic():
+        moved = sessions.filter(pk=session.pk, offset=offset, completed_at__isnull=True).update(offset=end)
+    if not moved:
+        raise ChunkError('Upload changed while the chunk was sent', 409)
+    session.offset = end
+    return session
+
+
+def receive_chunk(sessions, pk, stream, offset, checksum=None):
+    """Append one chunk to session ``pk`` in ``sessions``.
+
+    The row is locked only to check the offset and, in a second short
+    transaction, to record the new one: however slow the client, the body
+    streams in with no transaction open. The part file's own lock keeps
+    concurrent requests for one session apart, and the offset is checked
+    again once it's held, in case a chunk landed in between.
+    """
+    session = sessions.get(pk=pk)
+    with locked_part(session) as fh:
+        session = check_chunk(sessions, pk, offset)
+        end = write_chunk(fh, session, stream, offset, checksum)
+        return record_chunk(sessions, session, offset, end)
+
+
+async def areceive_chunk(sessions, pk, stream, offset, checksum=None):
+    """Async ``receive_chunk``: queries run on the sync thread, the write in a worker thread"""
+    session = await sessions.aget(pk=pk)
+    with locked_part(session) as fh:
+        session = await sync_to_async(check_chunk)(sessions, pk, offset)
+        end = await sync_to_async(write_chunk, thread_sensitive=False)(fh, session, stream, offset, checksum)
+        return await sync_to_async(record_chunk)(sessions, session, offset, end)
+
+
+@transaction.atomic
+def attach_to_job(job, name, file_name, size):
+    """Record a stored file on ``job.uploaded_files``.
+
+    The row is locked and its current list appended to, so concurrent uploads
+    to one job don't drop each other's entries (or leave blob counts off).
+    """
+    locked = Job.objects.select_for_update().only('id', 'uploaded_files').get(pk=job.pk)
+    job.uploaded_files = (locked.uploaded_files or []) + [{
+        'name': file_name,
+        'file': name,
+        'size': size,
+    }]
+    Job.objects.filter(pk=job.pk).update(uploaded_files=job.uploaded_files, updated_at=timezone.now())
+    blobs.retain([name])
+    touch(Job)
+
+
+def finalize(session):
+    """Move a complete part file into media storage and create its ``Media`` row.
+
+    Renaming the part file claims it, so of two concurrent calls only one
+    stores it; the other gets ``ChunkError`` 409.
+    """
+    claimed = f'{part_path(session)}.finalizing'
+    try:
+        os.rename(part_path(session), claimed)
+    except FileNotFoundError:
+        raise ChunkError('Upload already finalized', 409)
+    target = Media._meta.get_field('file').generate_filename(None, session.file_name)
+    try:
+        with open(claimed, 'rb') as fh:
+            name = media_storage().save(target, DiskFile(fh, claimed))
+    except BaseException:
+        if os.path.exists(claimed):  # Let the client finalize again
+            os.rename(claimed, part_path(session))
+        raise
+    if os.path.exists(claimed):  # Its content was stored already
+        os.remove(claimed)
+    return complete(session, name)
+
+
+def reuse_blob(session):
+    """Complete ``session`` from the stored file with its ``sha256``, skipping the transfer.
+
+    Returns whether there was one the session's owner already has.
+    """
+    name = blobs.claim(session.sha256, session.file_size, session.owner) if session.sha256 else None
+    if name is None:
+        return False
+    complete(session, name)
+    return True
+
+
+@transaction.atomic
+def complete(session, name):
+    """Create the ``Media`` row (or job upload) for stored file ``name`` and close the session"""
+    if UploadSession.objects.select_for_update().filter(pk=session.pk).values_list('completed_at', flat=True).get():
+        raise ChunkError('Upload already finalized', 409)
+    media = None
+    if session.property_id and session.service_id:
+        media = Media.objects.create(
+            property_id=session.property_id,
+            service_id=session.service_id,
+            type=session.type,
+            file=name,
+            file_name=session.file_name,
+            file_size=session.file_size,
+        )
+    if session.job_id:
+        attach_to_job(session.job, name, session.file_name, session.file_size)
+
+    session.media = media
+    session.offset = session.file_size
+    session.completed_at = timezone.now()
+    session.save(update_fields=['media', 'offset', 'completed_at'])
+    return media
@@ -2,6 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import *
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'orders', OrderViewSet)
@@ -12,6 +13,7 @@ router.register(r'properties', PropertyViewSet, basename='property')
 router.register(r'services', PropertyServiceViewSet, basename='service')
 router.register(r'property-services', PropertyServiceViewSet, basename='propertyservice')
 router.register(r'media', MediaViewSet, basename='media')
+router.register(r'uploads', UploadSessionViewSet, basename='upload')
 
 urlpatterns = [
     path('', include(router.urls)),  # ✅ FIXED (no slash at start)
@@ -22,4 +24,23 @@ urlpatterns = [
     path('auth/logout/', AuthViewSet.as_view({'post': 'logout'})),
     path('auth/me/', AuthViewSet.as_view({'get': 'me'})),
     path('auth/refresh/', TokenRefreshView.as_view()),
+    
+    # Dashboard
+    path('dashboard/summary/', DashboardViewSet.as_view({'get': 'summary'})),
+    
+    # Search
+    path('search/', SearchView.as_view()),
+    
+    # Spreadsheet exports
+    path('export/<slug:resource>.<slug:file_format>', ExportView.as_view()),
+    
+    # Public pages
+    path('property/<int:pk>/', PropertyLandingPageView.as_view()),
+    
+    # Async (ASGI) variants of the I/O-bound endpoints
+    path('async/properties/<int:pk>/media/', async_views.property_media),
+    path('async/properties/<int:pk>/media/archive/', async_views.property_media_archive),
+    path('async/photographers/jobs/', async_views.photographer_jobs),
+    path('async/property/<int:pk>/', async_views.property_landing_page),
+    path('async/uploads/<uuid:pk>/', async_views.upload_chunk),
 ]
\ No newline at end of file
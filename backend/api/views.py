@@ -1,14 +1,36 @@
+import os
+from io import BytesIO
+
 from django.shortcuts import render
 
 # Create your views here.
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
+from django.db import router, transaction
+from django.http import Http404
+from django.utils.dateparse import parse_date
 from .models import *
 from .serializers import *
+from .eager import EagerLoadingMixin, plan_queryset
+from .export import FORMATS as EXPORT_FORMATS, Export, export_response
+from . import uploads
+from .archive import MediaArchive, archive_response
+from .auth import CachedRefreshToken
+from .availability import find_available_photographers, parse_time, sync_bookings
+from .bulk import BulkActionsMixin
+from .conditional import ConditionalMixin
+from .flat import FlatListMixin, FlatSerializer
+from .landing import get_landing_snapshot, snapshot_response
+from .replicas import ReplicaReadMixin
+from .routing import plan_day
+from .rollups import dashboard_summary, deferred_rollups, mark_dirty, photographer_earnings
+from .search import FACETS, MODELS, index_objects, search
+from .social import FORMATS, social_kit
+from .sync import record_reassigned, sync_response
 
 class AuthViewSet(viewsets.ViewSet):
     """Authentication endpoints"""
@@ -21,7 +43,7 @@ class AuthViewSet(viewsets.ViewSet):
         
         user = authenticate(username=email, password=password)
         if user:
-            refresh = RefreshToken.for_user(user)
+            refresh = CachedRefreshToken.for_user(user)
             return Response({
                 'user': UserSerializer(user).data,
                 'access': str(refresh.access_token),
@@ -50,7 +72,7 @@ class AuthViewSet(viewsets.ViewSet):
             phone=request.data.get('phone'),
         )
         
-        refresh = RefreshToken.for_user(user)
+        refresh = CachedRefreshToken.for_user(user)
         return Response({
             'user': UserSerializer(user).data,
             'access': str(refresh.access_token),
@@ -61,7 +83,7 @@ class AuthViewSet(viewsets.ViewSet):
     def logout(self, request):
         try:
             refresh_token = request.data.get('refresh')
-            token = RefreshToken(refresh_token)
+            token = CachedRefreshToken(refresh_token)
             token.blacklist()
             return Response(status=status.HTTP_205_RESET_CONTENT)
         except Exception:
@@ -71,10 +93,25 @@ class AuthViewSet(viewsets.ViewSet):
     def me(self, request):
         return Response(UserSerializer(request.user).data)
 
-class PropertyViewSet(viewsets.ModelViewSet):
+class DashboardViewSet(ReplicaReadMixin, viewsets.ViewSet):
+    """Per-user aggregates served from rollup tables"""
+    permission_classes = [IsAuthenticated]
+    replica_actions = ('summary',)
+    
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        return Response(dashboard_summary(request.user))
+
+class PropertyViewSet(ConditionalMixin, ReplicaReadMixin, FlatListMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Property.objects.all()
     serializer_class = PropertySerializer
     permission_classes = [IsAuthenticated]
+    replica_actions = ('list', 'retrieve', 'services', 'media')
+    conditional_actions = ('list', 'retrieve', 'services', 'media')
+    conditional_sources = {'services': (PropertyServiceSerializer,), 'media': (MediaSerializer,)}
+    ordering = ('-created_at', '-id')
+    filter_fields = ('owner', 'status', 'property_type', 'city')
+    filter_lookups = {'feature': 'features__name'}
     
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -82,64 +119,195 @@ class PropertyViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def services(self, request, pk=None):
         property_obj = self.get_object()
-        services = PropertyService.objects.filter(property=property_obj)
+        services = plan_queryset(PropertyService.objects.filter(property=property_obj), PropertyServiceSerializer)
         serializer = PropertyServiceSerializer(services, many=True)
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
     def media(self, request, pk=None):
         property_obj = self.get_object()
-        media = Media.objects.filter(property=property_obj)
+        media = plan_queryset(Media.objects.filter(property=property_obj), MediaSerializer)
         serializer = MediaSerializer(media, many=True, context={'request': request})
         return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'], url_path='social-kit')
+    def social_kit(self, request, pk=None):
+        """Every social media template (or ``?template=1,2``) rendered for the property as ``?output=png|jpg``"""
+        property_obj = self.get_object()
+        file_format = request.query_params.get('output', 'png')
+        if file_format not in FORMATS:
+            return Response({'detail': f'output must be one of {", ".join(FORMATS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        templates = Template.objects.order_by('id')
+        if request.query_params.get('template'):
+            try:
+                templates = templates.filter(pk__in=[int(pk) for pk in request.query_params['template'].split(',')])
+            except ValueError:
+                return Response({'detail': 'template must be a comma-separated list of ids'},
+                                status=status.HTTP_400_BAD_REQUEST)
+        renders = social_kit(property_obj, templates.defer('thumbnail'), file_format)
+        return Response(SocialRenderSerializer(renders, many=True, context={'request': request}).data)
+    
+    @action(detail=True, methods=['get'], url_path='media/archive')
+    def media_archive(self, request, pk=None):
+        """Stream the property's media as a ZIP, honouring Range/If-Range"""
+        property_obj = self.get_object()
+        media = Media.objects.filter(property=property_obj).order_by('uploaded_at', 'id')
+        if request.query_params.get('type'):
+            media = media.filter(type=request.query_params['type'])
+        if request.query_params.get('service'):
+            try:
+                media = media.filter(service_id=int(request.query_params['service']))
+            except ValueError:
+                return Response({'detail': 'service must be an id'}, status=status.HTTP_400_BAD_REQUEST)
+        archive = MediaArchive(media.only('id', 'type', 'file', 'file_name', 'uploaded_at'))
+        return archive_response(request, archive, f'property-{property_obj.pk}-media.zip')
 
-class ServiceViewSet(viewsets.ReadOnlyModelViewSet):
+class ServiceViewSet(ConditionalMixin, ReplicaReadMixin, EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer
     permission_classes = [IsAuthenticated]
+    conditional_actions = ('list', 'retrieve', 'addons')
+    conditional_sources = {'addons': (AddonServiceSerializer,)}
     
     @action(detail=False, methods=['get'])
     def addons(self, request):
-        addons = AddonService.objects.all()
+        addons = plan_queryset(AddonService.objects.all(), AddonServiceSerializer)
         serializer = AddonServiceSerializer(addons, many=True)
         return Response(serializer.data)
 
-class PropertyServiceViewSet(viewsets.ModelViewSet):
+class PropertyServiceViewSet(ConditionalMixin, ReplicaReadMixin, BulkActionsMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = PropertyService.objects.all()
     serializer_class = PropertyServiceSerializer
     permission_classes = [IsAuthenticated]
+    filter_fields = ('property', 'photographer')
+    
+    def after_bulk_write(self, instances, deleted=False):
+        if not deleted:
+            sync_bookings(instances, 'property_service')
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ConditionalMixin, ReplicaReadMixin, BulkActionsMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    ordering = ('-created_at', '-id')
+    filter_fields = ('status', 'property', 'customer')
+    # Checkout writes the order, its lines, addons, links, bookings and rollups
+    # whatever the number of lines, plus four queries when the catalog is cold;
+    # updates move rollup buckets and re-read the services
+    query_budgets = {**BulkActionsMixin.query_budgets, 'checkout': 32, 'update': 20, 'partial_update': 20}
+    
+    def after_bulk_write(self, instances, deleted=False):
+        if not deleted:
+            mark_dirty(Order, instances)
+    
+    @action(detail=False, methods=['post'])
+    def checkout(self, request):
+        """Create an order, its property services and their links in one transaction"""
+        serializer = CheckoutSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic(), deferred_rollups():
+            order = serializer.save()
+        
+        order = self.get_queryset().get(pk=order.pk)
+        return Response(self.get_serializer(order).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['post'])
+    def quote(self, request):
+        """Price services and addons from the price catalog without creating anything"""
+        serializer = QuoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.data)
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(ConditionalMixin, ReplicaReadMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     permission_classes = [IsAuthenticated]
+    ordering = ('-created_at', '-id')
 
-class PhotographerViewSet(viewsets.ModelViewSet):
+class PhotographerViewSet(ConditionalMixin, ReplicaReadMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Photographer.objects.all()
     serializer_class = PhotographerSerializer
     permission_classes = [IsAuthenticated]
+    replica_actions = ('list', 'retrieve', 'available', 'earnings', 'route')
+    conditional_actions = ('list', 'retrieve', 'jobs', 'payments', 'route')
+    conditional_sources = {'jobs': (JobSerializer, Tombstone), 'payments': (PaymentSerializer, Tombstone),
+                           'route': (Job, Photographer, ZipCentroid)}
+    filter_lookups = {'specialty': 'specialties__name'}
+    
+    @action(detail=False, methods=['get'])
+    def available(self, request):
+        try:
+            day = parse_date(request.query_params.get('date') or '')
+        except ValueError:
+            day = None
+        if day is None:
+            return Response({'detail': 'date is required (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+        start = None
+        if request.query_params.get('time'):
+            start = parse_time(request.query_params['time'])
+            if start is None:
+                return Response({'detail': 'Invalid time'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 100))
+            duration = int(request.query_params.get('duration', 0)) or None
+        except ValueError:
+            return Response({'detail': 'limit and duration must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if duration is not None and duration < 0:
+            return Response({'detail': 'duration must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        photographers = find_available_photographers(
+            day, start=start, duration=duration, city=request.query_params.get('city'), limit=limit,
+        )
+        serializer = PhotographerSerializer(plan_queryset(photographers, PhotographerSerializer), many=True)
+        return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def jobs(self, request):
+        """The user's jobs; ``?since=<Sync-Token>`` returns only changes"""
+        flat = FlatSerializer(JobSerializer)
         jobs = Job.objects.filter(photographer=request.user)
-        serializer = JobSerializer(jobs, many=True)
-        return Response(serializer.data)
+        return sync_response(request, jobs, jobs, lambda rows: flat.to_representation(flat.values(rows)))
+    
+    @action(detail=False, methods=['get'], url_path='jobs/route')
+    def route(self, request):
+        """The user's jobs on ``?date=`` in driving order, with suggested start times"""
+        try:
+            day = parse_date(request.query_params.get('date') or '')
+        except ValueError:
+            day = None
+        if day is None:
+            return Response({'detail': 'date is required (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'date': day, **RouteSerializer(plan_day(request.user.pk, day)).data})
+    
+    @action(detail=False, methods=['get'])
+    def earnings(self, request):
+        return Response(photographer_earnings(request.user))
     
     @action(detail=False, methods=['get'])
     def payments(self, request):
-        payments = Payment.objects.filter(photographer=request.user)
-        serializer = PaymentSerializer(payments, many=True)
-        return Response(serializer.data)
+        """The user's payments; ``?since=<Sync-Token>`` returns only changes"""
+        scope = Payment.objects.filter(photographer=request.user)
+        payments = scope
+        if request.query_params.get('status'):
+            payments = payments.filter(status=request.query_params['status'])
+        return sync_response(request, scope, payments,
+                             lambda rows: PaymentSerializer(plan_queryset(rows, PaymentSerializer), many=True).data)
 
-class JobViewSet(viewsets.ModelViewSet):
+class JobViewSet(ConditionalMixin, ReplicaReadMixin, FlatListMixin, BulkActionsMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Job.objects.all()
     serializer_class = JobSerializer
     permission_classes = [IsAuthenticated]
+    ordering = ('scheduled_date', 'id')
+    filter_fields = ('photographer', 'status', 'scheduled_date')
+    # Addons are replaced as rows, bookings resynced, then the addons re-read
+    query_budgets = {**BulkActionsMixin.query_budgets, 'update': 12, 'partial_update': 12}
+    
+    def after_bulk_write(self, instances, deleted=False):
+        if not deleted:
+            record_reassigned(Job, instances)
+            sync_bookings(instances, 'job', active=lambda job: job.status != 'cancelled')
+            mark_dirty(Job, instances)
+            index_objects(instances)
     
     @action(detail=True, methods=['post'])
     def upload(self, request, pk=None):
@@ -149,15 +317,17 @@ class JobViewSet(viewsets.ModelViewSet):
         if not uploaded_file:
             return Response({'detail': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Handle file upload logic here
-        # Save to Media model, update job status, etc.
+        name = media_storage().save(f'job_uploads/{job.pk}/{uploaded_file.name}', uploaded_file)
+        uploads.attach_to_job(job, name, uploaded_file.name, uploaded_file.size)
         
         return Response({'detail': 'File uploaded successfully'}, status=status.HTTP_201_CREATED)
 
-class MediaViewSet(viewsets.ModelViewSet):
+class MediaViewSet(ConditionalMixin, ReplicaReadMixin, FlatListMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Media.objects.all()
     serializer_class = MediaSerializer
     permission_classes = [IsAuthenticated]
+    ordering = ('-uploaded_at', '-id')
+    filter_fields = ('property', 'type')
     
     @action(detail=False, methods=['post'])
     def upload(self, request):
@@ -179,4 +349,144 @@ class MediaViewSet(viewsets.ModelViewSet):
         )
         
         serializer = MediaSerializer(media, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """Resumable uploads: POST to open, HEAD for the offset, PATCH chunks, POST finalize"""
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return UploadSession.objects.filter(owner=self.request.user)
+    
+    def _offset_headers(self, session):
+        return {
+            'Upload-Offset': str(session.offset),
+            'Upload-Length': str(session.file_size),
+            'Cache-Control': 'no-store',
+        }
+    
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = serializer.save(owner=request.user)
+        if uploads.reuse_blob(session):  # Already stored: nothing to send
+            serializer = self.get_serializer(session)
+        headers = self._offset_headers(session)
+        headers['Location'] = request.build_absolute_uri(f'{session.pk}/')
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+    
+    def retrieve(self, request, *args, **kwargs):
+        session = self.get_object()
+        return Response(self.get_serializer(session).data, headers=self._offset_headers(session))
+    
+    def partial_update(self, request, pk=None):
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            checksum = uploads.parse_checksum(request.headers.get('Upload-Checksum'))
+            session = uploads.receive_chunk(self.get_queryset(), pk, request.stream or BytesIO(), offset, checksum)
+        except (KeyError, ValueError):
+            return Response({'detail': 'Missing or invalid Upload-Offset header'}, status=status.HTTP_400_BAD_REQUEST)
+        except UploadSession.DoesNotExist:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except uploads.ChunkError as exc:
+            return Response({'detail': exc.detail}, status=exc.status)
+        return Response(status=status.HTTP_204_NO_CONTENT, headers=self._offset_headers(session))
+    
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        session = self.get_object()
+        if session.completed_at:
+            return Response({'detail': 'Upload already finalized'}, status=status.HTTP_409_CONFLICT)
+        if session.offset != session.file_size:
+            return Response({'detail': 'Upload incomplete'}, status=status.HTTP_409_CONFLICT,
+                            headers=self._offset_headers(session))
+        
+        try:
+            media = uploads.finalize(session)
+        except uploads.ChunkError as exc:
+            return Response({'detail': exc.detail}, status=exc.status)
+        if media is None:
+            return Response(self.get_serializer(session).data, status=status.HTTP_201_CREATED)
+        serializer = MediaSerializer(media, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    def perform_destroy(self, instance):
+        if not instance.completed_at and os.path.exists(uploads.part_path(instance)):
+            os.remove(uploads.part_path(instance))
+        instance.delete()
+
+class PropertyLandingPageView(ReplicaReadMixin, APIView):
+    """Public landing page payload, served from a cached snapshot"""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    replica_actions = ('get', 'head')
+    
+    def get(self, request, pk):
+        snapshot = get_landing_snapshot(pk)
+        if snapshot is None:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return snapshot_response(request, *snapshot)
+
+class SearchView(APIView):
+    """Full-text search with facet counts over properties, customers and jobs"""
+    permission_classes = [IsAuthenticated]
+    serializer_classes = {
+        'property': PropertySerializer,
+        'customer': CustomerSerializer,
+        'job': JobSerializer,
+    }
+    
+    def get(self, request):
+        params = request.query_params
+        try:
+            limit = max(1, min(int(params.get('limit', 20)), 100))
+        except ValueError:
+            return Response({'detail': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        kinds = [k for k in params.get('type', '').split(',') if k] or None
+        filters = {facet: params.get(facet) for facet in FACETS}
+        
+        total, documents, facets = search(request.user, params.get('q', ''), kinds, filters, limit)
+        
+        objects = {}
+        for kind in {d.kind for d in documents}:
+            serializer_class = self.serializer_classes[kind]
+            queryset = MODELS[kind].objects.filter(pk__in=[d.object_id for d in documents if d.kind == kind])
+            serializer = serializer_class(plan_queryset(queryset, serializer_class), many=True,
+                                          context={'request': request})
+            objects.update(((kind, item['id']), item) for item in serializer.data)
+        
+        return Response({
+            'count': total,
+            'results': [
+                {'type': d.kind, 'id': d.object_id, 'object': objects[d.kind, d.object_id]}
+                for d in documents if (d.kind, d.object_id) in objects
+            ],
+            'facets': facets,
+        })
+
+def own_payments(queryset, user):
+    """Staff export everyone's payments, photographers their own"""
+    return queryset if user.is_staff else queryset.filter(photographer=user)
+
+class ExportView(ReplicaReadMixin, APIView):
+    """``/export/<resource>.csv`` or ``.xlsx``: every row a list endpoint filters to, streamed"""
+    permission_classes = [IsAuthenticated]
+    replica_actions = ('get',)
+    exports = {
+        'orders': Export.for_view(OrderViewSet),
+        'customers': Export.for_view(CustomerViewSet, exclude=('avatar',)),
+        'jobs': Export.for_view(JobViewSet, exclude=('uploaded_files',)),
+        'payments': Export(Payment.objects.all(), filter_fields=('photographer', 'status', 'date', 'payout_run'),
+                           scope=own_payments),
+    }
+    
+    def get(self, request, resource, file_format):
+        export = self.exports.get(resource)
+        if export is None or file_format not in EXPORT_FORMATS:
+            raise Http404
+        queryset = export.queryset(request)
+        # Rows are read after the view returns, so fix the database now
+        queryset = queryset.using(router.db_for_read(queryset.model))
+        return export_response(export, queryset, file_format, resource)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # ✅ Correct
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -54,6 +56,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.replicas.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -66,16 +69,47 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Resumable upload protocol headers
+from corsheaders.defaults import default_headers
+
+CORS_ALLOW_HEADERS = [*default_headers, 'upload-offset', 'upload-length', 'upload-checksum']
+CORS_EXPOSE_HEADERS = ['Location', 'Upload-Offset', 'Upload-Length']
+
 # REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.auth.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_FILTER_BACKENDS': [
+        'api.filters.FieldFilterBackend',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
+# What EagerLoadingMixin does when a request goes over its query budget:
+# None (don't count), 'warn' (log it) or 'raise' (fail it; what
+# ``manage.py test`` runs with, so the suite fails on any regression)
+QUERY_BUDGET = 'raise' if sys.argv[1:2] == ['test'] else 'warn' if DEBUG else None
+
+# Opt-in orjson renderer/parser (pip install orjson); responses are
+# byte-identical to DRF's JSONRenderer.
+FAST_JSON = False
+
+if FAST_JSON:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = [
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ]
+
 
 TEMPLATES = [
     {
@@ -103,8 +137,31 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_REFRESH_SERIALIZER': 'api.auth.CachedTokenRefreshSerializer',
 }
 
+# In-process auth caches (see api/auth.py): how long a resolved user may be
+# reused, and how often the token blacklist filter is topped up from the DB.
+# Each top-up looks back OVERLAP seconds before the last one, so a blacklist
+# row stamped before a top-up but committed after it is still picked up
+AUTH_USER_CACHE_TTL = 60
+AUTH_USER_CACHE_SIZE = 10000
+TOKEN_BLACKLIST_REFRESH_INTERVAL = 30
+TOKEN_BLACKLIST_REFRESH_OVERLAP = 300
+
+# In-process price catalog (see api/pricing.py): changes drop it via signals
+# and a version key in the cache; this bounds staleness when the cache isn't shared
+PRICE_CATALOG_TTL = 300
+
+# Conditional GETs (see api/conditional.py): table versions expire after this
+# many seconds, which bounds stale 304s when the cache isn't shared
+CONDITIONAL_VERSION_TTL = 300
+
+# Delta sync of photographer jobs/payments (see api/sync.py): how far back
+# ?since= looks past a token for late commits, and how long tombstones last
+SYNC_OVERLAP = 60
+SYNC_TOMBSTONE_DAYS = 30
+
 # Custom User Model
 AUTH_USER_MODEL = 'api.User'
 
@@ -112,6 +169,81 @@ AUTH_USER_MODEL = 'api.User'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploaded media is stored once per distinct content (see api/storage.py);
+# the handlers hash uploads while they stream in
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'media': {'BACKEND': 'api.storage.BlobStorage'},
+}
+FILE_UPLOAD_HANDLERS = [
+    'api.storage.HashingMemoryFileUploadHandler',
+    'api.storage.HashingTemporaryFileUploadHandler',
+]
+# Seconds an unreferenced blob is kept before collect_blobs deletes it
+BLOB_GC_GRACE = 60 * 60
+# Seconds a derivative task may stay running before process_media_tasks
+# assumes its worker died and runs it again
+MEDIA_TASK_TIMEOUT = 15 * 60
+
+# Rows fetched per round trip by the streaming exports (api/export.py)
+EXPORT_CHUNK_SIZE = 2000
+
+# Social media template renders (see api/social.py): worker processes per
+# web process (0 renders in the request), and the fonts text is set in
+TEMPLATE_RENDER_WORKERS = 4
+TEMPLATE_FONTS = {
+    'regular': 'DejaVuSans.ttf',
+    'bold': 'DejaVuSans-Bold.ttf',
+}
+
+# Cache
+# LocMemCache is per-process; use a shared backend (Redis/Memcached) in
+# production so signal-driven invalidations reach every worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Public landing pages: snapshots are invalidated by signals, so they can
+# live in the cache for a long time; browsers/CDNs revalidate with ETags.
+LANDING_PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+LANDING_PAGE_MAX_AGE = 60
+
+# Length in minutes a job/property service blocks a photographer's calendar
+BOOKING_DEFAULT_DURATION = 120
+
+# Day routes (see api/routing.py): straight-line km times ROUTE_DETOUR_FACTOR
+# at ROUTE_SPEED_KMH; a job may start ROUTE_TIME_WINDOW minutes either side
+# of its scheduled time (untimed ones within the working day), and each
+# minute late costs as much as ROUTE_LATENESS_WEIGHT minutes of driving.
+# Travel fees add TRAVEL_FEE_PER_KM for the detour a new job adds to the day.
+ROUTE_SPEED_KMH = 40
+ROUTE_DETOUR_FACTOR = 1.3
+ROUTE_TIME_WINDOW = 60
+ROUTE_DAY_START = 8 * 60
+ROUTE_DAY_END = 20 * 60
+ROUTE_LATENESS_WEIGHT = 10
+TRAVEL_FEE_PER_KM = 0.60
+GEOCODE_CACHE_SIZE = 50000
+GEOCODE_CACHE_TTL = 60 * 60
+
+# Search (see api/search.py); DatabaseBackend works on any database
+SEARCH_BACKEND = 'api.search.SQLiteFTSBackend'
+
+# Request instrumentation, scraped from /metrics (see api/metrics.py). Set
+# METRICS_TOKEN to require a bearer token; without one only clients in
+# METRICS_ALLOWED_NETWORKS may scrape (behind a proxy, REMOTE_ADDR is the
+# proxy's). Set PROFILE_SLOW_REQUESTS to a threshold in ms to dump sampled
+# stacks of slower requests to PROFILE_DIR.
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICS_TOKEN = None
+METRICS_ALLOWED_NETWORKS = ('127.0.0.0/8', '::1/128')
+PROFILE_SLOW_REQUESTS = None
+PROFILE_INTERVAL = 0.005
+PROFILE_DIR = BASE_DIR / 'profiles'
+
 # static
 
 STATIC_URL = '/static/'
@@ -119,13 +251,55 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
-
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+#
+# SQLite unless POSTGRES_DB is set. PostgreSQL connections persist for
+# DB_CONN_MAX_AGE seconds and are health-checked before reuse; POSTGRES_POOL
+# (max size) switches to Django's built-in pool instead, which needs psycopg 3
+# with psycopg[pool]. POSTGRES_REPLICA_HOSTS (comma-separated) adds read
+# replicas. Locally, SQLITE_REPLICA names a second SQLite file opened
+# read-only as a stand-in replica; copy db.sqlite3 over it to "replicate".
+import os
+
+if os.environ.get('POSTGRES_DB'):
+    def _postgres(host):
+        database = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ['POSTGRES_DB'],
+            'USER': os.environ.get('POSTGRES_USER', ''),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': host,
+            'PORT': os.environ.get('POSTGRES_PORT', ''),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+        }
+        if os.environ.get('POSTGRES_POOL'):
+            database['CONN_MAX_AGE'] = 0
+            database['OPTIONS'] = {'pool': {'min_size': 2, 'max_size': int(os.environ['POSTGRES_POOL'])}}
+        return database
+
+    DATABASES = {'default': _postgres(os.environ.get('POSTGRES_HOST', 'localhost'))}
+    for i, host in enumerate(filter(None, os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',')), 1):
+        DATABASES[f'replica{i}'] = {**_postgres(host.strip()), 'TEST': {'MIRROR': 'default'}}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
     }
-}
+    if os.environ.get('SQLITE_REPLICA'):
+        DATABASES['replica1'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': f"file:{os.environ['SQLITE_REPLICA']}?mode=ro",
+            'OPTIONS': {'uri': True},
+            'TEST': {'MIRROR': 'default'},
+        }
+
+# Read replicas (see api/replicas.py): after a write, the user reads from the
+# primary for REPLICA_PIN_SECONDS to cover replication lag
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = 10
 
 
 # Password validation
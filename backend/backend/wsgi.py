@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Load the price catalog before the first request needs it
+from api.pricing import catalog  # noqa: E402
+
+catalog.warm()
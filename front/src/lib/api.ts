@@ -6,6 +6,7 @@
  * When false, it makes real HTTP requests to Django backend.
  */
 
+import { format } from 'date-fns';
 import API_CONFIG from './apiConfig';
 import { 
   User, 
@@ -34,6 +35,29 @@ import {
 // HTTP Client
 // ============================================================================
 
+// One page of a keyset-paginated list endpoint, as the backend sends it
+interface Page<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
+// One page for consumers: pass `next`/`previous` back to getPage for the page after/before
+export interface ListPage<T> {
+  results: T[];
+  next: string | null;
+  previous: string | null;
+}
+
+// The opaque cursor token of a `next`/`previous` link
+const cursorOf = (link: string | null): string | null =>
+  link ? new URL(link).searchParams.get('cursor') : null;
+
+const withQuery = (endpoint: string, params: Record<string, string>): string => {
+  const query = new URLSearchParams(params).toString();
+  return query ? `${endpoint}${endpoint.includes('?') ? '&' : '?'}${query}` : endpoint;
+};
+
 class ApiClient {
   private baseURL: string;
   private timeout: number;
@@ -68,6 +92,38 @@ class ApiClient {
     return this.handleResponse<T>(response);
   }
 
+  /**
+   * One page of a list endpoint, starting at `cursor` (a `next`/`previous`
+   * value of an earlier page). Endpoints that return a plain array come back
+   * as a single page.
+   */
+  async getPage<T,>(endpoint: string, cursor?: string | null, pageSize?: number): Promise<ListPage<T>> {
+    const params: Record<string, string> = {};
+    if (cursor) params.cursor = cursor;
+    if (pageSize) params.page_size = String(pageSize);
+    const page = await this.get<T[] | Page<T>>(withQuery(endpoint, params));
+    if (Array.isArray(page)) {
+      return { results: page, next: null, previous: null };
+    }
+    return { results: page.results, next: cursorOf(page.next), previous: cursorOf(page.previous) };
+  }
+
+  /**
+   * The first `limit` items of a list endpoint (API_CONFIG.LIST_LIMIT by
+   * default), following cursors a page at a time. Screens that can show more
+   * should page with getPage instead of raising the limit.
+   */
+  async getList<T,>(endpoint: string, limit: number = API_CONFIG.LIST_LIMIT): Promise<T[]> {
+    const items: T[] = [];
+    let cursor: string | null = null;
+    do {
+      const page: ListPage<T> = await this.getPage<T>(endpoint, cursor, Math.min(limit - items.length, API_CONFIG.PAGE_SIZE));
+      items.push(...page.results);
+      cursor = page.next;
+    } while (cursor && items.length < limit);
+    return items.slice(0, limit);
+  }
+
   async post<T,>(endpoint: string, data?: any): Promise<T> {
     const response = await fetch(`${this.baseURL}${endpoint}`, {
       method: 'POST',
@@ -216,6 +272,27 @@ const deserializeOrder = (order: any): Order => {
   };
 };
 
+// The local calendar day as YYYY-MM-DD, the format of the backend's date fields
+const isoDate = (value?: Date | string): string | null =>
+  value ? format(new Date(value), 'yyyy-MM-dd') : null;
+
+// A checkout request for an order: the server prices it, so no totals are sent
+const serializeCheckout = (order: Order) => ({
+  property: order.propertyId,
+  customer: order.customerId ?? null,
+  status: order.status,
+  due_date: isoDate(order.dueDate),
+  services: order.services.map(service => ({
+    service: service.serviceId,
+    photographer: service.photographerId ?? null,
+    scheduled_date: isoDate(service.scheduledDate),
+    scheduled_time: service.scheduledTime ?? null,
+    status: service.status,
+    notes: service.notes ?? null,
+    addon_ids: service.addonIds ?? [],
+  })),
+});
+
 const deserializeMedia = (media: any): Media => {
   if (!media) return media;
   return {
@@ -429,10 +506,15 @@ export const propertiesApi = {
       const properties = getFromLocalStorage<Property[]>('properties', []);
       return properties.map(deserializeProperty);
     }
-    const properties = await apiClient.get<Property[]>(API_CONFIG.ENDPOINTS.PROPERTIES);
+    const properties = await apiClient.getList<Property>(API_CONFIG.ENDPOINTS.PROPERTIES);
     return properties.map(deserializeProperty);
   },
 
+  async getPage(cursor?: string | null): Promise<ListPage<Property>> {
+    const page = await apiClient.getPage<Property>(API_CONFIG.ENDPOINTS.PROPERTIES, cursor);
+    return { ...page, results: page.results.map(deserializeProperty) };
+  },
+
   async getById(id: string): Promise<Property> {
     if (API_CONFIG.USE_MOCK_DATA) {
       const properties = getFromLocalStorage<Property[]>('properties', []);
@@ -488,14 +570,14 @@ export const servicesApi = {
     if (API_CONFIG.USE_MOCK_DATA) {
       return availableServices;
     }
-    return apiClient.get<Service[]>(API_CONFIG.ENDPOINTS.SERVICES);
+    return apiClient.getList<Service>(API_CONFIG.ENDPOINTS.SERVICES);
   },
 
   async getAddons(): Promise<AddonService[]> {
     if (API_CONFIG.USE_MOCK_DATA) {
       return addonServices;
     }
-    return apiClient.get<AddonService[]>(API_CONFIG.ENDPOINTS.ADDON_SERVICES);
+    return apiClient.getList<AddonService>(API_CONFIG.ENDPOINTS.ADDON_SERVICES);
   },
 };
 
@@ -507,16 +589,12 @@ export const propertyServicesApi = {
   // get all property services (flat endpoint)
   async getAll(): Promise<PropertyService[]> {
     // Llamamos al endpoint raíz: /services/ o /property-services/
-    const services = await apiClient.get<PropertyService[]>(API_CONFIG.ENDPOINTS.SERVICES);
+    const services = await apiClient.getList<PropertyService>(API_CONFIG.ENDPOINTS.SERVICES);
     return services;
   },
 
   async getByPropertyId(propertyId: string): Promise<PropertyService[]> {
-    // Si el backend acepta filtro por query param:
-    // return apiClient.get<PropertyService[]>(`${API_CONFIG.ENDPOINTS.SERVICES}?property=${propertyId}`);
-    // Si no, obtener todo y filtrar cliente:
-    const all = await apiClient.get<PropertyService[]>(API_CONFIG.ENDPOINTS.SERVICES);
-    return all.filter(s => s.propertyId === propertyId);
+    return apiClient.getList<PropertyService>(`${API_CONFIG.ENDPOINTS.SERVICES}?property=${propertyId}`);
   },
 
   async create(service: PropertyService): Promise<PropertyService> {
@@ -540,10 +618,15 @@ export const ordersApi = {
       const orders = getFromLocalStorage<Order[]>('orders', []);
       return orders.map(deserializeOrder);
     }
-    const orders = await apiClient.get<Order[]>(API_CONFIG.ENDPOINTS.ORDERS);
+    const orders = await apiClient.getList<Order>(API_CONFIG.ENDPOINTS.ORDERS);
     return orders.map(deserializeOrder);
   },
 
+  async getPage(cursor?: string | null): Promise<ListPage<Order>> {
+    const page = await apiClient.getPage<Order>(API_CONFIG.ENDPOINTS.ORDERS, cursor);
+    return { ...page, results: page.results.map(deserializeOrder) };
+  },
+
   async getById(id: string): Promise<Order> {
     if (API_CONFIG.USE_MOCK_DATA) {
       const orders = getFromLocalStorage<Order[]>('orders', []);
@@ -562,7 +645,7 @@ export const ordersApi = {
       saveToLocalStorage('orders', orders);
       return deserializeOrder(order);
     }
-    const created = await apiClient.post<Order>(API_CONFIG.ENDPOINTS.ORDERS, order);
+    const created = await apiClient.post<Order>(API_CONFIG.ENDPOINTS.ORDER_CHECKOUT, serializeCheckout(order));
     return deserializeOrder(created);
   },
 
@@ -591,10 +674,15 @@ export const customersApi = {
       const customers = getFromLocalStorage<Customer[]>('customers', mockCustomers);
       return customers.map(deserializeCustomer);
     }
-    const customers = await apiClient.get<Customer[]>(API_CONFIG.ENDPOINTS.CUSTOMERS);
+    const customers = await apiClient.getList<Customer>(API_CONFIG.ENDPOINTS.CUSTOMERS);
     return customers.map(deserializeCustomer);
   },
 
+  async getPage(cursor?: string | null): Promise<ListPage<Customer>> {
+    const page = await apiClient.getPage<Customer>(API_CONFIG.ENDPOINTS.CUSTOMERS, cursor);
+    return { ...page, results: page.results.map(deserializeCustomer) };
+  },
+
   async getById(id: string): Promise<Customer> {
     if (API_CONFIG.USE_MOCK_DATA) {
       const customers = getFromLocalStorage<Customer[]>('customers', mockCustomers);
@@ -656,7 +744,7 @@ export const photographersApi = {
       }
       return photographers.map(deserializePhotographer);
     }
-    const photographers = await apiClient.get<Photographer[]>(API_CONFIG.ENDPOINTS.PHOTOGRAPHERS);
+    const photographers = await apiClient.getList<Photographer>(API_CONFIG.ENDPOINTS.PHOTOGRAPHERS);
     return photographers.map(deserializePhotographer);
   },
 
@@ -791,12 +879,7 @@ export const photographersApi = {
 
 export const mediaApi = {
   async getByPropertyId(propertyId: string): Promise<Media[]> {
-    // Opción A: si backend soporta ?property=<id>
-    // const all = await apiClient.get<Media[]>(`${API_CONFIG.ENDPOINTS.MEDIA}?property=${propertyId}`);
-    // return all;
-    // Opción B: si no soporta query, obtener todo y filtrar cliente
-    const all = await apiClient.get<Media[]>(API_CONFIG.ENDPOINTS.MEDIA);
-    return all.filter(m => m.propertyId === propertyId);
+    return apiClient.getList<Media>(`${API_CONFIG.ENDPOINTS.MEDIA}?property=${propertyId}`);
   },
 
   async upload(propertyId: string, serviceId: string, file: File, type: string): Promise<Media> {
@@ -840,7 +923,11 @@ export const jobsApi = {
       // Always deserialize dates when loading from storage
       return jobs.map(deserializeJob);
     }
-    return apiClient.get<any[]>(API_CONFIG.ENDPOINTS.JOBS);
+    return apiClient.getList<any>(API_CONFIG.ENDPOINTS.JOBS);
+  },
+
+  async getPage(cursor?: string | null): Promise<ListPage<any>> {
+    return apiClient.getPage<any>(API_CONFIG.ENDPOINTS.JOBS, cursor);
   },
 
   async getById(id: string): Promise<any> {
@@ -1030,7 +1117,7 @@ export const paymentsApi = {
       const payments = getFromLocalStorage<any[]>('payments', []);
       return payments.map(deserializePayment);
     }
-    const payments = await apiClient.get<any[]>(API_CONFIG.ENDPOINTS.PAYMENTS || '/api/payments/');
+    const payments = await apiClient.getList<any>(API_CONFIG.ENDPOINTS.PAYMENTS || '/api/payments/');
     return payments.map(deserializePayment);
   },
 
@@ -1084,7 +1171,7 @@ export const paymentsApi = {
       const payments = getFromLocalStorage<any[]>('payments', []);
       return payments.filter(p => p.orderId === orderId).map(deserializePayment);
     }
-    const payments = await apiClient.get<any[]>(`/api/orders/${orderId}/payments/`);
+    const payments = await apiClient.getList<any>(`/api/orders/${orderId}/payments/`);
     return payments.map(deserializePayment);
   },
 };
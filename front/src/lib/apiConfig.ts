@@ -18,6 +18,10 @@ export const API_CONFIG = {
   USE_MOCK_DATA: false, // <-- cambiar a false
   API_BASE_URL: (typeof process !== 'undefined' && process.env?.REACT_APP_API_URL) || 'http://127.0.0.1:8000/api',
   TIMEOUT: 30000,
+  // List endpoints are keyset-paginated: PAGE_SIZE rows per request, and
+  // getList stops after LIST_LIMIT rows (page with getPage for more)
+  PAGE_SIZE: 100,
+  LIST_LIMIT: 500,
   STORAGE_KEYS: {
     ACCESS_TOKEN: 'access_token',
     REFRESH_TOKEN: 'refresh_token',
@@ -32,6 +36,7 @@ export const API_CONFIG = {
     MEDIA: '/media/',
     ORDERS: '/orders/',
     ORDER_DETAIL: (id: string) => `/orders/${id}/`,
+    ORDER_CHECKOUT: '/orders/checkout/',
     CUSTOMERS: '/customers/',
     CUSTOMER_DETAIL: (id: string) => `/customers/${id}/`,
     LOGIN: '/auth/login/',